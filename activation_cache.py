@@ -0,0 +1,152 @@
+"""
+Frozen-prefix activation cache
+Stores RoBERTa hidden states below the unfrozen layers so that training and
+evaluation start from the cached layer output instead of re-running the prefix
+"""
+
+import json
+import os
+
+import numpy as np
+import torch
+
+from checkpoint import state_dict_hash
+
+def frozen_prefix_hash(model):
+    """Content hash of the weights cached activations depend on (embeddings + frozen layers)"""
+    roberta = model.roberta
+    state = {f'embeddings.{name}': tensor
+             for name, tensor in roberta.embeddings.state_dict().items()}
+    for index in range(model.num_frozen_layers):
+        state.update({f'encoder.layer.{index}.{name}': tensor
+                      for name, tensor in roberta.encoder.layer[index].state_dict().items()})
+    return state_dict_hash(state)
+
+class FrozenPrefixCache:
+    """Memory-mapped hidden states of the frozen RoBERTa prefix
+
+    Only real (non-pad) tokens are stored: ``hidden.npy`` is a flat
+    ``[total_tokens, d_model]`` matrix and ``offsets.npy`` gives the start of
+    every sequence. Examples may hold several sequences (PIQA choices), stored
+    consecutively.
+    """
+
+    META_FILE = 'meta.json'
+    HIDDEN_FILE = 'hidden.npy'
+    OFFSETS_FILE = 'offsets.npy'
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, self.META_FILE), 'r') as f:
+            self.meta = json.load(f)
+        self.hidden = np.load(os.path.join(path, self.HIDDEN_FILE), mmap_mode='r')
+        self.offsets = np.load(os.path.join(path, self.OFFSETS_FILE), mmap_mode='r')
+        self.num_choices = self.meta['num_choices']
+        self.prefix_layers = self.meta['prefix_layers']
+
+    def __len__(self):
+        return (len(self.offsets) - 1) // self.num_choices
+
+    @property
+    def lengths(self):
+        """Token length of every example (longest of its choices)"""
+        seq_lengths = np.diff(self.offsets)
+        return seq_lengths.reshape(-1, self.num_choices).max(axis=1)
+
+    def check_compatible(self, model):
+        """Raise if the cache was built for a different frozen prefix (depth, width or weights)"""
+        if model.num_frozen_layers != self.prefix_layers:
+            raise ValueError(
+                f"Cache holds layer-{self.prefix_layers} activations but model "
+                f"freezes {model.num_frozen_layers} layers")
+        if model.genome.d_model != self.meta['d_model']:
+            raise ValueError(
+                f"Cache d_model={self.meta['d_model']} does not match "
+                f"genome d_model={model.genome.d_model}")
+        if self.meta.get('prefix_hash') != frozen_prefix_hash(model):
+            raise ValueError(
+                f"Cache at {self.path} was built from different frozen-prefix weights; "
+                f"rebuild it for this model")
+
+    def get_sequence(self, seq_idx):
+        """Zero-copy view of one cached sequence, shape [len, d_model]"""
+        return self.hidden[self.offsets[seq_idx]:self.offsets[seq_idx + 1]]
+
+    def get_batch(self, indices, dtype=torch.float32):
+        """Stack examples, padded to the longest sequence in this batch
+
+        Returns ``(prefix_hidden, attention_mask)`` shaped ``[B, S, D]`` /
+        ``[B, S]``, or ``[B, C, S, D]`` / ``[B, C, S]`` for multi-choice caches.
+        """
+        seq_ids = [i * self.num_choices + c for i in indices for c in range(self.num_choices)]
+        seqs = [self.get_sequence(s) for s in seq_ids]
+        max_len = max(len(s) for s in seqs)
+
+        hidden = torch.zeros(len(seqs), max_len, self.meta['d_model'], dtype=dtype)
+        attention_mask = torch.zeros(len(seqs), max_len, dtype=torch.long)
+        for row, seq in enumerate(seqs):
+            hidden[row, :len(seq)] = torch.from_numpy(np.array(seq, dtype=np.float32))
+            attention_mask[row, :len(seq)] = 1
+
+        if self.num_choices > 1:
+            hidden = hidden.view(len(indices), self.num_choices, max_len, -1)
+            attention_mask = attention_mask.view(len(indices), self.num_choices, max_len)
+        return hidden, attention_mask
+
+    @classmethod
+    def build(cls, model, input_ids, attention_mask, path, batch_size=64, fp16=True):
+        """Run the frozen prefix once over a tokenized corpus and write it to ``path``
+
+        ``input_ids``/``attention_mask`` are right-padded tensors shaped
+        ``[N, S]`` or ``[N, C, S]``. Activations are computed in eval mode, so
+        frozen-layer dropout is not applied during training from the cache.
+        """
+        num_choices = input_ids.size(1) if input_ids.dim() == 3 else 1
+        input_ids = input_ids.reshape(-1, input_ids.size(-1))
+        attention_mask = attention_mask.reshape(-1, attention_mask.size(-1))
+
+        lengths = attention_mask.sum(dim=1).numpy().astype(np.int64)
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+
+        os.makedirs(path, exist_ok=True)
+        d_model = model.genome.d_model
+        hidden = np.lib.format.open_memmap(
+            os.path.join(path, cls.HIDDEN_FILE), mode='w+',
+            dtype=np.float16 if fp16 else np.float32,
+            shape=(int(offsets[-1]), d_model))
+
+        was_training = model.training
+        model.eval()
+        device = next(model.parameters()).device
+        with torch.no_grad():
+            for start in range(0, input_ids.size(0), batch_size):
+                ids = input_ids[start:start + batch_size].to(device)
+                mask = attention_mask[start:start + batch_size].to(device)
+                states = model.encode_frozen_prefix(ids, mask).float().cpu().numpy()
+                for row in range(states.shape[0]):
+                    seq = start + row
+                    hidden[offsets[seq]:offsets[seq + 1]] = states[row, :lengths[seq]]
+        model.train(was_training)
+
+        hidden.flush()
+        del hidden
+        np.save(os.path.join(path, cls.OFFSETS_FILE), offsets)
+
+        # Written last so a half-built cache is never loaded
+        meta = {
+            'prefix_layers': model.num_frozen_layers,
+            'prefix_hash': frozen_prefix_hash(model),
+            'd_model': d_model,
+            'num_choices': num_choices,
+            'dtype': 'float16' if fp16 else 'float32',
+            'num_sequences': len(lengths),
+        }
+        with open(os.path.join(path, cls.META_FILE), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+        return cls(path)
+
+    @classmethod
+    def exists(cls, path):
+        return os.path.exists(os.path.join(path, cls.META_FILE))
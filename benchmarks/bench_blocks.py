@@ -0,0 +1,100 @@
+"""
+CPU benchmark: TransformerBlock vs FusedTransformerBlock
+Step time (forward + backward) and peak RSS growth at PIQA sequence lengths
+
+Usage:
+    python benchmarks/bench_blocks.py --seq-lens 32 64 128 --batch-size 64
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+VARIANTS = {
+    'standard': {'block_type': 'standard', 'norm_first': False},
+    'fused': {'block_type': 'fused', 'norm_first': False},
+    'fused_prenorm': {'block_type': 'fused', 'norm_first': True},
+}
+
+def _peak_rss_mb():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+def torch_default_threads():
+    return max(1, (os.cpu_count() or 1) // 2)
+
+def _run_case(variant, seq_len, batch_size, steps, warmup, threads, pad_fraction):
+    import torch
+    from model_competitive import CompetitiveGenome, make_block
+
+    torch.set_num_threads(threads)
+    torch.manual_seed(0)
+    genome = CompetitiveGenome(**VARIANTS[variant])
+    block = make_block(genome).train()
+    x = torch.randn(batch_size, seq_len, genome.d_model, requires_grad=True)
+    mask = torch.zeros(batch_size, seq_len, dtype=torch.bool)
+    # Emulate PIQA's ragged lengths: half the rows end in padding
+    mask[::2, int(seq_len * (1 - pad_fraction)):] = True
+
+    def step():
+        block(x, mask).sum().backward()
+        block.zero_grad(set_to_none=True)
+        x.grad = None
+
+    for _ in range(warmup):
+        step()
+    baseline_rss = _peak_rss_mb()
+    start = time.perf_counter()
+    for _ in range(steps):
+        step()
+    elapsed = time.perf_counter() - start
+    return {
+        'variant': variant,
+        'seq_len': seq_len,
+        'batch_size': batch_size,
+        'step_ms': 1000.0 * elapsed / steps,
+        'tokens_per_sec': batch_size * seq_len * steps / elapsed,
+        'peak_rss_mb': _peak_rss_mb(),
+        'peak_rss_growth_mb': _peak_rss_mb() - baseline_rss,
+    }
+
+def run_case_isolated(*args):
+    """Run one case in a fresh process so peak RSS is not shared between cases"""
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(1) as pool:
+        return pool.apply(_run_case, args)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark evolved-layer block variants')
+    parser.add_argument('--seq-lens', type=int, nargs='+', default=[32, 64, 128])
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--steps', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--threads', type=int, default=torch_default_threads())
+    parser.add_argument('--pad-fraction', type=float, default=0.25)
+    parser.add_argument('--variants', nargs='+', default=list(VARIANTS))
+    parser.add_argument('--output', help='Write results as JSON')
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'Variant':<15} {'Seq':>5} {'Step (ms)':>10} {'Tok/s':>10} {'Peak RSS (MB)':>14}")
+    for seq_len in args.seq_lens:
+        for variant in args.variants:
+            r = run_case_isolated(variant, seq_len, args.batch_size, args.steps,
+                                  args.warmup, args.threads, args.pad_fraction)
+            results.append(r)
+            print(f"{variant:<15} {seq_len:>5} {r['step_ms']:>10.2f} "
+                  f"{r['tokens_per_sec']:>10.0f} {r['peak_rss_mb']:>14.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+"""
+CPU benchmark suite for the model hot paths and the dashboard API
+Times CompetitiveEvoTransformer forward, each evolved-block variant, masked
+mean pooling, the memory-token concat, a full training step and
+GET /api/all-metrics; writes JSON and flags regressions against a baseline
+
+Usage:
+    python benchmarks/bench_suite.py --output results.json
+    python benchmarks/bench_suite.py --baseline benchmarks/baseline.json --tolerance 0.10
+    python benchmarks/bench_suite.py --only forward block --save-baseline benchmarks/baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import torch
+
+from bench_blocks import VARIANTS, torch_default_threads
+from data_pipeline import synthetic_batch
+
+GROUPS = ('forward', 'block', 'pool', 'memory_concat', 'train_step', 'dashboard')
+
+def time_callable(fn, repeats, warmup):
+    """Per-call wall times in ms after ``warmup`` untimed calls"""
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(1000.0 * (time.perf_counter() - start))
+    return times
+
+def summarize(times, items=None):
+    """Median/min/mean/stdev (ms) and, with ``items`` per call, throughput"""
+    median = statistics.median(times)
+    summary = {
+        'median_ms': median,
+        'min_ms': min(times),
+        'mean_ms': statistics.fmean(times),
+        'stdev_ms': statistics.stdev(times) if len(times) > 1 else 0.0,
+        'repeats': len(times),
+    }
+    if items is not None:
+        summary['items_per_sec'] = items / (median / 1000.0)
+    return summary
+
+def build_model(genome_kwargs, roberta_layers):
+    from transformers import RobertaConfig, RobertaModel
+    from model_competitive import CompetitiveEvoTransformer, CompetitiveGenome
+
+    torch.manual_seed(0)
+    # roberta-base shape with random weights: no download, same compute
+    config = RobertaConfig(num_hidden_layers=roberta_layers)
+    roberta = RobertaModel(config, add_pooling_layer=False)
+    return CompetitiveEvoTransformer(CompetitiveGenome(**genome_kwargs), roberta)
+
+def bench_forward(args):
+    model = build_model({'memory_enabled': True}, args.roberta_layers).eval()
+    results = {}
+    for batch_size in args.batch_sizes:
+        for seq_len in args.seq_lens:
+            input_ids, attention_mask = synthetic_batch(batch_size, seq_len)
+            flat_ids, flat_mask = input_ids.view(-1, seq_len), attention_mask.view(-1, seq_len)
+
+            @torch.inference_mode()
+            def forward():
+                model(flat_ids, flat_mask)
+
+            times = time_callable(forward, args.repeats, args.warmup)
+            results[f'forward/b{batch_size}_s{seq_len}'] = summarize(times, batch_size)
+    return results
+
+def bench_blocks(args):
+    from model_competitive import CompetitiveGenome, make_block
+
+    results = {}
+    for variant, kwargs in VARIANTS.items():
+        torch.manual_seed(0)
+        block = make_block(CompetitiveGenome(**kwargs)).train()
+        for seq_len in args.seq_lens:
+            batch_size = max(args.batch_sizes) * 2
+            x = torch.randn(batch_size, seq_len, block.norm1.normalized_shape[0],
+                            requires_grad=True)
+            mask = torch.zeros(batch_size, seq_len, dtype=torch.bool)
+            mask[::2, int(seq_len * 0.75):] = True
+
+            def step():
+                block(x, mask).sum().backward()
+                block.zero_grad(set_to_none=True)
+                x.grad = None
+
+            times = time_callable(step, args.repeats, args.warmup)
+            results[f'block/{variant}/s{seq_len}'] = summarize(times, batch_size * seq_len)
+    return results
+
+def bench_pool(args):
+    from model_competitive import masked_mean_pool
+
+    results = {}
+    for seq_len in args.seq_lens:
+        batch_size = max(args.batch_sizes) * 2
+        x = torch.randn(batch_size, seq_len + 1, 768)
+        pad_mask = torch.zeros(batch_size, seq_len + 1, dtype=torch.bool)
+        pad_mask[::2, int(seq_len * 0.75):] = True
+
+        @torch.inference_mode()
+        def pool():
+            masked_mean_pool(x, pad_mask)
+
+        times = time_callable(pool, args.repeats * 5, args.warmup)
+        results[f'pool/b{batch_size}_s{seq_len}'] = summarize(times, batch_size)
+    return results
+
+def bench_memory_concat(args):
+    model = build_model({'memory_enabled': True, 'num_layers': 1}, 1)
+    results = {}
+    for seq_len in args.seq_lens:
+        batch_size = max(args.batch_sizes) * 2
+        x = torch.randn(batch_size, seq_len, 768)
+        attention_mask = torch.ones(batch_size, seq_len, dtype=torch.long)
+
+        @torch.inference_mode()
+        def concat():
+            model.prepend_memory(x, attention_mask)
+
+        times = time_callable(concat, args.repeats * 5, args.warmup)
+        results[f'memory_concat/b{batch_size}_s{seq_len}'] = summarize(times, batch_size)
+    return results
+
+def bench_train_step(args):
+    from trainer import GenomeTrainer
+
+    model = build_model({}, args.roberta_layers)
+    trainer = GenomeTrainer(model.genome, None, [], [], model=model, seed=0)
+    trainer.model.train()
+    results = {}
+    batch_size = min(args.batch_sizes)
+    for seq_len in args.seq_lens:
+        input_ids, attention_mask = synthetic_batch(batch_size, seq_len)
+        batch = {'input_ids': input_ids, 'attention_mask': attention_mask,
+                 'labels': torch.arange(batch_size) % 2}
+        times = time_callable(lambda: trainer.train_step(batch), args.repeats, args.warmup)
+        summary = summarize(times, batch_size)
+        # cost_model.Calibration.from_benchmark fits step time to these
+        summary.update(genome=model.genome.to_dict(), batch_size=batch_size, seq_len=seq_len)
+        results[f'train_step/b{batch_size}_s{seq_len}'] = summary
+    return results
+
+def bench_dashboard(args):
+    sys.path.insert(0, os.path.join(ROOT, 'dashboard'))
+    from app import app
+
+    client = app.test_client()
+
+    def request():
+        response = client.get('/api/all-metrics')
+        assert response.status_code == 200
+        response.get_data()
+
+    times = time_callable(request, args.repeats * 20, args.warmup)
+    return {'dashboard/all_metrics': summarize(times, 1)}
+
+BENCHMARKS = {
+    'forward': bench_forward,
+    'block': bench_blocks,
+    'pool': bench_pool,
+    'memory_concat': bench_memory_concat,
+    'train_step': bench_train_step,
+    'dashboard': bench_dashboard,
+}
+
+def environment(threads):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'torch': torch.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'threads': threads,
+    }
+
+def compare(results, baseline, tolerance):
+    """Cases whose median slowed down by more than ``tolerance`` vs the baseline"""
+    regressions = []
+    for name, current in results.items():
+        reference = baseline.get('results', {}).get(name)
+        if reference is None:
+            continue
+        ratio = current['median_ms'] / max(reference['median_ms'], 1e-9)
+        current['baseline_median_ms'] = reference['median_ms']
+        current['change'] = ratio - 1.0
+        if ratio > 1.0 + tolerance:
+            regressions.append((name, reference['median_ms'], current['median_ms'], ratio - 1.0))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='CPU benchmark suite for CompetitiveEvoTransformer')
+    parser.add_argument('--only', nargs='+', choices=GROUPS, default=list(GROUPS))
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--seq-lens', type=int, nargs='+', default=[32, 64, 128])
+    parser.add_argument('--roberta-layers', type=int, default=12)
+    parser.add_argument('--repeats', type=int, default=10)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=torch_default_threads())
+    parser.add_argument('--output', help='Write results as JSON')
+    parser.add_argument('--baseline', help='Compare against a previous JSON result')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='Allowed median slowdown vs the baseline (0.10 = 10%%)')
+    parser.add_argument('--save-baseline', help='Also write results to this baseline path')
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    results = {}
+    for group in args.only:
+        for name, summary in BENCHMARKS[group](args).items():
+            results[name] = summary
+            rate = f"{summary['items_per_sec']:>12.1f}/s" if 'items_per_sec' in summary else ''
+            print(f"{name:<32} {summary['median_ms']:>10.3f} ms  ±{summary['stdev_ms']:<8.3f}{rate}")
+
+    report = {'environment': environment(args.threads), 'config': vars(args), 'results': results}
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        report['baseline'] = {'path': args.baseline, 'environment': baseline.get('environment'),
+                              'tolerance': args.tolerance,
+                              'regressions': [r[0] for r in regressions]}
+        for name, before, after, change in regressions:
+            print(f"REGRESSION {name}: {before:.3f} ms -> {after:.3f} ms (+{100 * change:.1f}%)")
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=2)
+    if regressions:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""
+Resumable, sharded checkpoints for genome search
+Genome shards hold only the tensors training changes (unfrozen RoBERTa layers,
+evolved layers, memory token, heads) and are tied to the frozen base model by
+a content hash; population, results, optimizer and RNG state are stored next
+to them so an interrupted search resumes exactly
+
+Layout:
+    <dir>/state.json                      search progress, population, results
+    <dir>/rng_<step>.pt                   python / numpy / torch RNG states
+    <dir>/shards/<name>_e<epoch>.pt       trainable tensors (mmap-loadable)
+    <dir>/shards/<name>_e<epoch>.optim.pt optimizer, LR schedule, trainer counters
+"""
+
+import hashlib
+import json
+import os
+import random
+import time
+
+import numpy as np
+import torch
+
+from model_competitive import CompetitiveEvoTransformer, CompetitiveGenome, share_frozen_roberta
+
+FORMAT_VERSION = 1
+
+def state_dict_hash(state_dict):
+    """Content hash of a state dict (names, shapes, dtypes, bytes)"""
+    digest = hashlib.sha256()
+    for name, tensor in sorted(state_dict.items()):
+        digest.update(f'{name}:{tuple(tensor.shape)}:{tensor.dtype};'.encode('utf-8'))
+        digest.update(tensor.detach().cpu().contiguous().reshape(-1).view(torch.uint8).numpy())
+    return digest.hexdigest()[:16]
+
+def base_model_hash(roberta):
+    """Content hash of a base model's state dict"""
+    return state_dict_hash(roberta.state_dict())
+
+def trainable_state_dict(model):
+    """State-dict entries training can change
+
+    Frozen RoBERTa parameters and RoBERTa buffers are left out; they are the
+    base model's and are restored from it.
+    """
+    trainable = {f'roberta.{name}' for name, p in model.roberta.named_parameters()
+                 if p.requires_grad}
+    return {k: v for k, v in model.state_dict().items()
+            if not k.startswith('roberta.') or k in trainable}
+
+def _atomic_save(obj, path):
+    tmp_path = path + '.tmp'
+    torch.save(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+def save_shard(model, path, base_hash):
+    _atomic_save({
+        'format': FORMAT_VERSION,
+        'base_hash': base_hash,
+        'genome': model.genome.to_dict(),
+        'state_dict': trainable_state_dict(model),
+    }, path)
+
+def _read_shard(path, base_hash=None):
+    shard = torch.load(path, map_location='cpu', mmap=True, weights_only=True)
+    if base_hash is not None and shard['base_hash'] != base_hash:
+        raise ValueError(f"Shard {path} was trained from base model {shard['base_hash']}, "
+                         f"not {base_hash}")
+    return shard
+
+def _check_complete(model, state_dict, path):
+    missing = set(trainable_state_dict(model)) - set(state_dict)
+    if missing:
+        raise KeyError(f"Shard {path} is missing weights: {sorted(missing)[:5]}")
+
+def load_shard(path, base_roberta, base_hash=None):
+    """Rebuild a model from a shard on top of ``base_roberta``
+
+    The shard is memory-mapped and its tensors are assigned to the model
+    without copying, so pages are only read when a weight is first used.
+    """
+    shard = _read_shard(path, base_hash)
+    genome = CompetitiveGenome.from_dict(shard['genome'])
+    model = CompetitiveEvoTransformer(genome, share_frozen_roberta(base_roberta, genome.unfreeze_layers))
+    _check_complete(model, shard['state_dict'], path)
+    model.load_state_dict(shard['state_dict'], strict=False, assign=True)
+    return model
+
+def rng_state():
+    state = {'python': random.getstate(), 'numpy': np.random.get_state(),
+             'torch': torch.get_rng_state()}
+    if torch.cuda.is_available():
+        state['cuda'] = torch.cuda.get_rng_state_all()
+    return state
+
+def set_rng_state(state):
+    random.setstate(state['python'])
+    np.random.set_state(state['numpy'])
+    torch.set_rng_state(state['torch'])
+    if 'cuda' in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['cuda'])
+
+class SearchCheckpoint:
+    """Directory holding one resumable search
+
+    ``save(state, trainers)`` writes a JSON-serializable ``state`` plus one
+    shard pair per live ``GenomeTrainer``; shards whose trainer has not trained
+    since the previous save are reused. ``state.json`` is replaced last, so a
+    crash mid-save leaves the previous checkpoint intact.
+    """
+
+    STATE_FILE = 'state.json'
+    SHARD_DIR = 'shards'
+
+    def __init__(self, directory, base_roberta=None, base_hash=None):
+        self.directory = directory
+        if base_hash is None and base_roberta is not None:
+            base_hash = base_model_hash(base_roberta)
+        self.base_hash = base_hash
+        os.makedirs(os.path.join(directory, self.SHARD_DIR), exist_ok=True)
+
+    def child(self, name):
+        """Checkpoint for a sub-search (e.g. one Hyperband bracket), same base model"""
+        return SearchCheckpoint(os.path.join(self.directory, name), base_hash=self.base_hash)
+
+    def exists(self):
+        return os.path.exists(os.path.join(self.directory, self.STATE_FILE))
+
+    def _shard_path(self, stem, suffix='.pt'):
+        return os.path.join(self.directory, self.SHARD_DIR, stem + suffix)
+
+    def save(self, state, trainers=None):
+        """Persist search ``state`` and every trainer in ``trainers`` ({name: trainer})"""
+        previous = self.load() if self.exists() else {'step': 0}
+        shards = {}
+        for name, trainer in (trainers or {}).items():
+            stem = f'{name}_e{len(trainer.history)}'
+            if not os.path.exists(self._shard_path(stem, '.optim.pt')):
+                save_shard(trainer.model, self._shard_path(stem), self.base_hash)
+                _atomic_save(trainer.state_dict(), self._shard_path(stem, '.optim.pt'))
+            shards[name] = stem
+
+        step = previous['step'] + 1
+        rng_file = f'rng_{step}.pt'
+        _atomic_save(rng_state(), os.path.join(self.directory, rng_file))
+        payload = {
+            'format': FORMAT_VERSION,
+            'base_hash': self.base_hash,
+            'step': step,
+            'saved_at': time.time(),
+            'rng_file': rng_file,
+            'shards': shards,
+            'state': state,
+        }
+        tmp_path = os.path.join(self.directory, self.STATE_FILE + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, os.path.join(self.directory, self.STATE_FILE))
+        self._remove_unreferenced(payload)
+
+    def _remove_unreferenced(self, payload):
+        keep = {stem + suffix for stem in payload['shards'].values()
+                for suffix in ('.pt', '.optim.pt')}
+        for filename in os.listdir(os.path.join(self.directory, self.SHARD_DIR)):
+            if filename not in keep:
+                os.remove(os.path.join(self.directory, self.SHARD_DIR, filename))
+        for filename in os.listdir(self.directory):
+            if filename.startswith('rng_') and filename != payload['rng_file']:
+                os.remove(os.path.join(self.directory, filename))
+
+    def load(self):
+        """The saved payload: ``{'state', 'shards', 'step', ...}``"""
+        with open(os.path.join(self.directory, self.STATE_FILE), 'r') as f:
+            payload = json.load(f)
+        if self.base_hash is not None and payload['base_hash'] != self.base_hash:
+            raise ValueError(f"Checkpoint {self.directory} was saved against base model "
+                             f"{payload['base_hash']}, not {self.base_hash}")
+        return payload
+
+    def restore_rng(self, payload=None):
+        payload = payload or self.load()
+        set_rng_state(torch.load(os.path.join(self.directory, payload['rng_file']),
+                                 weights_only=False))
+
+    def restore_trainer(self, name, trainer, payload=None):
+        """Load shard ``name`` weights and optimizer state into a freshly built trainer"""
+        payload = payload or self.load()
+        stem = payload['shards'][name]
+        shard = _read_shard(self._shard_path(stem), self.base_hash)
+        _check_complete(trainer.model, shard['state_dict'], self._shard_path(stem))
+        trainer.model.load_state_dict(shard['state_dict'], strict=False)
+        trainer.load_state_dict(torch.load(self._shard_path(stem, '.optim.pt'),
+                                           map_location=trainer.device, weights_only=True))
+        return trainer
+
+    def load_model(self, name, base_roberta, payload=None):
+        """Lazily loaded model for shard ``name`` (for inference or export)"""
+        payload = payload or self.load()
+        return load_shard(self._shard_path(payload['shards'][name]), base_roberta, self.base_hash)
+
+    def disk_usage_mb(self):
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+        return total / (1024 * 1024)
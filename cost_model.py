@@ -0,0 +1,312 @@
+"""
+Analytic cost model for CompetitiveGenome
+Parameter counts, FLOPs per token and training activation memory derived
+from the genome alone, plus a linear calibration from FLOPs to measured step
+time. Pure Python (no torch) so the dashboard can import it.
+
+Usage:
+    python cost_model.py --num-layers 2 --ffn-dim 2048 --unfreeze-layers 4
+    python cost_model.py --calibrate-from bench.json --save-calibration calibration.json
+"""
+
+import argparse
+import json
+
+ROBERTA_BASE = {
+    'vocab_size': 50265,
+    'max_position_embeddings': 514,
+    'type_vocab_size': 1,
+    'hidden_size': 768,
+    'num_hidden_layers': 12,
+    'intermediate_size': 3072,
+    'num_attention_heads': 12,
+    'pooler': True,
+}
+
+# Defaults of CompetitiveGenome, for configs that leave a field out
+GENOME_DEFAULTS = {
+    'num_layers': 2,
+    'd_model': 768,
+    'num_heads': 12,
+    'ffn_dim': 2048,
+    'memory_enabled': False,
+    'unfreeze_layers': 4,
+    'use_contrastive': True,
+    'block_type': 'standard',
+}
+
+# Training runs used as calibration when no benchmark calibration is available
+REFERENCE_RUNS = {
+    # RESULTS_COMPETITIVE.md: 8 epochs over 4x augmented PIQA at max_length 128
+    'Tesla T4': {'hours': 7.5, 'epochs': 8, 'examples_per_epoch': 64452,
+                 'val_examples': 1838, 'seq_len': 128},
+}
+
+BYTES_PER_VALUE = 4  # fp32 training
+
+def genome_config(genome):
+    """Plain dict of the cost-relevant genome fields (genome object or dict)"""
+    if hasattr(genome, 'to_dict'):
+        genome = genome.to_dict()
+    return {key: genome.get(key, default) for key, default in GENOME_DEFAULTS.items()}
+
+def base_config(hf_config):
+    """Cost-model base description from a HuggingFace RobertaConfig"""
+    config = {key: getattr(hf_config, key, ROBERTA_BASE[key])
+              for key in ROBERTA_BASE if key != 'pooler'}
+    config['pooler'] = True
+    return config
+
+def linear_params(d_in, d_out):
+    return d_in * d_out + d_out
+
+def encoder_layer_params(d_model, ffn_dim):
+    """Self-attention (QKV + output), FFN and two LayerNorms"""
+    return (4 * linear_params(d_model, d_model) + linear_params(d_model, ffn_dim)
+            + linear_params(ffn_dim, d_model) + 2 * 2 * d_model)
+
+def estimate_params(genome, base=ROBERTA_BASE):
+    g = genome_config(genome)
+    d = base['hidden_size']
+    embeddings = (base['vocab_size'] + base['max_position_embeddings']
+                  + base['type_vocab_size']) * d + 2 * d
+    encoder_layer = encoder_layer_params(d, base['intermediate_size'])
+    pooler = linear_params(d, d) if base.get('pooler') else 0
+    roberta = embeddings + base['num_hidden_layers'] * encoder_layer + pooler
+
+    evolved = g['num_layers'] * encoder_layer_params(g['d_model'], g['ffn_dim'])
+    classifier = linear_params(g['d_model'], g['d_model'] // 2) + linear_params(g['d_model'] // 2, 1)
+    contrastive = (linear_params(g['d_model'], g['d_model'])
+                   + linear_params(g['d_model'], g['d_model'] // 2)) if g['use_contrastive'] else 0
+    memory = g['d_model'] if g['memory_enabled'] else 0
+    task = evolved + classifier + contrastive + memory
+    return {
+        'roberta': roberta,
+        'unfrozen_roberta': g['unfreeze_layers'] * encoder_layer,
+        'evolved_layers': evolved,
+        'classifier': classifier,
+        'contrastive_head': contrastive,
+        'memory_token': memory,
+        'total': roberta + task,
+        'trainable': g['unfreeze_layers'] * encoder_layer + task,
+    }
+
+def layer_flops_per_token(seq_len, d_model, ffn_dim):
+    """Forward FLOPs per token of one encoder layer (multiply-add = 2)"""
+    projections = 2 * (4 * d_model * d_model + 2 * d_model * ffn_dim)
+    attention = 2 * 2 * seq_len * d_model  # QK^T and attention @ V
+    return projections + attention
+
+def estimate_flops(genome, seq_len=128, base=ROBERTA_BASE, checkpointing=False):
+    """Forward / backward / training FLOPs per input token
+
+    Backward costs about twice the forward and only runs from the lowest
+    unfrozen layer up; frozen layers are forward-only. Activation
+    checkpointing adds one extra forward of the trainable layers.
+    """
+    g = genome_config(genome)
+    d, d_task = base['hidden_size'], g['d_model']
+    roberta_layer = layer_flops_per_token(seq_len, d, base['intermediate_size'])
+    task_seq = seq_len + (1 if g['memory_enabled'] else 0)
+    # Evolved layers see the memory token too; normalize to input tokens
+    evolved = g['num_layers'] * layer_flops_per_token(task_seq, d_task, g['ffn_dim']) * task_seq / seq_len
+    heads = 2 * (estimate_params(g, base)['classifier'] + estimate_params(g, base)['contrastive_head'])
+    heads /= seq_len  # heads run once per sequence
+
+    frozen = (base['num_hidden_layers'] - g['unfreeze_layers']) * roberta_layer
+    trainable = g['unfreeze_layers'] * roberta_layer + evolved + heads
+    forward = frozen + trainable
+    backward = 2 * trainable
+    recompute = trainable - heads if checkpointing else 0
+    return {
+        'forward': forward,
+        'backward': backward,
+        'train': forward + backward + recompute,
+        'frozen_forward_fraction': frozen / forward,
+    }
+
+# Values kept per token and unit of d_model by autograd, measured with
+# memory.saved_activation_mb (fp32, CPU): HF RoBERTa layer, TransformerBlock
+# (nn.MultiheadAttention) and FusedTransformerBlock (SDPA)
+HIDDEN_VALUES_PER_TOKEN = {'roberta': 6, 'standard': 10, 'fused': 9}
+
+def layer_activation_bytes(seq_len, d_model, ffn_dim, num_heads, layer_type='standard'):
+    """Bytes autograd keeps for one sequence through one training-mode layer
+
+    Per token: ``HIDDEN_VALUES_PER_TOKEN`` values of width d_model (layer and
+    projection inputs, Q/K/V, LayerNorm inputs), three of width ffn_dim (FFN
+    hidden pre/post GELU, dropout) and three per head and key (attention
+    probabilities, their dropout and mask).
+    """
+    per_token = (HIDDEN_VALUES_PER_TOKEN[layer_type] * d_model + 3 * ffn_dim
+                 + 3 * num_heads * seq_len)
+    return BYTES_PER_VALUE * seq_len * per_token
+
+def estimate_activation_mb(genome, batch_size=32, seq_len=128, num_choices=2,
+                           base=ROBERTA_BASE, checkpointing=False):
+    """Training activation memory for one batch (every choice is a sequence)
+
+    With ``checkpointing`` this is the backward peak: the kept layer inputs
+    plus the largest layer while it is recomputed.
+    """
+    g = genome_config(genome)
+    sequences = batch_size * num_choices
+    task_seq = seq_len + (1 if g['memory_enabled'] else 0)
+    roberta_layer = layer_activation_bytes(seq_len, base['hidden_size'], base['intermediate_size'],
+                                           base['num_attention_heads'], 'roberta')
+    evolved_layer = layer_activation_bytes(task_seq, g['d_model'], g['ffn_dim'], g['num_heads'],
+                                           g['block_type'])
+    if checkpointing:
+        # Layer inputs are kept; one layer's activations exist during recompute
+        kept = (g['unfreeze_layers'] * seq_len * base['hidden_size']
+                + g['num_layers'] * task_seq * g['d_model']) * BYTES_PER_VALUE
+        per_sequence = kept + max(roberta_layer if g['unfreeze_layers'] else 0,
+                                  evolved_layer if g['num_layers'] else 0)
+    else:
+        per_sequence = g['unfreeze_layers'] * roberta_layer + g['num_layers'] * evolved_layer
+    return sequences * per_sequence / (1024 * 1024)
+
+def estimate_cost(genome, seq_len=128, batch_size=32, num_choices=2, base=ROBERTA_BASE,
+                  checkpointing=False, calibration=None):
+    """Parameters, FLOPs, activation memory and (with ``calibration``) step time"""
+    params = estimate_params(genome, base)
+    flops = estimate_flops(genome, seq_len, base, checkpointing)
+    tokens_per_step = batch_size * num_choices * seq_len
+    cost = {
+        'params': params,
+        'flops_per_token': flops,
+        'train_flops_per_step': flops['train'] * tokens_per_step,
+        'activation_mb': estimate_activation_mb(genome, batch_size, seq_len, num_choices,
+                                                base, checkpointing),
+        # Weights, gradients and two AdamW moments
+        'model_state_mb': BYTES_PER_VALUE * (params['total'] + 3 * params['trainable'])
+                          / (1024 * 1024),
+        'seq_len': seq_len,
+        'batch_size': batch_size,
+    }
+    if calibration is not None:
+        cost['step_seconds'] = calibration.predict_step_seconds(cost['train_flops_per_step'])
+    return cost
+
+class Calibration:
+    """Linear map from training FLOPs per step to wall-clock seconds per step"""
+    def __init__(self, seconds_per_tflop, overhead_seconds=0.0, source=None):
+        self.seconds_per_tflop = seconds_per_tflop
+        self.overhead_seconds = overhead_seconds
+        self.source = source
+
+    def predict_step_seconds(self, train_flops_per_step):
+        return self.overhead_seconds + self.seconds_per_tflop * train_flops_per_step / 1e12
+
+    @classmethod
+    def fit(cls, points, source=None):
+        """Least-squares fit to ``[(train_flops_per_step, seconds), ...]``"""
+        xs = [flops / 1e12 for flops, _ in points]
+        ys = [seconds for _, seconds in points]
+        n = len(points)
+        mean_x, mean_y = sum(xs) / n, sum(ys) / n
+        var_x = sum((x - mean_x) ** 2 for x in xs)
+        if n < 2 or var_x == 0:
+            return cls(sum(ys) / max(sum(xs), 1e-12), 0.0, source)
+        slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var_x
+        intercept = mean_y - slope * mean_x
+        if intercept < 0:
+            # Overhead cannot be negative; fall back to a fit through the origin
+            return cls(sum(x * y for x, y in zip(xs, ys)) / sum(x * x for x in xs), 0.0, source)
+        return cls(slope, intercept, source)
+
+    @classmethod
+    def from_benchmark(cls, path):
+        """Fit to the ``train_step`` cases of a ``benchmarks/bench_suite.py`` JSON report"""
+        with open(path, 'r') as f:
+            report = json.load(f)
+        base = dict(ROBERTA_BASE, num_hidden_layers=report['config']['roberta_layers'],
+                    pooler=False)
+        points = []
+        for name, case in report['results'].items():
+            if name.startswith('train_step/'):
+                flops = estimate_flops(case['genome'], case['seq_len'], base)['train']
+                tokens = case['batch_size'] * 2 * case['seq_len']
+                points.append((flops * tokens, case['median_ms'] / 1000.0))
+        if not points:
+            raise ValueError(f"No train_step results in {path}")
+        return cls.fit(points, source=f"benchmark:{path}")
+
+    @classmethod
+    def from_run(cls, genome, hours, epochs, examples_per_epoch, seq_len=128, batch_size=32,
+                 val_examples=0, base=ROBERTA_BASE):
+        """Calibrate from one completed training run of ``genome``"""
+        run = estimate_training_flops(genome, epochs, examples_per_epoch, seq_len,
+                                      batch_size, val_examples, base)
+        return cls(hours * 3600.0 / (run / 1e12), 0.0, source='run')
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump({'seconds_per_tflop': self.seconds_per_tflop,
+                       'overhead_seconds': self.overhead_seconds, 'source': self.source}, f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            return cls(**json.load(f))
+
+def estimate_training_flops(genome, epochs, examples_per_epoch, seq_len=128, batch_size=32,
+                            val_examples=0, base=ROBERTA_BASE, num_choices=2):
+    """Total FLOPs of training plus per-epoch validation"""
+    flops = estimate_flops(genome, seq_len, base)
+    tokens = num_choices * seq_len
+    return epochs * tokens * (examples_per_epoch * flops['train'] + val_examples * flops['forward'])
+
+def predict_training_hours(genome, calibration, epochs, examples_per_epoch, seq_len=128,
+                           batch_size=32, val_examples=0, base=ROBERTA_BASE):
+    steps = epochs * -(-examples_per_epoch // batch_size)
+    flops = estimate_training_flops(genome, epochs, examples_per_epoch, seq_len, batch_size,
+                                    val_examples, base)
+    return (calibration.seconds_per_tflop * flops / 1e12
+            + calibration.overhead_seconds * steps) / 3600.0
+
+def reference_calibration(genome, device='Tesla T4'):
+    """Calibration implied by a recorded training run on ``device``
+
+    Fitted to that run's genome, so it only predicts something new for other
+    genomes; for the recorded genome it returns the recorded hours.
+    """
+    run = REFERENCE_RUNS[device]
+    return Calibration.from_run(genome, run['hours'], run['epochs'], run['examples_per_epoch'],
+                                run['seq_len'], val_examples=run['val_examples'])
+
+def main():
+    parser = argparse.ArgumentParser(description='Static cost estimate for a CompetitiveGenome')
+    for field, default in GENOME_DEFAULTS.items():
+        flag = '--' + field.replace('_', '-')
+        if isinstance(default, bool):
+            parser.add_argument(flag, type=lambda v: v.lower() in ('1', 'true', 'yes'),
+                                default=default)
+        elif isinstance(default, str):
+            parser.add_argument(flag, choices=sorted(HIDDEN_VALUES_PER_TOKEN.keys() - {'roberta'}),
+                                default=default)
+        else:
+            parser.add_argument(flag, type=int, default=default)
+    parser.add_argument('--seq-len', type=int, default=128)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--checkpointing', action='store_true')
+    parser.add_argument('--calibration', help='Calibration JSON to predict step time')
+    parser.add_argument('--calibrate-from', help='bench_suite.py JSON report to fit')
+    parser.add_argument('--save-calibration')
+    args = parser.parse_args()
+
+    calibration = None
+    if args.calibrate_from:
+        calibration = Calibration.from_benchmark(args.calibrate_from)
+    elif args.calibration:
+        calibration = Calibration.load(args.calibration)
+    if calibration is not None and args.save_calibration:
+        calibration.save(args.save_calibration)
+
+    genome = {field: getattr(args, field) for field in GENOME_DEFAULTS}
+    print(json.dumps(estimate_cost(genome, args.seq_len, args.batch_size,
+                                   checkpointing=args.checkpointing,
+                                   calibration=calibration), indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -3,20 +3,36 @@ EvoTransformer Customer Dashboard - Backend API
 Flask application serving metrics and dashboard UI
 """
 
-from flask import Flask, jsonify, render_template, send_from_directory
+from flask import Flask, abort, jsonify, render_template, request, send_from_directory
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit
 import os
 import json
 from datetime import datetime
-import threading
-import time
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cost_model import REFERENCE_RUNS, Calibration, estimate_params, predict_training_hours
+from delta_sync import MetricsSync
+from log_ingest import LogIngester
+from metrics_parser import MetricsParser
+from metrics_store import MetricsStore
+from response_cache import ResponseCache
 
 app = Flask(__name__,
             static_folder='static',
             template_folder='templates')
 CORS(app)
 socketio = SocketIO(app, cors_allowed_origins="*")
+metrics_parser = MetricsParser()
+# Step-level time series; kept in memory only unless EVO_METRICS_STORE is set
+metrics_store = MetricsStore(os.environ.get('EVO_METRICS_STORE'))
+# Training logs / JSONL metric files to follow, os.pathsep-separated globs
+ingester = LogIngester(socketio, [pattern for pattern in
+                                  os.environ.get('EVO_TRAINING_LOGS', '').split(os.pathsep)
+                                  if pattern], store=metrics_store)
+# Serialized, compressed /api/* bodies, rebuilt when their data version changes
+response_cache = ResponseCache()
 
 # Dashboard metrics data
 METRICS_DATA = {
@@ -108,6 +124,8 @@ METRICS_DATA = {
         "use_contrastive": True,
         "total_parameters": 40561025
     },
+    # Followed training runs (EVO_TRAINING_LOGS), keyed by run; see publish_live_run
+    "live_runs": {},
     "roadmap": [
         {
             "enhancement": "RoBERTa-Large",
@@ -136,6 +154,86 @@ METRICS_DATA = {
     ]
 }
 
+def apply_cost_model(metrics):
+    """Fill parameter counts, efficiency and training time from the cost model
+
+    With ``EVO_CALIBRATION`` (see ``cost_model.py --save-calibration``) the
+    training time is predicted from that calibration; otherwise the recorded
+    GPU run is reported as is (a calibration fitted to that run would only
+    repeat it). ``training_time_source`` says which.
+    """
+    architecture = metrics["architecture"]
+    genome = {
+        "num_layers": architecture["num_evolved_layers"],
+        "d_model": architecture["hidden_dim"],
+        "num_heads": architecture["num_attention_heads"],
+        "ffn_dim": architecture["ffn_dim"],
+        "unfreeze_layers": architecture["unfreeze_layers"],
+        "use_contrastive": architecture["use_contrastive"],
+    }
+    trainable = estimate_params(genome)["trainable"]
+    architecture["total_parameters"] = trainable
+    for entry in metrics["competitive_comparison"]:
+        if entry["model"] == "Competitive EvoTransformer":
+            entry["parameters"] = round(trainable / 1e6, 1)
+            entry["efficiency"] = round(entry["accuracy"] / entry["parameters"], 2)
+
+    resources = metrics["resources"]
+    run = REFERENCE_RUNS[resources["gpu"]]
+    if os.environ.get("EVO_CALIBRATION"):
+        calibration = Calibration.load(os.environ["EVO_CALIBRATION"])
+        hours = predict_training_hours(genome, calibration, run["epochs"],
+                                       run["examples_per_epoch"], run["seq_len"],
+                                       resources["batch_size"], run["val_examples"])
+        resources["training_time_source"] = f"predicted ({calibration.source or 'calibration'})"
+    else:
+        hours = run["hours"]
+        resources["training_time_source"] = f"recorded ({resources['gpu']} run)"
+    resources["training_time"] = f"{hours:.1f} hours"
+
+apply_cost_model(METRICS_DATA)
+
+# Sequence number and recent changes per METRICS_DATA section
+metrics_sync = MetricsSync(METRICS_DATA)
+
+def update_metrics_section(section, value):
+    """Replace one METRICS_DATA section and push only what changed to clients"""
+    METRICS_DATA[section] = value
+    change = metrics_sync.publish(section, value)
+    if change is None:
+        return
+    response_cache.invalidate(section)
+    response_cache.invalidate('all')
+    socketio.emit('metrics_delta', metrics_sync.message([change]))
+
+def live_run_entry(run):
+    """``live_runs`` entry for one followed run: its epoch curve and best accuracy"""
+    progress, best = [], None
+    for epoch in run['epochs']:
+        val_acc = epoch.get('val_acc')
+        is_best = val_acc is not None and (best is None or val_acc > best)
+        if is_best:
+            best = val_acc
+        progress.append({"epoch": epoch.get('epoch', len(progress) + 1), "accuracy": val_acc,
+                         "loss": epoch.get('train_loss'), "is_best": is_best})
+    updated = run['updated_at']
+    return {"epochs": progress, "best_accuracy": run['best_val_acc'],
+            "last_updated": datetime.fromtimestamp(updated).isoformat() if updated else None}
+
+def publish_live_run(run):
+    """Push one followed run's new epochs to clients (overview stays curated)"""
+    live_runs = dict(METRICS_DATA["live_runs"])
+    live_runs[run['run']] = live_run_entry(run)
+    update_metrics_section("live_runs", live_runs)
+
+# Followed training runs feed the live_runs section
+ingester.on_epoch = publish_live_run
+
+def section_response(section):
+    """Cached JSON response for one METRICS_DATA section"""
+    return response_cache.respond(section, metrics_sync.seq[section],
+                                  lambda: METRICS_DATA[section])
+
 # API Routes
 @app.route('/')
 def index():
@@ -145,42 +243,81 @@ def index():
 @app.route('/api/overview')
 def get_overview():
     """Get overview metrics"""
-    return jsonify(METRICS_DATA['overview'])
+    return section_response('overview')
 
 @app.route('/api/training-progress')
 def get_training_progress():
     """Get training progress data"""
-    return jsonify(METRICS_DATA['training_progress'])
+    return section_response('training_progress')
 
 @app.route('/api/competitive-comparison')
 def get_competitive_comparison():
     """Get competitive model comparison"""
-    return jsonify(METRICS_DATA['competitive_comparison'])
+    return section_response('competitive_comparison')
 
 @app.route('/api/feature-impact')
 def get_feature_impact():
     """Get feature impact analysis"""
-    return jsonify(METRICS_DATA['feature_impact'])
+    return section_response('feature_impact')
 
 @app.route('/api/resources')
 def get_resources():
     """Get resource utilization metrics"""
-    return jsonify(METRICS_DATA['resources'])
+    return section_response('resources')
 
 @app.route('/api/architecture')
 def get_architecture():
     """Get model architecture details"""
-    return jsonify(METRICS_DATA['architecture'])
+    return section_response('architecture')
 
 @app.route('/api/roadmap')
 def get_roadmap():
     """Get product roadmap"""
-    return jsonify(METRICS_DATA['roadmap'])
+    return section_response('roadmap')
+
+@app.route('/api/live-runs')
+def get_live_runs():
+    """Get the epoch curves of followed training runs"""
+    return section_response('live_runs')
 
 @app.route('/api/all-metrics')
 def get_all_metrics():
     """Get all metrics at once"""
-    return jsonify(METRICS_DATA)
+    seqs = metrics_sync.versions()
+    response = response_cache.respond('all', tuple(seqs.values()), lambda: METRICS_DATA)
+    # Where live updates should resume from (see request_live_metrics)
+    response.headers['X-Metrics-Seq'] = json.dumps({'session': metrics_sync.session,
+                                                    'seq': seqs})
+    return response
+
+@app.route('/api/parsed-metrics')
+def get_parsed_metrics():
+    """Get metrics parsed from the project files (re-parsed only when they change)"""
+    metrics = metrics_parser.get_all_metrics()
+    version = metrics_parser.version
+    return response_cache.respond('parsed', version, lambda: dict(metrics, version=version))
+
+@app.route('/api/runs')
+def get_runs():
+    """Get the latest state of every followed training run"""
+    return jsonify(ingester.snapshot())
+
+@app.route('/api/timeseries/runs')
+def get_timeseries_runs():
+    """Get every run in the metrics store with its point count and time span"""
+    return jsonify(metrics_store.runs())
+
+@app.route('/api/timeseries')
+def get_timeseries():
+    """Get one run's step metrics, rolled up to at most max_points buckets"""
+    run = request.args.get('run')
+    try:
+        series = metrics_store.query(run, start=request.args.get('start', type=float),
+                                     end=request.args.get('end', type=float),
+                                     max_points=request.args.get('max_points', 1000, type=int))
+    except KeyError:
+        abort(404, description=f"Unknown run: {run}")
+    return jsonify(series)
 
 # WebSocket events for real-time updates
 @socketio.on('connect')
@@ -195,21 +332,24 @@ def handle_disconnect():
     print('Client disconnected')
 
 @socketio.on('request_live_metrics')
-def handle_live_metrics_request():
-    """Send live metrics to client"""
-    emit('live_metrics_update', METRICS_DATA['overview'])
-
-# Background task for simulating live training updates (for demo)
-def simulate_live_training():
-    """Simulate live training updates for demo purposes"""
-    while True:
-        time.sleep(5)  # Update every 5 seconds
-        # In production, this would read from actual training logs
-        socketio.emit('training_update', {
-            'timestamp': datetime.now().isoformat(),
-            'status': 'idle',
-            'message': 'Model training completed. System ready for inference.'
-        })
+def handle_live_metrics_request(data=None):
+    """Send a (re)connecting client only what it missed since its last sequence numbers
+
+    ``data`` is ``{'session': ..., 'seq': {section: n}, 'runs_seq': n}`` as
+    last seen by the client; anything missing or from another server
+    session gets full values.
+    """
+    data = data if isinstance(data, dict) else {}
+    session = data.get('session')
+    emit('metrics_delta', metrics_sync.message(metrics_sync.changes_since(data.get('seq'), session)))
+
+    runs_seq = data.get('runs_seq') if session == metrics_sync.session else None
+    state = ingester.resume(runs_seq if isinstance(runs_seq, int) else None)
+    if 'runs' in state:
+        emit('training_snapshot', state)
+    else:
+        for payload in state['updates']:
+            emit(ingester.EVENT, payload)
 
 # Health check endpoint
 @app.route('/health')
@@ -230,8 +370,11 @@ if __name__ == '__main__':
     print("💚 Health Check: http://localhost:5000/health")
     print("=" * 60)
 
-    # Start background thread for live updates
-    # background_thread = threading.Thread(target=simulate_live_training, daemon=True)
-    # background_thread.start()
+    # Follow training logs and push live updates
+    if ingester.patterns:
+        print(f"📈 Following training logs: {', '.join(ingester.patterns)}")
+        ingester.start()
+        update_metrics_section("live_runs", {run_id: live_run_entry(run)
+                                             for run_id, run in ingester.snapshot().items()})
 
     socketio.run(app, host='0.0.0.0', port=5000, debug=True, allow_unsafe_werkzeug=True)
@@ -0,0 +1,95 @@
+"""
+Versioned delta sync for dashboard metric sections
+Every section carries a sequence number; publishing a new value produces a
+small change (changed fields, appended or edited list items) that clients
+apply in order, and reconnecting clients catch up from their last sequence
+"""
+
+import json
+import threading
+import uuid
+from collections import deque
+from typing import Dict, List, Optional
+
+def _copy(value):
+    # JSON round trip: a private deep copy of exactly what clients can see
+    return json.loads(json.dumps(value))
+
+def diff(old, new) -> Optional[Dict]:
+    """Change turning ``old`` into ``new``, or None if they are equal
+
+    Dicts give ``{'op': 'merge', 'set': {...}, 'unset': [...]}`` (top-level
+    fields), lists that did not shrink give ``{'op': 'list', 'start': n,
+    'append': [...], 'update': [[index, item], ...]}``, anything else
+    ``{'op': 'replace', 'value': new}``. Every op is idempotent, so applying
+    one twice is harmless.
+    """
+    if old == new:
+        return None
+    if isinstance(old, dict) and isinstance(new, dict):
+        return {'op': 'merge',
+                'set': {key: value for key, value in new.items()
+                        if key not in old or old[key] != value},
+                'unset': [key for key in old if key not in new]}
+    if isinstance(old, list) and isinstance(new, list) and len(new) >= len(old):
+        return {'op': 'list', 'start': len(old), 'append': new[len(old):],
+                'update': [[i, new[i]] for i in range(len(old)) if old[i] != new[i]]}
+    return {'op': 'replace', 'value': new}
+
+class MetricsSync:
+    """Sequence numbers and recent changes of named sections
+
+    ``publish(section, value)`` bumps the section's sequence and returns its
+    change (None when nothing changed). The last ``history`` changes per
+    section are kept so ``changes_since`` can bring a client from any recent
+    sequence up to date; older or unknown sequences get a ``replace``.
+    ``session`` is new on every server start, so a client holding sequences
+    from a previous server resyncs from scratch.
+    """
+
+    def __init__(self, sections: Dict, history: int = 128):
+        self.session = uuid.uuid4().hex[:12]
+        self.values = {name: _copy(value) for name, value in sections.items()}
+        self.seq = dict.fromkeys(sections, 1)
+        self.history_size = history
+        self.history = {name: deque(maxlen=history) for name in sections}
+        self._lock = threading.Lock()
+
+    def versions(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.seq)
+
+    def publish(self, section: str, value) -> Optional[Dict]:
+        value = _copy(value)
+        with self._lock:
+            change = diff(self.values.get(section), value)
+            if change is None:
+                return None
+            self.values[section] = value
+            self.seq[section] = self.seq.get(section, 0) + 1
+            change.update(section=section, seq=self.seq[section])
+            self.history.setdefault(section, deque(maxlen=self.history_size)).append(change)
+            return change
+
+    def changes_since(self, seqs: Optional[Dict[str, int]], session: Optional[str] = None) -> List[Dict]:
+        """Changes a client at ``seqs`` (section -> last applied sequence) is missing"""
+        if session != self.session or not seqs:
+            seqs = {}
+        changes = []
+        with self._lock:
+            for section, current in self.seq.items():
+                client_seq = seqs.get(section)
+                if client_seq == current:
+                    continue
+                history = self.history[section]
+                if (isinstance(client_seq, int) and client_seq < current
+                        and history and history[0]['seq'] <= client_seq + 1):
+                    changes.extend(change for change in history if change['seq'] > client_seq)
+                else:
+                    changes.append({'section': section, 'seq': current, 'op': 'replace',
+                                    'value': self.values[section]})
+        return changes
+
+    def message(self, changes: List[Dict]) -> Dict:
+        """``metrics_delta`` payload for a list of changes"""
+        return {'session': self.session, 'changes': changes}
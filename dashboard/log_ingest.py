@@ -0,0 +1,240 @@
+"""
+Streaming training-log ingestion for the dashboard
+Follows JSONL metric files (``GenomeTrainer`` ``metrics_sink`` output) by
+byte offset, parses new step and epoch records, and pushes only what changed to Socket.IO clients as
+``training_update`` events, coalesced and rate limited
+"""
+
+import glob
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+def parse_line(line: str, default_run: str) -> Optional[Dict]:
+    """Step/epoch record from one JSONL line, or None for anything else
+
+    Lines are ``GenomeTrainer`` ``metrics_sink`` records (``type`` is
+    ``'step'`` or ``'epoch'``); anything that is not such a JSON object is
+    skipped. Records without a ``run`` field belong to ``default_run``.
+    """
+    line = line.strip()
+    if not line.startswith('{'):
+        return None
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(record, dict):
+        return None
+    record_type = record.get('type')
+    if record_type is None:
+        record_type = 'epoch' if 'val_acc' in record else 'step' if 'step' in record else None
+    if record_type not in ('step', 'epoch'):
+        return None
+    return dict(record, type=record_type, run=str(record.get('run') or default_run))
+
+class LogTailer:
+    """Incremental reader for one growing log file
+
+    Remembers the byte offset already consumed and holds back a trailing
+    partial line until it is completed. A truncated or replaced file
+    (smaller size or new inode) is read again from the start.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 1 << 20):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.offset = 0
+        self._inode = None
+        self._partial = b''
+
+    def read_lines(self) -> List[str]:
+        """Complete lines appended since the last call (at most ``max_bytes`` read)"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return []
+        if stat.st_ino != self._inode or stat.st_size < self.offset:
+            self._inode = stat.st_ino
+            self.offset = 0
+            self._partial = b''
+        if stat.st_size == self.offset:
+            return []
+
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(self.max_bytes)
+        self.offset += len(data)
+        lines = (self._partial + data).split(b'\n')
+        self._partial = lines.pop()
+        return [line.decode('utf-8', errors='replace') for line in lines if line.strip()]
+
+class LogIngester:
+    """Tail training logs and emit coalesced ``training_update`` events
+
+    ``patterns`` are glob patterns re-expanded every poll, so runs that start
+    later are picked up. Between two emits, step records are coalesced to the
+    latest one per run (with a count) and epoch records are sent in full;
+    emits happen at most every ``min_emit_interval`` seconds. Payload::
+
+        {'seq': n, 'timestamp': ..., 'runs': {run: {'epochs': [...], 'step': {...},
+                                                    'steps': n, 'best_val_acc': ...}}}
+
+    ``seq`` numbers the emitted updates; the last ``history`` of them are kept
+    so a reconnecting client can replay what it missed (``resume``).
+
+    ``socketio`` is the Flask-SocketIO server (anything with ``emit``,
+    ``start_background_task`` and ``sleep`` works). With a ``store``
+    (``metrics_store.MetricsStore``) every step record is also appended to it.
+    ``on_epoch(run)``, if set, is called from ``flush`` once per run that got
+    new epochs in that update, with a copy of the run's state. ``start`` first
+    catches up on existing log contents (``backfill``) without calling it.
+    """
+
+    EVENT = 'training_update'
+
+    def __init__(self, socketio, patterns, poll_interval: float = 1.0,
+                 min_emit_interval: float = 0.5, max_bytes: int = 1 << 20, store=None,
+                 history: int = 256, on_epoch=None):
+        self.socketio = socketio
+        self.store = store
+        self.on_epoch = on_epoch
+        self.patterns = [patterns] if isinstance(patterns, str) else list(patterns)
+        self.poll_interval = poll_interval
+        self.min_emit_interval = min_emit_interval
+        self.max_bytes = max_bytes
+        self.tailers = {}
+        self.runs = {}
+        self._pending = {}
+        self._last_emit = 0.0
+        self.seq = 0
+        self.history = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._running = False
+
+    def _discover(self):
+        for pattern in self.patterns:
+            for path in glob.glob(pattern):
+                if path not in self.tailers and os.path.isfile(path):
+                    self.tailers[path] = LogTailer(path, self.max_bytes)
+
+    def ingest(self, record: Dict, source: str):
+        """Fold one parsed record into run state and the pending update"""
+        run_id = record['run']
+        with self._lock:
+            run = self.runs.setdefault(run_id, {
+                'run': run_id, 'source': source, 'epochs': [], 'step': None,
+                'best_val_acc': None, 'updated_at': None})
+            pending = self._pending.setdefault(run_id, {'epochs': [], 'step': None, 'steps': 0})
+            run['updated_at'] = record.get('time', time.time())
+            if record['type'] == 'step':
+                if self.store is not None:
+                    self.store.append_record(record)
+                run['step'] = record
+                pending['step'] = record
+                pending['steps'] += 1
+            else:
+                run['epochs'].append(record)
+                pending['epochs'].append(record)
+                val_acc = record.get('val_acc')
+                if val_acc is not None and (run['best_val_acc'] is None
+                                            or val_acc > run['best_val_acc']):
+                    run['best_val_acc'] = val_acc
+            pending['best_val_acc'] = run['best_val_acc']
+
+    def poll(self) -> int:
+        """Read every followed file once; returns the number of records ingested"""
+        self._discover()
+        count = 0
+        for path, tailer in list(self.tailers.items()):
+            default_run = os.path.splitext(os.path.basename(path))[0]
+            for line in tailer.read_lines():
+                record = parse_line(line, default_run)
+                if record is not None:
+                    self.ingest(record, path)
+                    count += 1
+        return count
+
+    def flush(self, force: bool = False) -> Optional[Dict]:
+        """Emit pending changes if the rate limit allows; returns the payload sent"""
+        now = time.monotonic()
+        with self._lock:
+            if not self._pending or (not force and now - self._last_emit < self.min_emit_interval):
+                return None
+            self.seq += 1
+            payload = {'seq': self.seq, 'timestamp': datetime.now().isoformat(),
+                       'runs': self._pending}
+            self.history.append(payload)
+            updated = [dict(self.runs[run_id], epochs=list(self.runs[run_id]['epochs']))
+                       for run_id, pending in self._pending.items() if pending['epochs']]
+            self._pending = {}
+            self._last_emit = now
+        self.socketio.emit(self.EVENT, payload)
+        if self.on_epoch is not None:
+            for run in updated:
+                self.on_epoch(run)
+        return payload
+
+    def backfill(self) -> int:
+        """Read what the followed files already contain without emitting it
+
+        Runs are loaded into ``runs`` (and steps into the store), but no
+        update is emitted and ``on_epoch`` is not called; clients get this
+        state as a snapshot. Returns the number of records read.
+        """
+        count = 0
+        while True:
+            read = self.poll()
+            if not read:
+                break
+            count += read
+        with self._lock:
+            self._pending = {}
+            # Clients holding an older sequence get a snapshot, not an empty replay
+            self.seq += 1
+        return count
+
+    def _snapshot(self) -> Dict:
+        return {run_id: dict(run, epochs=list(run['epochs'])) for run_id, run in self.runs.items()}
+
+    def snapshot(self) -> Dict:
+        """Current state of every run (for clients that connect mid-training)"""
+        with self._lock:
+            return self._snapshot()
+
+    def resume(self, seq: Optional[int] = None) -> Dict:
+        """What a client that last saw update ``seq`` is missing
+
+        ``{'seq': n, 'updates': [...]}`` with the updates emitted after
+        ``seq`` while they are all still kept, otherwise ``{'seq': n,
+        'runs': snapshot()}``.
+        """
+        with self._lock:
+            if (seq is not None and seq <= self.seq
+                    and (seq == self.seq or (self.history and self.history[0]['seq'] <= seq + 1))):
+                return {'seq': self.seq,
+                        'updates': [payload for payload in self.history if payload['seq'] > seq]}
+            return {'seq': self.seq, 'runs': self._snapshot()}
+
+    def run(self):
+        while self._running:
+            self.poll()
+            self.flush()
+            if self.store is not None:
+                self.store.flush()
+            self.socketio.sleep(self.poll_interval)
+        self.flush(force=True)
+        if self.store is not None:
+            self.store.flush()
+
+    def start(self):
+        self.backfill()
+        self._running = True
+        return self.socketio.start_background_task(self.run)
+
+    def stop(self):
+        self._running = False
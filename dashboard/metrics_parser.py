@@ -5,11 +5,40 @@ Parses data from RESULTS_COMPETITIVE.md and other project files
 
 import re
 import os
-from typing import Dict, List, Optional
+import threading
+from typing import Dict, Optional, Tuple
 from datetime import datetime
 
+# RESULTS_COMPETITIVE.md, scanned once as a whole file: one alternative per
+# metric, told apart by named group (table rows may span line breaks)
+RESULTS_PATTERN = re.compile(
+    r'Validation Accuracy:\s*(?P<validation>[\d.]+)%'
+    r'|Competitive EvoTransformer:\s*(?P<competitive>[\d.]+)%'
+    r'|Original.*?:\s*(?P<baseline>[\d.]+)%'
+    r'|Epoch\s+(?P<epoch>\d+):\s+(?P<epoch_accuracy>[\d.]+)%'
+    # | Model | Accuracy | Parameters |
+    r'|\|\s*(?P<model>[^|]+)\s*\|\s*(?P<accuracy>[\d.]+)%?\s*\|\s*(?P<parameters>[\d.]+)M?'
+    r'|\+\s*(?P<improvement>[\d.]+)%')
+
+# model_competitive.py patterns: field -> (pattern, type)
+ARCHITECTURE_PATTERNS = {
+    'num_layers': (re.compile(r'num_layers[\'"]?\s*[:=]\s*(\d+)'), int),
+    'num_heads': (re.compile(r'num_heads[\'"]?\s*[:=]\s*(\d+)'), int),
+    'ffn_dim': (re.compile(r'ffn_dim[\'"]?\s*[:=]\s*(\d+)'), int),
+    'd_model': (re.compile(r'd_model[\'"]?\s*[:=]\s*(\d+)'), int),
+    'dropout': (re.compile(r'dropout[\'"]?\s*[:=]\s*([\d.]+)'), float),
+    'unfreeze_layers': (re.compile(r'unfreeze_layers[\'"]?\s*[:=]\s*(\d+)'), int),
+}
+
 class MetricsParser:
-    """Parse metrics from project files"""
+    """Parse metrics from project files
+
+    Parsed results are cached per file and reused until the file's mtime or
+    size changes, so repeated calls only cost two ``os.stat``. Safe to share
+    between request threads; returned dicts are shared and must not be
+    modified by callers. ``version`` increases whenever a re-parse changes
+    the output.
+    """
 
     def __init__(self, project_root: str = None):
         if project_root is None:
@@ -20,107 +49,81 @@ class MetricsParser:
 
         self.results_file = os.path.join(self.project_root, 'RESULTS_COMPETITIVE.md')
         self.readme_file = os.path.join(self.project_root, 'README.md')
+        self.model_file = os.path.join(self.project_root, 'model_competitive.py')
+
+        self.version = 0
+        self._lock = threading.Lock()
+        # path -> (signature, parsed)
+        self._cache = {}
+        self._all_metrics = None
+        self._all_signature = None
+
+    @staticmethod
+    def _signature(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _cached(self, path: str, parse, default):
+        """Parsed content of ``path``, re-parsed only when its signature changes"""
+        signature = self._signature(path)
+        entry = self._cache.get(path)
+        if entry is not None and entry[0] == signature:
+            return entry[1], signature
+        if signature is None:
+            parsed = default()
+        else:
+            with open(path, 'r') as f:
+                parsed = parse(f.read())
+        self._cache[path] = (signature, parsed)
+        return parsed, signature
 
     def parse_results_file(self) -> Dict:
         """Parse RESULTS_COMPETITIVE.md file"""
-        if not os.path.exists(self.results_file):
-            return self._get_default_metrics()
+        with self._lock:
+            return self._cached(self.results_file, self._scan_results, self._get_default_metrics)[0]
+
+    def _scan_results(self, content: str) -> Dict:
+        """Accuracies, epochs, comparison rows and improvement in one pass over the file
+
+        The first match of each single-valued metric wins; matches do not
+        overlap, so text already consumed by a table row is not re-read.
+        """
+        accuracies, epochs, comparisons, improvements = {}, [], [], {}
+        for match in RESULTS_PATTERN.finditer(content):
+            kind = match.lastgroup
+            if kind in ('validation', 'competitive', 'baseline'):
+                accuracies.setdefault(kind, float(match.group(kind)))
+            elif kind == 'epoch_accuracy':
+                epochs.append({
+                    'epoch': int(match.group('epoch')),
+                    'accuracy': float(match.group('epoch_accuracy')),
+                    'is_best': False  # Would need more context to determine
+                })
+            elif kind == 'parameters':
+                model_name = match.group('model').strip()
+                # Skip table headers
+                if 'Model' in model_name or 'Acc' in model_name:
+                    continue
+                accuracy, params = float(match.group('accuracy')), float(match.group('parameters'))
+                comparisons.append({
+                    'model': model_name,
+                    'accuracy': accuracy,
+                    'parameters': params,
+                    'efficiency': accuracy / params if params > 0 else 0
+                })
+            else:
+                improvements.setdefault('total', float(match.group('improvement')))
 
-        with open(self.results_file, 'r') as f:
-            content = f.read()
-
-        metrics = {
-            'accuracies': self._extract_accuracies(content),
-            'training_epochs': self._extract_training_epochs(content),
-            'model_comparisons': self._extract_model_comparisons(content),
-            'improvements': self._extract_improvements(content)
+        return {
+            'accuracies': accuracies,
+            'training_epochs': epochs,
+            'model_comparisons': comparisons,
+            'improvements': improvements
         }
 
-        return metrics
-
-    def _extract_accuracies(self, content: str) -> Dict[str, float]:
-        """Extract accuracy values from content"""
-        accuracies = {}
-
-        # Pattern for validation accuracy
-        val_acc_pattern = r'Validation Accuracy:\s*([\d.]+)%'
-        match = re.search(val_acc_pattern, content)
-        if match:
-            accuracies['validation'] = float(match.group(1))
-
-        # Pattern for competitive accuracy
-        comp_pattern = r'Competitive EvoTransformer:\s*([\d.]+)%'
-        match = re.search(comp_pattern, content)
-        if match:
-            accuracies['competitive'] = float(match.group(1))
-
-        # Pattern for baseline
-        baseline_pattern = r'Original.*?:\s*([\d.]+)%'
-        match = re.search(baseline_pattern, content)
-        if match:
-            accuracies['baseline'] = float(match.group(1))
-
-        return accuracies
-
-    def _extract_training_epochs(self, content: str) -> List[Dict]:
-        """Extract training epoch data"""
-        epochs = []
-
-        # Pattern for epoch data: Epoch X: XX.XX%
-        epoch_pattern = r'Epoch\s+(\d+):\s+([\d.]+)%'
-        matches = re.findall(epoch_pattern, content)
-
-        for match in matches:
-            epoch_num = int(match[0])
-            accuracy = float(match[1])
-            epochs.append({
-                'epoch': epoch_num,
-                'accuracy': accuracy,
-                'is_best': False  # Would need more context to determine
-            })
-
-        return epochs
-
-    def _extract_model_comparisons(self, content: str) -> List[Dict]:
-        """Extract model comparison data"""
-        comparisons = []
-
-        # Pattern for model rows in tables
-        # | Model | Accuracy | Parameters |
-        table_pattern = r'\|\s*([^|]+)\s*\|\s*([\d.]+)%?\s*\|\s*([\d.]+)M?'
-        matches = re.findall(table_pattern, content)
-
-        for match in matches:
-            model_name = match[0].strip()
-            accuracy = float(match[1])
-            params = float(match[2])
-
-            # Skip table headers
-            if 'Model' in model_name or 'Acc' in model_name:
-                continue
-
-            comparisons.append({
-                'model': model_name,
-                'accuracy': accuracy,
-                'parameters': params,
-                'efficiency': accuracy / params if params > 0 else 0
-            })
-
-        return comparisons
-
-    def _extract_improvements(self, content: str) -> Dict[str, float]:
-        """Extract improvement percentages"""
-        improvements = {}
-
-        # Pattern for improvement values
-        imp_pattern = r'\+\s*([\d.]+)%'
-        matches = re.findall(imp_pattern, content)
-
-        if matches:
-            improvements['total'] = float(matches[0])
-
-        return improvements
-
     def _get_default_metrics(self) -> Dict:
         """Return default metrics if files don't exist"""
         return {
@@ -136,35 +139,23 @@ class MetricsParser:
 
     def parse_model_file(self) -> Dict:
         """Parse model_competitive.py for architecture details"""
-        model_file = os.path.join(self.project_root, 'model_competitive.py')
-
-        if not os.path.exists(model_file):
-            return self._get_default_architecture()
-
-        with open(model_file, 'r') as f:
-            content = f.read()
-
-        architecture = {
-            'num_layers': self._extract_value(content, r'num_layers[\'"]?\s*[:=]\s*(\d+)'),
-            'num_heads': self._extract_value(content, r'num_heads[\'"]?\s*[:=]\s*(\d+)'),
-            'ffn_dim': self._extract_value(content, r'ffn_dim[\'"]?\s*[:=]\s*(\d+)'),
-            'd_model': self._extract_value(content, r'd_model[\'"]?\s*[:=]\s*(\d+)'),
-            'dropout': self._extract_value(content, r'dropout[\'"]?\s*[:=]\s*([\d.]+)', float),
-            'unfreeze_layers': self._extract_value(content, r'unfreeze_layers[\'"]?\s*[:=]\s*(\d+)'),
-        }
-
+        with self._lock:
+            return self._cached(self.model_file, self._scan_model,
+                                self._get_default_architecture)[0]
+
+    def _scan_model(self, content: str) -> Dict:
+        """First value of every architecture field"""
+        architecture = {}
+        for field, (pattern, type_func) in ARCHITECTURE_PATTERNS.items():
+            architecture[field] = None
+            match = pattern.search(content)
+            if match:
+                try:
+                    architecture[field] = type_func(match.group(1))
+                except (ValueError, IndexError):
+                    pass
         return architecture
 
-    def _extract_value(self, content: str, pattern: str, type_func=int):
-        """Extract a single value using regex pattern"""
-        match = re.search(pattern, content)
-        if match:
-            try:
-                return type_func(match.group(1))
-            except (ValueError, IndexError):
-                pass
-        return None
-
     def _get_default_architecture(self) -> Dict:
         """Return default architecture if file doesn't exist"""
         return {
@@ -177,15 +168,27 @@ class MetricsParser:
         }
 
     def get_all_metrics(self) -> Dict:
-        """Get all parsed metrics"""
-        results = self.parse_results_file()
-        architecture = self.parse_model_file()
-
-        return {
-            'results': results,
-            'architecture': architecture,
-            'parsed_at': datetime.now().isoformat()
-        }
+        """Get all parsed metrics (``parsed_at`` is when the files were last parsed)"""
+        with self._lock:
+            results, results_signature = self._cached(
+                self.results_file, self._scan_results, self._get_default_metrics)
+            architecture, model_signature = self._cached(
+                self.model_file, self._scan_model, self._get_default_architecture)
+
+            signature = (results_signature, model_signature)
+            if signature != self._all_signature:
+                previous = self._all_metrics
+                # A touched but unchanged file keeps its version and parsed_at
+                if previous is None or (previous['results'], previous['architecture']) != (
+                        results, architecture):
+                    self._all_metrics = {
+                        'results': results,
+                        'architecture': architecture,
+                        'parsed_at': datetime.now().isoformat()
+                    }
+                    self.version += 1
+                self._all_signature = signature
+            return self._all_metrics
 
 if __name__ == '__main__':
     # Test the parser
@@ -0,0 +1,286 @@
+"""
+Embedded time-series store for step-level training metrics
+Append-only, columnar (one ``array`` per field) per run, persisted as raw
+column files, with pre-aggregated blocks so time-range rollups stay cheap
+however many points a run has
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional
+
+from models import TrainingStep
+
+METRICS = ('loss', 'accuracy', 'lr', 'examples_per_sec')
+COLUMNS = ('time', 'examples') + METRICS
+
+# Rows per aggregate block at level 1; level k blocks cover BLOCK_SIZE**k rows
+BLOCK_SIZE = 64
+MAX_LEVEL = 3
+
+class _Level:
+    """Aggregates of consecutive, equally sized row blocks"""
+
+    def __init__(self):
+        self.time = array('d')
+        self.count = array('q')
+        self.examples = array('d')
+        self.sum = {m: array('d') for m in METRICS}
+        self.min = {m: array('d') for m in METRICS}
+        self.max = {m: array('d') for m in METRICS}
+
+    def __len__(self):
+        return len(self.time)
+
+class _RunSeries:
+    """Columns of one run plus its aggregate levels"""
+
+    def __init__(self):
+        self.columns = {name: array('d') for name in COLUMNS}
+        self.levels = [_Level() for _ in range(MAX_LEVEL)]
+        self.flushed = 0
+
+    def __len__(self):
+        return len(self.columns['time'])
+
+    def extend_levels(self):
+        """Aggregate every block completed since the last call"""
+        source_rows = len(self)
+        for depth, level in enumerate(self.levels):
+            if depth == 0:
+                while (len(level) + 1) * BLOCK_SIZE <= source_rows:
+                    self._aggregate_rows(level, len(level) * BLOCK_SIZE)
+            else:
+                below = self.levels[depth - 1]
+                while (len(level) + 1) * BLOCK_SIZE <= len(below):
+                    self._aggregate_blocks(level, below, len(level) * BLOCK_SIZE)
+
+    def _aggregate_rows(self, level, start):
+        end = start + BLOCK_SIZE
+        level.time.append(self.columns['time'][start])
+        level.count.append(BLOCK_SIZE)
+        level.examples.append(self.columns['examples'][end - 1])
+        for m in METRICS:
+            values = self.columns[m][start:end]
+            level.sum[m].append(sum(values))
+            level.min[m].append(min(values))
+            level.max[m].append(max(values))
+
+    @staticmethod
+    def _aggregate_blocks(level, below, start):
+        end = start + BLOCK_SIZE
+        level.time.append(below.time[start])
+        level.count.append(sum(below.count[start:end]))
+        level.examples.append(below.examples[end - 1])
+        for m in METRICS:
+            level.sum[m].append(sum(below.sum[m][start:end]))
+            level.min[m].append(min(below.min[m][start:end]))
+            level.max[m].append(max(below.max[m][start:end]))
+
+class MetricsStore:
+    """Step metrics (loss, accuracy, lr, throughput) of many runs
+
+    Rows are appended in time order per run (an earlier timestamp is moved
+    up to the previous row's); a value missing from a record repeats the
+    run's previous value. With ``root`` every run's columns are
+    appended to ``<root>/<run dir>/<column>.f64`` on ``flush()`` and loaded
+    back on start (columns cut to their shortest length after a crash).
+
+    ``query`` rolls a time range up into at most ``max_points`` buckets
+    (mean / min / max per metric). Long ranges read pre-aggregated blocks of
+    64, 4096 or 262144 rows instead of raw rows; a block counts towards the
+    bucket its first row falls in.
+    """
+
+    INDEX_FILE = 'runs.json'
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root
+        self.series: Dict[str, _RunSeries] = {}
+        self.directories: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        if root is not None:
+            os.makedirs(root, exist_ok=True)
+            self._load()
+
+    # Persistence
+    def _run_directory(self, run: str) -> str:
+        slug = re.sub(r'[^A-Za-z0-9_.-]+', '_', run)[:48]
+        return f"{slug}-{hashlib.sha1(run.encode('utf-8')).hexdigest()[:8]}"
+
+    def _column_path(self, run: str, column: str) -> str:
+        return os.path.join(self.root, self.directories[run], f'{column}.f64')
+
+    def _load(self):
+        index_path = os.path.join(self.root, self.INDEX_FILE)
+        if not os.path.exists(index_path):
+            return
+        with open(index_path, 'r') as f:
+            self.directories = json.load(f)
+        for run in self.directories:
+            series = _RunSeries()
+            for column in COLUMNS:
+                path = self._column_path(run, column)
+                if os.path.exists(path):
+                    with open(path, 'rb') as f:
+                        series.columns[column].frombytes(f.read())
+            rows = min(len(values) for values in series.columns.values())
+            for column, values in series.columns.items():
+                del values[rows:]
+            series.flushed = rows
+            series.extend_levels()
+            self.series[run] = series
+
+    def _write_index(self):
+        tmp_path = os.path.join(self.root, self.INDEX_FILE + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self.directories, f)
+        os.replace(tmp_path, os.path.join(self.root, self.INDEX_FILE))
+
+    def flush(self):
+        """Append rows added since the last flush to the column files"""
+        if self.root is None:
+            return
+        with self._lock:
+            for run, series in self.series.items():
+                if series.flushed == len(series):
+                    continue
+                os.makedirs(os.path.join(self.root, self.directories[run]), exist_ok=True)
+                for column, values in series.columns.items():
+                    with open(self._column_path(run, column), 'ab') as f:
+                        values[series.flushed:].tofile(f)
+                series.flushed = len(series)
+
+    # Writes
+    def append(self, step: TrainingStep):
+        with self._lock:
+            series = self.series.get(step.run)
+            if series is None:
+                series = self.series[step.run] = _RunSeries()
+                self.directories[step.run] = self._run_directory(step.run)
+                if self.root is not None:
+                    self._write_index()
+            columns = series.columns
+            for column in COLUMNS:
+                value = getattr(step, column)
+                if value is None:
+                    value = columns[column][-1] if len(columns[column]) else 0.0
+                elif column == 'time' and len(columns['time']):
+                    # Keep each run sorted by time for range lookups
+                    value = max(value, columns['time'][-1])
+                columns[column].append(value)
+            series.extend_levels()
+
+    def append_record(self, record: Dict):
+        """Append a ``GenomeTrainer`` step record (see ``log_ingest``)"""
+        self.append(TrainingStep.from_record(record))
+
+    # Queries
+    def runs(self) -> List[Dict]:
+        with self._lock:
+            return [{'run': run, 'points': len(series),
+                     'start': series.columns['time'][0], 'end': series.columns['time'][-1]}
+                    for run, series in self.series.items() if len(series)]
+
+    def query(self, run: str, start: Optional[float] = None, end: Optional[float] = None,
+              max_points: int = 1000) -> Dict:
+        """Rows of ``run`` with ``start <= time <= end``, rolled up to ``max_points`` buckets
+
+        Returns columns ``time`` (first row of each bucket), ``count``,
+        ``examples`` (last) and per metric ``<m>`` (mean), ``<m>_min`` and
+        ``<m>_max``; ``resolution`` is the number of rows per block read.
+        """
+        max_points = max(1, int(max_points))
+        with self._lock:
+            series = self.series.get(run)
+            if series is None:
+                raise KeyError(run)
+            times = series.columns['time']
+            first = 0 if start is None else bisect_left(times, start)
+            last = len(times) if end is None else bisect_right(times, end)
+            rows = max(0, last - first)
+            result = {'run': run, 'points': rows, 'resolution': 1}
+            if rows <= max_points:
+                result.update(self._raw(series, first, last))
+                return result
+
+            depth = 0
+            while (depth < MAX_LEVEL
+                   and BLOCK_SIZE ** (depth + 1) * max_points * 4 <= rows):
+                depth += 1
+            result['resolution'] = BLOCK_SIZE ** depth
+            result.update(self._rollup(series, first, last, depth, max_points))
+            return result
+
+    @staticmethod
+    def _raw(series, first, last):
+        columns = series.columns
+        result = {'time': columns['time'][first:last].tolist(), 'count': [1] * (last - first),
+                  'examples': columns['examples'][first:last].tolist()}
+        for m in METRICS:
+            values = columns[m][first:last].tolist()
+            result[m] = result[f'{m}_min'] = result[f'{m}_max'] = values
+        return result
+
+    @staticmethod
+    def _rollup(series, first, last, depth, max_points):
+        columns = series.columns
+        t0, t1 = columns['time'][first], columns['time'][last - 1]
+        width = (t1 - t0) / max_points or 1.0
+        buckets = {}
+
+        def bucket_for(time):
+            index = min(int((time - t0) / width), max_points - 1)
+            entry = buckets.get(index)
+            if entry is None:
+                entry = buckets[index] = {'time': time, 'count': 0, 'examples': 0.0,
+                                          'sum': dict.fromkeys(METRICS, 0.0),
+                                          'min': dict.fromkeys(METRICS, float('inf')),
+                                          'max': dict.fromkeys(METRICS, float('-inf'))}
+            return entry
+
+        def add_rows(lo, hi):
+            for i in range(lo, hi):
+                entry = bucket_for(columns['time'][i])
+                entry['count'] += 1
+                entry['examples'] = columns['examples'][i]
+                for m in METRICS:
+                    value = columns[m][i]
+                    entry['sum'][m] += value
+                    if value < entry['min'][m]:
+                        entry['min'][m] = value
+                    if value > entry['max'][m]:
+                        entry['max'][m] = value
+
+        # Partial blocks at both ends come from raw rows, full blocks from the level
+        rows_per_block = BLOCK_SIZE ** depth
+        level = series.levels[depth - 1] if depth else None
+        first_block = -(-first // rows_per_block)
+        last_block = min(last // rows_per_block, len(level)) if depth else 0
+        if first_block >= last_block:
+            add_rows(first, last)
+        else:
+            add_rows(first, first_block * rows_per_block)
+            for b in range(first_block, last_block):
+                entry = bucket_for(level.time[b])
+                entry['count'] += level.count[b]
+                entry['examples'] = level.examples[b]
+                for m in METRICS:
+                    entry['sum'][m] += level.sum[m][b]
+                    entry['min'][m] = min(entry['min'][m], level.min[m][b])
+                    entry['max'][m] = max(entry['max'][m], level.max[m][b])
+            add_rows(last_block * rows_per_block, last)
+
+        ordered = [buckets[k] for k in sorted(buckets)]
+        result = {'time': [e['time'] for e in ordered], 'count': [e['count'] for e in ordered],
+                  'examples': [e['examples'] for e in ordered]}
+        for m in METRICS:
+            result[m] = [e['sum'][m] / e['count'] for e in ordered]
+            result[f'{m}_min'] = [e['min'][m] for e in ordered]
+            result[f'{m}_max'] = [e['max'][m] for e in ordered]
+        return result
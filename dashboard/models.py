@@ -35,6 +35,25 @@ class TrainingEpoch:
     def to_dict(self):
         return asdict(self)
 
+@dataclass
+class TrainingStep:
+    """Step-level training metrics of one run"""
+    run: str
+    time: float
+    examples: Optional[float] = None
+    loss: Optional[float] = None
+    accuracy: Optional[float] = None
+    lr: Optional[float] = None
+    examples_per_sec: Optional[float] = None
+
+    def to_dict(self):
+        return asdict(self)
+
+    @classmethod
+    def from_record(cls, record: Dict) -> 'TrainingStep':
+        """Build from a ``GenomeTrainer`` step record, ignoring unknown fields"""
+        return cls(**{name: record.get(name) for name in cls.__dataclass_fields__})
+
 @dataclass
 class ModelComparison:
     """Competitive model comparison"""
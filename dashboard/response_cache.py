@@ -0,0 +1,106 @@
+"""
+Precomputed, compressed API responses for the dashboard
+Each cached payload is serialized to JSON once per data version, compressed
+once (gzip, plus brotli when the ``brotli`` package is installed) and served
+with a strong ETag, so repeated polls cost a dict lookup or a 304
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+from typing import Callable, Dict, Hashable, Optional
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+class CachedBody:
+    """One serialized payload with its ETag digest and compressed variants"""
+    __slots__ = ('version', 'body', 'digest', 'encoded')
+
+    def __init__(self, version, body: bytes, encoded: Dict[str, bytes]):
+        self.version = version
+        self.body = body
+        self.digest = hashlib.sha1(body).hexdigest()
+        self.encoded = encoded
+
+    def etag(self, encoding: Optional[str] = None) -> str:
+        # Strong validators must differ per content-coding
+        return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+
+class ResponseCache:
+    """Serialize-once JSON responses keyed by name and data version
+
+    ``respond(key, version, build)`` calls ``build()`` only when ``version``
+    differs from the cached one; the payload is serialized like ``jsonify``
+    (sorted keys, compact) and bodies of at least ``min_compress_size``
+    bytes are compressed right away. Responses carry
+    ``Cache-Control: no-cache`` so clients revalidate with ``If-None-Match``
+    and get a 304 while the data is unchanged.
+    """
+
+    def __init__(self, min_compress_size: int = 512, gzip_level: int = 6,
+                 brotli_quality: int = 5):
+        self.min_compress_size = min_compress_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self._entries: Dict[Hashable, CachedBody] = {}
+        self._lock = threading.Lock()
+
+    def _encode(self, body: bytes) -> Dict[str, bytes]:
+        if len(body) < self.min_compress_size:
+            return {}
+        encoded = {'gzip': gzip.compress(body, compresslevel=self.gzip_level, mtime=0)}
+        if brotli is not None:
+            encoded['br'] = brotli.compress(body, quality=self.brotli_quality)
+        return encoded
+
+    def get(self, key: Hashable, version, build: Callable) -> CachedBody:
+        """Cached body for ``key`` at ``version``, rebuilding it if stale"""
+        entry = self._entries.get(key)
+        if entry is not None and entry.version == version:
+            return entry
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version:
+                body = json.dumps(build(), sort_keys=True, separators=(',', ':')).encode('utf-8')
+                body += b'\n'
+                entry = self._entries[key] = CachedBody(version, body, self._encode(body))
+            return entry
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Drop ``key`` (or everything); the next request re-serializes it"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def respond(self, key: Hashable, version, build: Callable) -> Response:
+        """Flask response for the current request: 304, compressed or identity"""
+        entry = self.get(key, version, build)
+        encoding = None
+        accepted = request.accept_encodings
+        for candidate in ('br', 'gzip'):
+            if candidate in entry.encoded and accepted[candidate]:
+                encoding = candidate
+                break
+
+        etag = entry.etag(encoding)
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+        current = {entry.etag(), entry.etag('gzip'), entry.etag('br')}
+        if_none_match = request.headers.get('If-None-Match', '')
+        if if_none_match.strip() == '*' or any(
+                tag.strip().removeprefix('W/') in current for tag in if_none_match.split(',')):
+            return Response(status=304, headers=headers)
+
+        if encoding is not None:
+            headers['Content-Encoding'] = encoding
+            body = entry.encoded[encoding]
+        else:
+            body = entry.body
+        return Response(body, mimetype='application/json', headers=headers)
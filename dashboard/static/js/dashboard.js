@@ -7,6 +7,12 @@
 let socket;
 let charts = {};
 
+// Live updates: last known metrics and the sequence number applied per section
+let metricsData = {};
+let metricsSync = { session: null, seq: {}, runsSeq: null };
+const dirtySections = new Set();
+let renderScheduled = false;
+
 // Chart color scheme
 const colors = {
     primary: '#667eea',
@@ -44,6 +50,15 @@ async function loadAllMetrics() {
         const response = await fetch('/api/all-metrics');
         const data = await response.json();
 
+        // Live deltas continue from the sequence numbers of this snapshot
+        metricsData = data;
+        const syncHeader = response.headers.get('X-Metrics-Seq');
+        if (syncHeader) {
+            const sync = JSON.parse(syncHeader);
+            metricsSync.session = sync.session;
+            metricsSync.seq = sync.seq;
+        }
+
         // Update overview cards
         updateOverviewCards(data.overview);
 
@@ -78,7 +93,8 @@ function updateOverviewCards(overview) {
     // Accuracy change
     const changeElement = document.getElementById('accuracyChange');
     if (changeElement) {
-        changeElement.textContent = `+${overview.improvement.toFixed(2)}% vs baseline`;
+        const sign = overview.improvement >= 0 ? '+' : '';
+        changeElement.textContent = `${sign}${overview.improvement.toFixed(2)}% vs baseline`;
     }
 
     // Confidence interval
@@ -113,7 +129,9 @@ function updateResourceDetails(resources) {
         'batchSize': resources.batch_size,
         'lrRoberta': resources.learning_rate_roberta,
         'lrEvolved': resources.learning_rate_evolved,
-        'framework': resources.framework
+        'framework': resources.framework,
+        'trainingTime': resources.training_time,
+        'trainingTimeSource': resources.training_time_source
     };
 
     Object.entries(updates).forEach(([id, value]) => {
@@ -261,6 +279,20 @@ function renderTrainingChart(trainingData) {
     });
 }
 
+// Update training progress chart in place (no re-creation per update)
+function updateTrainingChart(trainingData) {
+    if (!charts.training) {
+        renderTrainingChart(trainingData);
+        return;
+    }
+
+    const chart = charts.training;
+    chart.data.labels = trainingData.map(d => `Epoch ${d.epoch}`);
+    chart.data.datasets[0].data = trainingData.map(d => d.accuracy);
+    chart.data.datasets[1].data = trainingData.map(d => d.loss);
+    chart.update('none');
+}
+
 // Render model comparison chart (bubble chart)
 function renderComparisonChart(comparisonData) {
     const ctx = document.getElementById('comparisonChart');
@@ -467,19 +499,32 @@ function initializeWebSocket() {
 
         socket.on('connect', () => {
             console.log('✅ WebSocket connected');
+            // Also fires on reconnect: resume from the last applied sequences
+            requestLiveMetrics();
         });
 
         socket.on('connection_response', (data) => {
             console.log('📡', data.message);
         });
 
-        socket.on('live_metrics_update', (data) => {
-            console.log('📊 Received live metrics update');
-            updateOverviewCards(data);
-        });
+        socket.on('metrics_delta', applyMetricsDelta);
 
         socket.on('training_update', (data) => {
-            console.log('🔄 Training update:', data.message);
+            if (metricsSync.runsSeq !== null && data.seq <= metricsSync.runsSeq) return;
+            if (metricsSync.runsSeq !== null && data.seq > metricsSync.runsSeq + 1) {
+                // Missed updates; the server replays them from runsSeq
+                requestLiveMetrics();
+                return;
+            }
+            metricsSync.runsSeq = data.seq;
+            // Only runs with new steps/epochs since the last update are included
+            const runs = Object.keys(data.runs || {});
+            console.log(`🔄 Training update: ${runs.length} run(s)`, data.runs);
+        });
+
+        socket.on('training_snapshot', (data) => {
+            metricsSync.runsSeq = data.seq;
+            console.log(`📈 Training runs: ${Object.keys(data.runs).length}`, data.runs);
         });
 
         socket.on('disconnect', () => {
@@ -491,6 +536,88 @@ function initializeWebSocket() {
     }
 }
 
+// Ask for everything missed since the last applied sequence numbers
+function requestLiveMetrics() {
+    socket.emit('request_live_metrics', {
+        session: metricsSync.session,
+        seq: metricsSync.seq,
+        runs_seq: metricsSync.runsSeq
+    });
+}
+
+// Section renderers used for live updates
+const sectionRenderers = {
+    overview: updateOverviewCards,
+    training_progress: updateTrainingChart,
+    competitive_comparison: renderComparisonChart,
+    feature_impact: renderFeatureImpactChart,
+    architecture: updateArchitectureDetails,
+    resources: updateResourceDetails,
+    roadmap: renderRoadmap,
+    live_runs: (runs) => console.log(`📈 Live runs: ${Object.keys(runs).length}`, runs)
+};
+
+// Apply one section change ('merge', 'list' or 'replace'; all idempotent)
+function applyChange(change) {
+    const current = metricsData[change.section];
+
+    if (change.op === 'merge') {
+        const next = Object.assign({}, current, change.set);
+        change.unset.forEach(key => delete next[key]);
+        metricsData[change.section] = next;
+    } else if (change.op === 'list') {
+        const next = (current || []).slice();
+        change.update.forEach(([index, item]) => { next[index] = item; });
+        next.splice(change.start, change.append.length, ...change.append);
+        metricsData[change.section] = next;
+    } else {
+        metricsData[change.section] = change.value;
+    }
+}
+
+// Apply a metrics_delta message in sequence order and schedule one render
+function applyMetricsDelta(message) {
+    if (message.session !== metricsSync.session) {
+        // Server restarted: earlier sequence numbers mean nothing now
+        metricsSync.session = message.session;
+        metricsSync.seq = {};
+    }
+
+    let missed = false;
+    message.changes.forEach(change => {
+        const last = metricsSync.seq[change.section] || 0;
+        if (change.seq <= last) return;
+        if (change.op !== 'replace' && change.seq !== last + 1) {
+            missed = true;
+            return;
+        }
+        applyChange(change);
+        metricsSync.seq[change.section] = change.seq;
+        dirtySections.add(change.section);
+    });
+
+    scheduleRender();
+    if (missed) requestLiveMetrics();
+}
+
+// Re-render changed sections at most once per animation frame
+function scheduleRender() {
+    if (renderScheduled || dirtySections.size === 0) return;
+    renderScheduled = true;
+
+    requestAnimationFrame(() => {
+        renderScheduled = false;
+        const sections = [...dirtySections];
+        dirtySections.clear();
+
+        sections.forEach(section => {
+            const render = sectionRenderers[section];
+            if (render && metricsData[section] !== undefined) render(metricsData[section]);
+        });
+        updateLastUpdated();
+    });
+}
+
 // Update last updated timestamp
 function updateLastUpdated() {
     const element = document.getElementById('lastUpdated');
@@ -0,0 +1,262 @@
+"""
+Length-bucketed data pipeline for PIQA-style multiple-choice training
+Pre-tokenized storage, length bucketing and per-batch dynamic padding
+"""
+
+import json
+import os
+import random
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Dataset, Sampler
+
+class PretokenizedDataset(Dataset):
+    """Tokenized examples stored as one flat int32 token array plus offsets
+
+    Example ``i`` owns sequences ``i * num_choices ... i * num_choices + C - 1``
+    (goal+sol1, goal+sol2 for PIQA). Loading with ``mmap=True`` reads tokens
+    lazily from disk, so DataLoader workers share the OS page cache.
+    """
+
+    META_FILE = 'meta.json'
+    TOKENS_FILE = 'tokens.npy'
+    OFFSETS_FILE = 'offsets.npy'
+    LABELS_FILE = 'labels.npy'
+
+    def __init__(self, tokens, offsets, labels, num_choices=2, meta=None, path=None):
+        self.tokens = tokens
+        self.offsets = offsets
+        self.labels = labels
+        self.num_choices = num_choices
+        self.meta = meta or {}
+        self.path = path
+
+    def __getstate__(self):
+        # Memory-mapped datasets travel to worker processes as a path, not a copy
+        if self.path is not None and isinstance(self.tokens, np.memmap):
+            return {'path': self.path}
+        return self.__dict__.copy()
+
+    def __setstate__(self, state):
+        if set(state) == {'path'}:
+            state = PretokenizedDataset.load(state['path'], mmap=True).__dict__
+        self.__dict__.update(state)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, idx):
+        first = idx * self.num_choices
+        input_ids = [
+            self.tokens[self.offsets[s]:self.offsets[s + 1]]
+            for s in range(first, first + self.num_choices)
+        ]
+        return {'input_ids': input_ids, 'label': int(self.labels[idx])}
+
+    @property
+    def lengths(self):
+        """Token length of every example (longest of its choices)"""
+        seq_lengths = np.diff(self.offsets)
+        return seq_lengths.reshape(-1, self.num_choices).max(axis=1)
+
+    @classmethod
+    def from_examples(cls, tokenizer, examples, max_length=128):
+        """Tokenize ``{'goal', 'sol1', 'sol2', 'label'}`` dicts without padding"""
+        sequences, labels = [], []
+        for ex in examples:
+            for sol in (ex['sol1'], ex['sol2']):
+                enc = tokenizer(ex['goal'], sol, truncation=True, max_length=max_length)
+                sequences.append(enc['input_ids'])
+            labels.append(ex['label'])
+
+        offsets = np.zeros(len(sequences) + 1, dtype=np.int64)
+        np.cumsum([len(s) for s in sequences], out=offsets[1:])
+        tokens = np.fromiter((t for s in sequences for t in s),
+                             dtype=np.int32, count=int(offsets[-1]))
+        meta = {
+            'tokenizer': getattr(tokenizer, 'name_or_path', None),
+            'pad_token_id': tokenizer.pad_token_id,
+            'max_length': max_length,
+        }
+        return cls(tokens, offsets, np.asarray(labels, dtype=np.int64), 2, meta)
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, self.TOKENS_FILE), np.asarray(self.tokens, dtype=np.int32))
+        np.save(os.path.join(path, self.OFFSETS_FILE), np.asarray(self.offsets, dtype=np.int64))
+        np.save(os.path.join(path, self.LABELS_FILE), np.asarray(self.labels, dtype=np.int64))
+        meta = dict(self.meta, num_choices=self.num_choices, num_examples=len(self))
+        with open(os.path.join(path, self.META_FILE), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        with open(os.path.join(path, cls.META_FILE), 'r') as f:
+            meta = json.load(f)
+        mmap_mode = 'r' if mmap else None
+        tokens = np.load(os.path.join(path, cls.TOKENS_FILE), mmap_mode=mmap_mode)
+        offsets = np.load(os.path.join(path, cls.OFFSETS_FILE), mmap_mode=mmap_mode)
+        labels = np.load(os.path.join(path, cls.LABELS_FILE), mmap_mode=mmap_mode)
+        return cls(tokens, offsets, labels, meta['num_choices'], meta, path=path)
+
+class LengthBucketBatchSampler(Sampler):
+    """Yield batches of similar-length examples
+
+    Indices are shuffled, cut into buckets of ``batch_size * bucket_batches``
+    examples, sorted by length inside each bucket and split into batches; the
+    batch order is then shuffled so training does not see a length curriculum.
+    """
+
+    def __init__(self, lengths, batch_size, shuffle=True, bucket_batches=50,
+                 drop_last=False, seed=0):
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.bucket_size = batch_size * bucket_batches
+        self.drop_last = drop_last
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def __iter__(self):
+        rng = random.Random(self.seed + self.epoch)
+        indices = list(range(len(self.lengths)))
+        if self.shuffle:
+            rng.shuffle(indices)
+        else:
+            indices.sort(key=lambda i: self.lengths[i])
+
+        batches = []
+        for start in range(0, len(indices), self.bucket_size):
+            bucket = sorted(indices[start:start + self.bucket_size],
+                            key=lambda i: self.lengths[i])
+            for b in range(0, len(bucket), self.batch_size):
+                batch = bucket[b:b + self.batch_size]
+                if len(batch) < self.batch_size and self.drop_last:
+                    continue
+                batches.append(batch)
+
+        if self.shuffle:
+            rng.shuffle(batches)
+        return iter(batches)
+
+    def __len__(self):
+        if self.drop_last:
+            # Every bucket may leave a short tail behind
+            full, tail = divmod(len(self.lengths), self.bucket_size)
+            return full * (self.bucket_size // self.batch_size) + tail // self.batch_size
+        return sum(
+            -(-min(self.bucket_size, len(self.lengths) - start) // self.batch_size)
+            for start in range(0, len(self.lengths), self.bucket_size))
+
+class DynamicPaddingCollator:
+    """Pad each batch only to its own longest sequence
+
+    Produces ``input_ids``/``attention_mask`` shaped [batch, num_choices, seq]
+    (right-padded, as ``trim_padding`` in the model expects) and ``labels``.
+    """
+
+    def __init__(self, pad_token_id=1, pad_to_multiple_of=None):
+        self.pad_token_id = pad_token_id
+        self.pad_to_multiple_of = pad_to_multiple_of
+
+    def __call__(self, items):
+        num_choices = len(items[0]['input_ids'])
+        max_len = max(len(seq) for item in items for seq in item['input_ids'])
+        if self.pad_to_multiple_of:
+            max_len = -(-max_len // self.pad_to_multiple_of) * self.pad_to_multiple_of
+
+        input_ids = torch.full((len(items), num_choices, max_len), self.pad_token_id,
+                               dtype=torch.long)
+        attention_mask = torch.zeros(len(items), num_choices, max_len, dtype=torch.long)
+        for i, item in enumerate(items):
+            for c, seq in enumerate(item['input_ids']):
+                input_ids[i, c, :len(seq)] = torch.from_numpy(np.asarray(seq, dtype=np.int64))
+                attention_mask[i, c, :len(seq)] = 1
+
+        labels = torch.tensor([item['label'] for item in items], dtype=torch.long)
+        return {'input_ids': input_ids, 'attention_mask': attention_mask, 'labels': labels}
+
+def synthetic_batch(batch_size, seq_len, num_choices=2, pad_fraction=0.25, seed=0,
+                    pad_token_id=1):
+    """Random right-padded [batch, num_choices, seq] PIQA-shaped inputs
+
+    Even rows use all ``seq_len`` tokens, odd rows only the first
+    ``1 - pad_fraction`` of them. Used for benchmarks, cost measurement and
+    export tracing.
+    """
+    generator = torch.Generator().manual_seed(seed)
+    input_ids = torch.randint(5, 1000, (batch_size, num_choices, seq_len), generator=generator)
+    attention_mask = torch.ones(batch_size, num_choices, seq_len, dtype=torch.long)
+    cut = max(1, int(seq_len * (1 - pad_fraction)))
+    input_ids[1::2, :, cut:] = pad_token_id
+    attention_mask[1::2, :, cut:] = 0
+    input_ids[..., 0] = 0
+    return input_ids, attention_mask
+
+class PrefixCacheDataset(Dataset):
+    """Serve frozen-prefix activations (see ``activation_cache``) with labels"""
+
+    def __init__(self, cache, labels):
+        self.cache = cache
+        self.labels = labels
+        self.lengths = cache.lengths
+
+    def __len__(self):
+        return len(self.cache)
+
+    def __getitem__(self, idx):
+        return idx
+
+    def collate(self, indices):
+        prefix_hidden, attention_mask = self.cache.get_batch(indices)
+        labels = torch.as_tensor(np.asarray(self.labels)[indices], dtype=torch.long)
+        return {'prefix_hidden': prefix_hidden, 'attention_mask': attention_mask,
+                'input_ids': None, 'labels': labels}
+
+def iter_length_sorted(dataset, batch_size=64, chunk_batches=50):
+    """Yield ``(rows, batch)`` over all of ``dataset`` for one-pass scoring
+
+    Examples go in chunks of ``batch_size * chunk_batches`` sorted by length
+    (as the training sampler does) to keep padding low. ``rows`` are the
+    dataset indices of the batch, so outputs can be written back in dataset
+    order. Works for ``PretokenizedDataset`` and ``PrefixCacheDataset``.
+    """
+    if isinstance(dataset, PrefixCacheDataset):
+        collate = dataset.collate
+    else:
+        collator = DynamicPaddingCollator(dataset.meta.get('pad_token_id', 1))
+
+        def collate(indices):
+            return collator([dataset[i] for i in indices])
+
+    lengths = np.asarray(dataset.lengths)
+    chunk_size = batch_size * chunk_batches
+    for chunk_start in range(0, len(dataset), chunk_size):
+        chunk = np.arange(chunk_start, min(chunk_start + chunk_size, len(dataset)))
+        chunk = chunk[np.argsort(lengths[chunk], kind='stable')]
+        for b in range(0, len(chunk), batch_size):
+            rows = chunk[b:b + batch_size]
+            yield rows, collate(rows.tolist())
+
+def make_dataloader(dataset, batch_size=32, shuffle=True, pad_token_id=None,
+                    num_workers=0, seed=0, drop_last=False, collate_fn=None):
+    """DataLoader with length bucketing and dynamic padding
+
+    Works for ``PretokenizedDataset`` and ``PrefixCacheDataset`` alike; batches
+    are dicts that can be passed to ``forward_multiple_choice``. Datasets with
+    extra per-example fields pass their own ``collate_fn``.
+    """
+    sampler = LengthBucketBatchSampler(dataset.lengths, batch_size, shuffle=shuffle,
+                                       drop_last=drop_last, seed=seed)
+    if collate_fn is None and isinstance(dataset, PrefixCacheDataset):
+        collate_fn = dataset.collate
+    elif collate_fn is None:
+        if pad_token_id is None:
+            pad_token_id = getattr(dataset, 'meta', {}).get('pad_token_id', 1)
+        collate_fn = DynamicPaddingCollator(pad_token_id)
+    return DataLoader(dataset, batch_sampler=sampler, collate_fn=collate_fn,
+                      num_workers=num_workers, persistent_workers=num_workers > 0)
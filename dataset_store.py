@@ -0,0 +1,129 @@
+"""
+Pre-tokenized, memory-mapped store for the augmented PIQA corpus
+Builds the 4x augmented set (original, swapped, paraphrased, both) once and
+writes it as contiguous int32 tokens + offsets that every run and every
+evaluation worker memory-maps instead of re-augmenting and re-tokenizing
+
+Usage:
+    python dataset_store.py --data train.jsonl --labels train-labels.lst \\
+        --out cache/piqa_train --augment
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+
+import numpy as np
+
+from data_pipeline import PretokenizedDataset
+
+# Goal rewrites used for paraphrase augmentation: (pattern, replacement)
+PARAPHRASE_RULES = [
+    (re.compile(r'^how do (i|you) ', re.I), 'How can I '),
+    (re.compile(r'^how can (i|you) ', re.I), 'What is a way to '),
+    (re.compile(r'^how to ', re.I), 'How do you '),
+    (re.compile(r'^to ', re.I), 'In order to '),
+    (re.compile(r'^what is the best way to ', re.I), 'How should you '),
+]
+
+def load_piqa(data_path, labels_path=None):
+    """Read PIQA jsonl (goal/sol1/sol2) and its optional .lst label file"""
+    with open(data_path, 'r') as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+
+    labels = [0] * len(rows)
+    if labels_path is not None:
+        with open(labels_path, 'r') as f:
+            labels = [int(line) for line in f if line.strip()]
+        if len(labels) != len(rows):
+            raise ValueError(f"{labels_path} has {len(labels)} labels for {len(rows)} examples")
+
+    return [
+        {'goal': row['goal'], 'sol1': row['sol1'], 'sol2': row['sol2'], 'label': label}
+        for row, label in zip(rows, labels)
+    ]
+
+def paraphrase_goal(goal):
+    """Rule-based goal rewrite; returns the goal unchanged if no rule applies"""
+    for pattern, replacement in PARAPHRASE_RULES:
+        if pattern.search(goal):
+            return pattern.sub(replacement, goal, count=1)
+    return goal
+
+def swap_solutions(example):
+    return {'goal': example['goal'], 'sol1': example['sol2'],
+            'sol2': example['sol1'], 'label': 1 - example['label']}
+
+def augment_examples(examples, seed=42):
+    """4x augmentation: original, solution swap, paraphrase, paraphrase + swap"""
+    augmented = []
+    for ex in examples:
+        paraphrased = dict(ex, goal=paraphrase_goal(ex['goal']))
+        augmented.extend([ex, swap_solutions(ex), paraphrased, swap_solutions(paraphrased)])
+    random.Random(seed).shuffle(augmented)
+    return augmented
+
+def compute_data_version(dataset):
+    """Content hash of tokens and labels, used to key cached fitness results"""
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(dataset.tokens).tobytes())
+    digest.update(np.ascontiguousarray(dataset.labels).tobytes())
+    return digest.hexdigest()[:16]
+
+def build_store(examples, tokenizer, out_path, augment=True, max_length=128, seed=42):
+    """Augment, tokenize and write a store; returns the memory-mapped dataset"""
+    if augment:
+        examples = augment_examples(examples, seed=seed)
+
+    dataset = PretokenizedDataset.from_examples(tokenizer, examples, max_length=max_length)
+    dataset.meta.update({
+        'augmented': augment,
+        'augmentation_seed': seed,
+        'data_version': compute_data_version(dataset),
+    })
+    dataset.save(out_path)
+    return open_store(out_path)
+
+def open_store(path):
+    """Memory-map a store built by ``build_store`` (zero-copy, shareable)"""
+    if not os.path.exists(os.path.join(path, PretokenizedDataset.META_FILE)):
+        raise FileNotFoundError(f"No dataset store at {path}; build it with dataset_store.py")
+    return PretokenizedDataset.load(path, mmap=True)
+
+def store_data_version(path):
+    """``data_version`` recorded in a store's meta, without mapping its arrays"""
+    meta_path = os.path.join(path, PretokenizedDataset.META_FILE)
+    if not os.path.exists(meta_path):
+        raise FileNotFoundError(f"No dataset store at {path}; build it with dataset_store.py")
+    with open(meta_path, 'r') as f:
+        version = json.load(f).get('data_version')
+    if not version:
+        raise ValueError(f"Store at {path} has no data_version; rebuild it with dataset_store.py")
+    return version
+
+def main():
+    parser = argparse.ArgumentParser(description='Build a pre-tokenized PIQA dataset store')
+    parser.add_argument('--data', required=True, help='PIQA jsonl file')
+    parser.add_argument('--labels', help='PIQA labels .lst file')
+    parser.add_argument('--out', required=True, help='Output directory')
+    parser.add_argument('--tokenizer', default='roberta-base')
+    parser.add_argument('--max-length', type=int, default=128)
+    parser.add_argument('--augment', action='store_true', help='Apply 4x augmentation')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    from transformers import AutoTokenizer
+    tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+
+    examples = load_piqa(args.data, args.labels)
+    store = build_store(examples, tokenizer, args.out, augment=args.augment,
+                        max_length=args.max_length, seed=args.seed)
+
+    print(f"Wrote {len(store)} examples ({len(store.tokens)} tokens) to {args.out}")
+    print(f"Data version: {store.meta['data_version']}")
+
+if __name__ == '__main__':
+    main()
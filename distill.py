@@ -0,0 +1,296 @@
+"""
+Knowledge distillation to a truncated-encoder student
+A trained CompetitiveEvoTransformer soft-labels the cached augmented store
+once; students keep only the first N RoBERTa layers (plus the teacher's
+evolved blocks and heads as initialization) and train on a blend of the
+teacher's temperature-softened choice distribution and the hard labels
+
+Usage:
+    python distill.py --teacher genome.pt --train stores/train --val stores/valid \\
+        --student-layers 3 6 --epochs 3 --out distill/ --quantize
+"""
+
+import argparse
+import copy
+import json
+import logging
+import os
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from checkpoint import state_dict_hash
+from data_pipeline import DynamicPaddingCollator, iter_length_sorted, make_dataloader
+from fitness import measure_inference_cost
+from model_competitive import CompetitiveEvoTransformer, CompetitiveGenome
+from trainer import GenomeTrainer, evaluate_accuracy
+
+def truncate_roberta(roberta, num_layers):
+    """Fresh copy of ``roberta`` keeping the embeddings and first ``num_layers`` layers"""
+    if not 0 < num_layers <= len(roberta.encoder.layer):
+        raise ValueError(f"num_layers must be in 1..{len(roberta.encoder.layer)}, got {num_layers}")
+    config = copy.deepcopy(roberta.config)
+    config.num_hidden_layers = num_layers
+    student = type(roberta)(config, add_pooling_layer=roberta.pooler is not None)
+    missing, _ = student.load_state_dict(roberta.state_dict(), strict=False)
+    if missing:
+        raise KeyError(f"Truncated encoder is missing weights: {missing[:5]}")
+    return student
+
+def build_student(teacher, num_roberta_layers, unfreeze_layers=None):
+    """Student with the teacher's bottom encoder layers and its task layers
+
+    Evolved blocks, heads and the memory token start from the teacher's
+    weights. By default the student trains as many of its top layers as the
+    teacher did (capped at its depth).
+    """
+    if unfreeze_layers is None:
+        unfreeze_layers = min(teacher.genome.unfreeze_layers, num_roberta_layers)
+    genome = CompetitiveGenome.from_dict(dict(teacher.genome.to_dict(),
+                                              unfreeze_layers=unfreeze_layers))
+    student = CompetitiveEvoTransformer(genome, truncate_roberta(teacher.roberta, num_roberta_layers))
+    task_state = {k: v for k, v in teacher.state_dict().items() if not k.startswith('roberta.')}
+    student.load_state_dict(task_state, strict=False)
+    return student
+
+class SoftLabels:
+    """Memory-mapped [num_examples, num_choices] float32 teacher logits"""
+
+    META_FILE = 'meta.json'
+    LOGITS_FILE = 'logits.npy'
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, self.META_FILE), 'r') as f:
+            self.meta = json.load(f)
+        self.logits = np.load(os.path.join(path, self.LOGITS_FILE), mmap_mode='r')
+
+    def __len__(self):
+        return self.logits.shape[0]
+
+    def __getstate__(self):
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+    @classmethod
+    def exists(cls, path):
+        return os.path.exists(os.path.join(path, cls.META_FILE))
+
+    def check_compatible(self, dataset, teacher=None):
+        """Raise if these logits were computed for a different dataset store or teacher"""
+        version = dataset.meta.get('data_version')
+        if len(self) != len(dataset) or (version and self.meta.get('data_version') != version):
+            raise ValueError(f"Soft labels at {self.path} were built for data version "
+                             f"{self.meta.get('data_version')} ({len(self)} examples), "
+                             f"dataset is {version} ({len(dataset)} examples)")
+        if (teacher is not None
+                and self.meta.get('teacher_hash') != state_dict_hash(teacher.state_dict())):
+            raise ValueError(f"Soft labels at {self.path} were built by a different teacher; "
+                             f"rebuild them for this checkpoint")
+
+    @classmethod
+    @torch.no_grad()
+    def build(cls, teacher, dataset, path, batch_size=64, device='cpu', chunk_batches=50):
+        """Score every example of ``dataset`` with ``teacher`` once and write the logits
+
+        Examples are processed in length-sorted chunks
+        (``data_pipeline.iter_length_sorted``); rows are written back at their
+        dataset index.
+        """
+        os.makedirs(path, exist_ok=True)
+        logits = np.lib.format.open_memmap(os.path.join(path, cls.LOGITS_FILE), mode='w+',
+                                           dtype=np.float32,
+                                           shape=(len(dataset), dataset.num_choices))
+        was_training = teacher.training
+        teacher.eval()
+        correct = 0
+        for rows, batch in iter_length_sorted(dataset, batch_size, chunk_batches):
+            batch_logits, predictions = teacher.forward_multiple_choice(
+                batch['input_ids'].to(device), batch['attention_mask'].to(device))
+            logits[rows] = batch_logits.float().cpu().numpy()
+            correct += (predictions.cpu() == batch['labels']).sum().item()
+        teacher.train(was_training)
+
+        logits.flush()
+        del logits
+        with open(os.path.join(path, cls.META_FILE), 'w') as f:
+            json.dump({'num_examples': len(dataset),
+                       'data_version': dataset.meta.get('data_version'),
+                       'teacher_genome': teacher.genome.to_dict(),
+                       'teacher_hash': state_dict_hash(teacher.state_dict()),
+                       'teacher_train_acc': 100.0 * correct / max(len(dataset), 1)}, f, indent=2)
+        return cls(path)
+
+class SoftLabelDataset:
+    """``PretokenizedDataset`` whose items also carry the teacher's logits"""
+
+    def __init__(self, dataset, soft_labels, teacher=None):
+        soft_labels.check_compatible(dataset, teacher)
+        self.dataset = dataset
+        self.soft_labels = soft_labels
+        self.meta = dataset.meta
+        self.lengths = dataset.lengths
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, idx):
+        item = self.dataset[idx]
+        item['teacher_logits'] = self.soft_labels.logits[idx]
+        return item
+
+class SoftLabelCollator(DynamicPaddingCollator):
+    """``DynamicPaddingCollator`` that also stacks ``teacher_logits``"""
+
+    def __call__(self, items):
+        batch = super().__call__(items)
+        batch['teacher_logits'] = torch.from_numpy(
+            np.stack([item['teacher_logits'] for item in items]).astype(np.float32))
+        return batch
+
+def distillation_loss(student_logits, teacher_logits, temperature=2.0):
+    """KL(teacher || student) over softened choice distributions, scaled by T^2"""
+    return F.kl_div(F.log_softmax(student_logits / temperature, dim=-1),
+                    F.log_softmax(teacher_logits / temperature, dim=-1),
+                    reduction='batchmean', log_target=True) * temperature ** 2
+
+class DistillationTrainer(GenomeTrainer):
+    """GenomeTrainer whose loss blends the hard-label loss with the teacher's
+
+    ``loss = (1 - alpha) * (cross-entropy + contrastive) + alpha * KD``;
+    batches must carry ``teacher_logits`` (see ``SoftLabelCollator``).
+    """
+    def __init__(self, student, train_loader, val_loader, temperature=2.0, alpha=0.5, **kwargs):
+        super().__init__(student.genome, None, train_loader, val_loader, model=student, **kwargs)
+        self.temperature = temperature
+        self.alpha = alpha
+
+    def compute_loss(self, batch):
+        loss, logits = super().compute_loss(batch)
+        soft = distillation_loss(logits, batch['teacher_logits'], self.temperature)
+        return (1.0 - self.alpha) * loss + self.alpha * soft, logits
+
+def evaluate_model(model, val_loader, device='cpu'):
+    """Validation accuracy in percent"""
+    return evaluate_accuracy(model.to(device), val_loader, device)
+
+def tradeoff_report(teacher, students, val_loader, quantize=False, **cost_kwargs):
+    """Accuracy, latency and throughput of the teacher and every student
+
+    ``students`` maps a name to a model. With ``quantize`` each student is
+    also measured after ``inference.quantize_model``. ``cost_kwargs`` go to
+    ``fitness.measure_inference_cost`` (seq_len, threads, ...).
+    """
+    from inference import quantize_model, strip_for_inference
+
+    candidates = [('teacher', teacher)] + list(students.items())
+    if quantize:
+        candidates += [(f'{name}-int8', quantize_model(strip_for_inference(copy.deepcopy(model))))
+                       for name, model in students.items()]
+    records = []
+    for name, model in candidates:
+        cost = measure_inference_cost(model, **cost_kwargs)
+        records.append({
+            'name': name,
+            'roberta_layers': len(model.roberta.encoder.layer),
+            'accuracy': evaluate_model(model, val_loader),
+            'latency_ms': cost['latency_ms'],
+            'throughput': cost['throughput'],
+            'params': cost['params'],
+            'peak_memory_mb': cost['peak_memory_mb'],
+        })
+    for record in records:
+        record['speedup'] = records[0]['latency_ms'] / record['latency_ms']
+        record['throughput_ratio'] = record['throughput'] / records[0]['throughput']
+        record['accuracy_delta'] = record['accuracy'] - records[0]['accuracy']
+    return records
+
+def format_tradeoff(records):
+    lines = [f"{'Model':<16} {'Layers':>6} {'Val Acc':>8} {'Delta':>7} {'Latency ms':>11} "
+             f"{'Speedup':>8} {'Ex/s':>9} {'x Tput':>7} {'Params (M)':>11}"]
+    for r in records:
+        lines.append(f"{r['name']:<16} {r['roberta_layers']:>6} {r['accuracy']:>7.2f}% "
+                     f"{r['accuracy_delta']:>+7.2f} {r['latency_ms']:>11.2f} {r['speedup']:>7.2f}x "
+                     f"{r['throughput']:>9.1f} {r['throughput_ratio']:>6.2f}x "
+                     f"{r['params'] / 1e6:>11.1f}")
+    return '\n'.join(lines)
+
+def distill(teacher, train_dataset, val_loader, num_roberta_layers, soft_labels, epochs=3,
+            batch_size=32, temperature=2.0, alpha=0.5, checkpoint_path=None, **trainer_kwargs):
+    """Build and train one student; returns ``(student, fit result)``
+
+    With ``checkpoint_path`` the returned student holds its best-epoch weights.
+    """
+    student = build_student(teacher, num_roberta_layers)
+    train_loader = make_dataloader(
+        SoftLabelDataset(train_dataset, soft_labels, teacher), batch_size=batch_size,
+        collate_fn=SoftLabelCollator(train_dataset.meta.get('pad_token_id', 1)))
+    trainer = DistillationTrainer(student, train_loader, val_loader, temperature=temperature,
+                                  alpha=alpha, **trainer_kwargs)
+    result = trainer.fit(epochs=epochs, checkpoint_path=checkpoint_path)
+    if checkpoint_path is not None and os.path.exists(checkpoint_path):
+        best = torch.load(checkpoint_path, map_location='cpu', weights_only=False)
+        student.load_state_dict(best['state_dict'])
+    result.update(roberta_layers=num_roberta_layers, temperature=temperature, alpha=alpha)
+    return student, result
+
+def main():
+    parser = argparse.ArgumentParser(description='Distill a CompetitiveEvoTransformer into '
+                                                 'truncated-encoder students')
+    parser.add_argument('--teacher', required=True, help='GenomeTrainer checkpoint')
+    parser.add_argument('--train', required=True, help='Augmented PretokenizedDataset store')
+    parser.add_argument('--val', required=True, help='Validation PretokenizedDataset store')
+    parser.add_argument('--out', required=True)
+    parser.add_argument('--roberta', default='roberta-base')
+    parser.add_argument('--student-layers', type=int, nargs='+', default=[3, 6])
+    parser.add_argument('--epochs', type=int, default=3)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--temperature', type=float, default=2.0)
+    parser.add_argument('--alpha', type=float, default=0.5, help='Weight of the teacher loss')
+    parser.add_argument('--seq-len', type=int, default=64, help='Latency benchmark length')
+    parser.add_argument('--threads', type=int)
+    parser.add_argument('--quantize', action='store_true', help='Also report int8 students')
+    parser.add_argument('--device', default='cpu')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    from dataset_store import open_store
+    from profiling import JsonlSink
+    from inference import load_checkpoint
+    teacher = load_checkpoint(args.teacher, args.roberta).to(args.device)
+    train_dataset = open_store(args.train)
+    val_loader = make_dataloader(open_store(args.val), batch_size=64, shuffle=False)
+
+    soft_path = os.path.join(args.out, 'soft_labels')
+    soft_labels = None
+    if SoftLabels.exists(soft_path):
+        soft_labels = SoftLabels(soft_path)
+        try:
+            soft_labels.check_compatible(train_dataset, teacher)
+        except ValueError as exc:
+            print(f"{exc}; rebuilding")
+            soft_labels = None
+    if soft_labels is None:
+        soft_labels = SoftLabels.build(teacher, train_dataset, soft_path, device=args.device)
+
+    students, results = {}, {}
+    for num_layers in args.student_layers:
+        name = f'student-L{num_layers}'
+        student, results[name] = distill(
+            teacher, train_dataset, val_loader, num_layers, soft_labels, epochs=args.epochs,
+            batch_size=args.batch_size, temperature=args.temperature, alpha=args.alpha,
+            checkpoint_path=os.path.join(args.out, f'{name}.pt'), device=args.device,
+            run_name=name, metrics_sink=JsonlSink(os.path.join(args.out, f'{name}.jsonl')))
+        students[name] = student.cpu()
+
+    records = tradeoff_report(teacher.cpu(), students, val_loader, quantize=args.quantize,
+                              seq_len=args.seq_len, threads=args.threads)
+    print(format_tradeoff(records))
+    with open(os.path.join(args.out, 'report.json'), 'w') as f:
+        json.dump({'tradeoff': records, 'training': results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
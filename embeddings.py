@@ -0,0 +1,249 @@
+"""
+Bulk contrastive-embedding scoring and nearest-neighbour search
+Streams a corpus through the model once, stores float16 embeddings in a
+memory-mapped matrix, and searches it for hard negatives and near-duplicates
+
+Usage:
+    python embeddings.py --checkpoint genome.pt --store stores/train --out emb/train \
+        --hard-negatives 5 --dedup-threshold 0.98
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+import torch
+
+from checkpoint import state_dict_hash
+from data_pipeline import iter_length_sorted
+
+class EmbeddingMatrix:
+    """Memory-mapped [num_examples, num_choices, dim] float16 embeddings"""
+
+    META_FILE = 'meta.json'
+    MATRIX_FILE = 'embeddings.npy'
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, self.META_FILE), 'r') as f:
+            self.meta = json.load(f)
+        self.matrix = np.load(os.path.join(path, self.MATRIX_FILE), mmap_mode='r')
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    @classmethod
+    def exists(cls, path):
+        return os.path.exists(os.path.join(path, cls.META_FILE))
+
+    def check_compatible(self, model):
+        """Raise if these embeddings were computed with different model weights"""
+        if self.meta.get('model_hash') != state_dict_hash(model.state_dict()):
+            raise ValueError(f"Embeddings at {self.path} were built with different model "
+                             f"weights; rebuild them for this checkpoint")
+
+    def flat(self):
+        """[num_examples * num_choices, dim] view; row ``i * C + c`` is choice c of example i"""
+        return self.matrix.reshape(-1, self.matrix.shape[-1])
+
+    @classmethod
+    @torch.no_grad()
+    def build(cls, model, dataset, path, batch_size=64, normalize=True, chunk_batches=50):
+        """Encode every example of ``dataset`` once and write its embeddings
+
+        ``dataset`` is a ``PretokenizedDataset`` or ``PrefixCacheDataset``.
+        Examples are processed in length-sorted chunks
+        (``data_pipeline.iter_length_sorted``); rows are written back at their
+        dataset index, so the matrix lines up with ``dataset.labels``.
+        """
+        if not model.genome.use_contrastive:
+            raise ValueError("Genome has no contrastive head to embed with")
+        os.makedirs(path, exist_ok=True)
+
+        matrix = None
+        was_training = model.training
+        model.eval()
+        for rows, batch in iter_length_sorted(dataset, batch_size, chunk_batches):
+            _, _, embedding = model.forward_multiple_choice(
+                batch['input_ids'], batch['attention_mask'],
+                prefix_hidden=batch.get('prefix_hidden'), return_embedding=True)
+            if normalize:
+                embedding = torch.nn.functional.normalize(embedding.float(), dim=-1)
+            if matrix is None:
+                matrix = np.lib.format.open_memmap(
+                    os.path.join(path, cls.MATRIX_FILE), mode='w+', dtype=np.float16,
+                    shape=(len(dataset),) + tuple(embedding.shape[1:]))
+            matrix[rows] = embedding.cpu().numpy().astype(np.float16)
+        model.train(was_training)
+
+        matrix.flush()
+        del matrix
+        with open(os.path.join(path, cls.META_FILE), 'w') as f:
+            json.dump({'num_examples': len(dataset), 'normalized': normalize,
+                       'genome': model.genome.to_dict(),
+                       'model_hash': state_dict_hash(model.state_dict())}, f, indent=2)
+        return cls(path)
+
+class ExactIndex:
+    """Brute-force inner-product search with blocked matmul
+
+    Database rows are read ``block_size`` at a time (float16 -> float32), so
+    memory stays bounded even for memory-mapped matrices of millions of rows.
+    """
+    def __init__(self, vectors, block_size=65536):
+        self.vectors = vectors
+        self.block_size = block_size
+
+    def search(self, queries, k=10, exclude_self=False):
+        """Top-k ``(scores, ids)`` per query, each shaped [num_queries, k]"""
+        queries = np.asarray(queries, dtype=np.float32)
+        best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        best_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        for start in range(0, len(self.vectors), self.block_size):
+            block = np.asarray(self.vectors[start:start + self.block_size], dtype=np.float32)
+            scores = queries @ block.T
+            ids = np.arange(start, start + len(block))
+            best_scores, best_ids = _merge_topk(best_scores, best_ids, scores, ids, k,
+                                                exclude_self=exclude_self)
+        return best_scores, best_ids
+
+class IVFIndex:
+    """Inverted-file approximate search: k-means coarse lists, probe ``nprobe``"""
+    def __init__(self, vectors, num_lists=256, nprobe=8, train_size=50000, iters=20, seed=0):
+        self.vectors = vectors
+        self.nprobe = nprobe
+        rng = np.random.default_rng(seed)
+        sample_ids = rng.choice(len(vectors), size=min(train_size, len(vectors)), replace=False)
+        sample = np.asarray(vectors[np.sort(sample_ids)], dtype=np.float32)
+        self.centroids = _kmeans(sample, min(num_lists, len(sample)), iters, rng)
+
+        assignments = np.concatenate([
+            (np.asarray(vectors[s:s + 65536], dtype=np.float32) @ self.centroids.T).argmax(axis=1)
+            for s in range(0, len(vectors), 65536)
+        ])
+        order = np.argsort(assignments, kind='stable')
+        bounds = np.searchsorted(assignments[order], np.arange(len(self.centroids) + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))]
+
+    def search(self, queries, k=10, exclude_self=False):
+        queries = np.asarray(queries, dtype=np.float32)
+        probes = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :self.nprobe]
+        best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        best_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        for q, lists in enumerate(probes):
+            ids = np.concatenate([self.lists[l] for l in lists])
+            if len(ids) == 0:
+                continue
+            ids.sort()
+            scores = queries[q:q + 1] @ np.asarray(self.vectors[ids], dtype=np.float32).T
+            s, i = _merge_topk(best_scores[q:q + 1], best_ids[q:q + 1], scores, ids, k,
+                               exclude_self=exclude_self, query_offset=q)
+            best_scores[q], best_ids[q] = s[0], i[0]
+        return best_scores, best_ids
+
+def _merge_topk(best_scores, best_ids, scores, ids, k, exclude_self=False, query_offset=0):
+    if exclude_self:
+        # With queries drawn from the database, query q is row q of it
+        query_rows = np.arange(len(scores))[:, None] + query_offset
+        scores = np.where(ids[None, :] == query_rows, -np.inf, scores)
+    all_scores = np.concatenate([best_scores, scores], axis=1)
+    all_ids = np.concatenate([best_ids, np.broadcast_to(ids, scores.shape)], axis=1)
+    top = np.argpartition(-all_scores, min(k, all_scores.shape[1] - 1), axis=1)[:, :k]
+    top_scores = np.take_along_axis(all_scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    return (np.take_along_axis(top_scores, order, axis=1),
+            np.take_along_axis(np.take_along_axis(all_ids, top, axis=1), order, axis=1))
+
+def _kmeans(x, num_clusters, iters, rng):
+    """Spherical k-means (inner-product assignment) on normalized vectors"""
+    centroids = x[rng.choice(len(x), size=num_clusters, replace=False)].copy()
+    for _ in range(iters):
+        assign = (x @ centroids.T).argmax(axis=1)
+        for c in range(num_clusters):
+            members = x[assign == c]
+            if len(members):
+                centroid = members.mean(axis=0)
+                centroids[c] = centroid / max(np.linalg.norm(centroid), 1e-9)
+    return centroids
+
+def mine_hard_negatives(embeddings, labels, k=5, index=None):
+    """Wrong solutions most similar to each example's correct solution
+
+    Returns ``{example_id: [(example_id, choice, score), ...]}`` drawn from
+    other examples' incorrect choices.
+    """
+    flat = embeddings.flat()
+    num_choices = embeddings.matrix.shape[1]
+    labels = np.asarray(labels)
+    index = index or ExactIndex(flat)
+    correct_rows = np.arange(len(labels)) * num_choices + labels
+    scores, ids = index.search(flat[correct_rows], k=k * num_choices + 1)
+
+    negatives = {}
+    for example, (row_scores, row_ids) in enumerate(zip(scores, ids)):
+        picked = []
+        for score, row in zip(row_scores, row_ids):
+            other, choice = divmod(int(row), num_choices)
+            if row < 0 or other == example or choice == labels[other]:
+                continue
+            picked.append((other, choice, float(score)))
+            if len(picked) == k:
+                break
+        negatives[example] = picked
+    return negatives
+
+def find_duplicates(embeddings, threshold=0.98, index=None, k=5):
+    """Pairs of examples whose mean choice embeddings exceed ``threshold`` cosine"""
+    means = np.asarray(embeddings.matrix, dtype=np.float32).mean(axis=1)
+    means /= np.maximum(np.linalg.norm(means, axis=1, keepdims=True), 1e-9)
+    index = index or ExactIndex(means)
+    scores, ids = index.search(means, k=k + 1, exclude_self=True)
+    pairs = set()
+    for example, (row_scores, row_ids) in enumerate(zip(scores, ids)):
+        for score, other in zip(row_scores, row_ids):
+            if other >= 0 and score >= threshold:
+                pairs.add((min(example, int(other)), max(example, int(other))))
+    return sorted(pairs)
+
+def main():
+    parser = argparse.ArgumentParser(description='Embed a dataset store and mine its neighbours')
+    parser.add_argument('--checkpoint', required=True)
+    parser.add_argument('--store', required=True, help='PretokenizedDataset directory')
+    parser.add_argument('--out', required=True)
+    parser.add_argument('--roberta', default='roberta-base')
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--ivf-lists', type=int, default=0,
+                        help='Use an approximate IVF index with this many lists (0 = exact)')
+    parser.add_argument('--nprobe', type=int, default=8)
+    parser.add_argument('--hard-negatives', type=int, default=5)
+    parser.add_argument('--dedup-threshold', type=float, default=0.98)
+    args = parser.parse_args()
+
+    from data_pipeline import PretokenizedDataset
+    from inference import load_checkpoint
+    dataset = PretokenizedDataset.load(args.store)
+    model = load_checkpoint(args.checkpoint, args.roberta)
+    embeddings = None
+    if EmbeddingMatrix.exists(args.out):
+        embeddings = EmbeddingMatrix(args.out)
+        try:
+            embeddings.check_compatible(model)
+        except ValueError as exc:
+            print(f"{exc}; rebuilding")
+            embeddings = None
+    if embeddings is None:
+        embeddings = EmbeddingMatrix.build(model, dataset, args.out, batch_size=args.batch_size)
+
+    index = None
+    if args.ivf_lists:
+        index = IVFIndex(embeddings.flat(), num_lists=args.ivf_lists, nprobe=args.nprobe)
+    negatives = mine_hard_negatives(embeddings, dataset.labels, k=args.hard_negatives, index=index)
+    duplicates = find_duplicates(embeddings, threshold=args.dedup_threshold)
+    with open(os.path.join(args.out, 'neighbours.json'), 'w') as f:
+        json.dump({'hard_negatives': {str(k): v for k, v in negatives.items()},
+                   'duplicates': duplicates}, f)
+    print(f"{len(embeddings)} examples embedded, {len(duplicates)} near-duplicate pairs")
+
+if __name__ == '__main__':
+    main()
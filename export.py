@@ -0,0 +1,212 @@
+"""
+TorchScript / ONNX export of a trained CompetitiveEvoTransformer
+Specializes the model for its fixed genome (memory token, embedding and
+contrastive branches resolved at build time), traces one graph per bucketed
+sequence length and checks parity against eager mode
+
+Usage:
+    python export.py --checkpoint genome.pt --out exported/ --buckets 32 64 128
+    python export.py --checkpoint genome.pt --out exported/ --verify
+"""
+
+import argparse
+import json
+import os
+
+import torch
+import torch.nn as nn
+
+from data_pipeline import synthetic_batch
+
+DEFAULT_BUCKETS = (32, 64, 128)
+
+class SpecializedCompetitiveModel(nn.Module):
+    """Branch-free scoring graph for one trained genome
+
+    Takes right-padded [batch, num_choices, seq] inputs of a fixed bucket
+    length and returns [batch, num_choices] logits. There is no data-dependent
+    control flow (no padding trim, no duplicate-row search), so tracing yields
+    the same graph for every input of that shape.
+    """
+    def __init__(self, model):
+        super().__init__()
+        model = model.eval()
+        self.embeddings = model.roberta.embeddings
+        self.encoder_layers = model.roberta.encoder.layer
+        self.evolved_layers = model.evolved_layers
+        self.classifier = model.classifier
+        self.fused_blocks = model.genome.block_type == 'fused'
+        self.memory_enabled = model.genome.memory_enabled
+        if self.memory_enabled:
+            self.register_buffer('memory_token', model.memory_token.detach().clone())
+
+    def forward(self, input_ids, attention_mask):
+        batch_size, num_choices, seq_len = input_ids.shape
+        input_ids = input_ids.reshape(-1, seq_len)
+        attention_mask = attention_mask.reshape(-1, seq_len)
+
+        x = self.embeddings(input_ids=input_ids)
+        extended_mask = (1.0 - attention_mask[:, None, None, :].to(x.dtype)) * torch.finfo(x.dtype).min
+        for layer in self.encoder_layers:
+            out = layer(x, attention_mask=extended_mask)
+            x = out[0] if isinstance(out, tuple) else out
+
+        if self.memory_enabled:
+            x = torch.cat([self.memory_token.expand(x.size(0), -1, -1), x], dim=1)
+            attention_mask = torch.cat([attention_mask.new_ones(x.size(0), 1), attention_mask], dim=1)
+
+        mask = attention_mask == 0
+        layer_mask = (~mask)[:, None, None, :] if self.fused_blocks else mask
+        for layer in self.evolved_layers:
+            x = layer(x, layer_mask)
+
+        keep = (~mask).unsqueeze(-1).to(x.dtype)
+        pooled = (x * keep).sum(dim=1) / keep.sum(dim=1).clamp(min=1e-9)
+        return self.classifier(pooled).view(batch_size, num_choices)
+
+def max_abs_diff(a, b):
+    return (torch.as_tensor(a) - torch.as_tensor(b)).abs().max().item()
+
+@torch.no_grad()
+def check_parity(model, exported, seq_len, atol=1e-4):
+    """Max |eager - exported| logit difference on random bucket inputs"""
+    input_ids, attention_mask = synthetic_batch(4, seq_len, pad_fraction=0.5)
+    eager_logits, _ = model.eval().forward_multiple_choice(input_ids, attention_mask)
+    if isinstance(exported, str):
+        import onnxruntime
+        session = onnxruntime.InferenceSession(exported, providers=['CPUExecutionProvider'])
+        exported_logits = session.run(None, {'input_ids': input_ids.numpy(),
+                                             'attention_mask': attention_mask.numpy()})[0]
+    else:
+        exported_logits = exported(input_ids, attention_mask)
+    diff = max_abs_diff(eager_logits, exported_logits)
+    if diff > atol:
+        raise AssertionError(f"Export parity failed at seq_len={seq_len}: max diff {diff:.2e}")
+    return diff
+
+@torch.no_grad()
+def export_model(model, out_dir, buckets=DEFAULT_BUCKETS, formats=('torchscript', 'onnx'),
+                 atol=1e-4):
+    """Write one graph per bucket and format plus a manifest with parity results"""
+    os.makedirs(out_dir, exist_ok=True)
+    specialized = SpecializedCompetitiveModel(model).eval()
+    manifest = {'genome': model.genome.to_dict(), 'buckets': list(buckets), 'graphs': {}}
+
+    for seq_len in buckets:
+        inputs = synthetic_batch(2, seq_len, pad_fraction=0.5)
+        entry = {}
+        if 'torchscript' in formats:
+            traced = torch.jit.freeze(torch.jit.trace(specialized, inputs, check_trace=False))
+            path = os.path.join(out_dir, f'model_s{seq_len}.pt')
+            traced.save(path)
+            entry['torchscript'] = {'path': os.path.basename(path),
+                                    'parity_max_diff': check_parity(model, traced, seq_len, atol)}
+        if 'onnx' in formats:
+            path = os.path.join(out_dir, f'model_s{seq_len}.onnx')
+            # The fused nn.MultiheadAttention fast path has no ONNX symbolic
+            fastpath = torch.backends.mha.get_fastpath_enabled()
+            torch.backends.mha.set_fastpath_enabled(False)
+            try:
+                torch.onnx.export(
+                    specialized, inputs, path, dynamo=False,
+                    input_names=['input_ids', 'attention_mask'], output_names=['logits'],
+                    dynamic_axes={'input_ids': {0: 'batch'}, 'attention_mask': {0: 'batch'},
+                                  'logits': {0: 'batch'}})
+            finally:
+                torch.backends.mha.set_fastpath_enabled(fastpath)
+            try:
+                diff = check_parity(model, path, seq_len, atol)
+            except ImportError:
+                diff = None  # onnxruntime not installed; graph written but unchecked
+            entry['onnx'] = {'path': os.path.basename(path), 'parity_max_diff': diff}
+        manifest['graphs'][str(seq_len)] = entry
+
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def load_manifest(export_dir):
+    with open(os.path.join(export_dir, 'manifest.json'), 'r') as f:
+        return json.load(f)
+
+@torch.no_grad()
+def verify_export(model, export_dir, atol=1e-4):
+    """Re-check previously exported graphs against eager ``forward_multiple_choice``
+
+    TorchScript graphs are loaded through ``BucketedScorer`` (so bucket
+    routing is covered too), ONNX graphs with onnxruntime when it is
+    installed. Raises AssertionError on a mismatch; returns the max logit
+    difference per bucket and format (None for unchecked ONNX graphs).
+    """
+    manifest = load_manifest(export_dir)
+    if manifest['genome'] != model.genome.to_dict():
+        raise ValueError(f"Export in {export_dir} is for genome {manifest['genome']}, "
+                         f"not {model.genome.to_dict()}")
+    graphs = manifest['graphs']
+    scorer = BucketedScorer(export_dir) if any('torchscript' in e for e in graphs.values()) else None
+
+    results = {}
+    for seq_len, entry in graphs.items():
+        seq_len, diffs = int(seq_len), {}
+        if 'torchscript' in entry:
+            diffs['torchscript'] = check_parity(model, scorer, seq_len, atol)
+        if 'onnx' in entry:
+            try:
+                diffs['onnx'] = check_parity(model, os.path.join(export_dir, entry['onnx']['path']),
+                                             seq_len, atol)
+            except ImportError:
+                diffs['onnx'] = None
+        results[seq_len] = diffs
+    return results
+
+class BucketedScorer:
+    """Load exported TorchScript graphs and route batches to the smallest bucket"""
+    def __init__(self, export_dir, pad_token_id=1):
+        self.manifest = load_manifest(export_dir)
+        self.pad_token_id = pad_token_id
+        self.graphs = {
+            int(seq_len): torch.jit.load(os.path.join(export_dir, entry['torchscript']['path']))
+            for seq_len, entry in self.manifest['graphs'].items() if 'torchscript' in entry
+        }
+        if not self.graphs:
+            raise ValueError(f"No TorchScript graphs in {export_dir}; export with "
+                             f"--formats torchscript")
+        self.buckets = sorted(self.graphs)
+
+    @torch.inference_mode()
+    def __call__(self, input_ids, attention_mask):
+        seq_len = int(attention_mask.sum(dim=-1).max())
+        bucket = next((b for b in self.buckets if b >= seq_len), None)
+        if bucket is None:
+            raise ValueError(f"Sequence length {seq_len} exceeds largest bucket {self.buckets[-1]}")
+        pad = bucket - input_ids.size(-1)
+        if pad > 0:
+            input_ids = nn.functional.pad(input_ids, (0, pad), value=self.pad_token_id)
+            attention_mask = nn.functional.pad(attention_mask, (0, pad), value=0)
+        elif pad < 0:
+            input_ids, attention_mask = input_ids[..., :bucket], attention_mask[..., :bucket]
+        return self.graphs[bucket](input_ids, attention_mask)
+
+def main():
+    parser = argparse.ArgumentParser(description='Export a trained genome to TorchScript/ONNX')
+    parser.add_argument('--checkpoint', required=True)
+    parser.add_argument('--out', required=True)
+    parser.add_argument('--roberta', default='roberta-base')
+    parser.add_argument('--buckets', type=int, nargs='+', default=list(DEFAULT_BUCKETS))
+    parser.add_argument('--formats', nargs='+', default=['torchscript', 'onnx'],
+                        choices=['torchscript', 'onnx'])
+    parser.add_argument('--atol', type=float, default=1e-4)
+    parser.add_argument('--verify', action='store_true',
+                        help='Check parity of an existing export in --out instead of exporting')
+    args = parser.parse_args()
+
+    from inference import load_checkpoint
+    model = load_checkpoint(args.checkpoint, args.roberta)
+    if args.verify:
+        print(json.dumps(verify_export(model, args.out, args.atol), indent=2))
+        return
+    manifest = export_model(model, args.out, args.buckets, args.formats, args.atol)
+    print(json.dumps(manifest['graphs'], indent=2))
+
+if __name__ == '__main__':
+    main()
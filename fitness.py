@@ -0,0 +1,154 @@
+"""
+Cost-aware, multi-objective genome fitness
+Measures inference latency, throughput and peak memory of trained genomes on
+the current CPU, ranks candidates on a Pareto front of accuracy vs cost and
+picks the fastest model within a tolerance of the best accuracy
+"""
+
+import statistics
+import time
+
+import torch
+
+from data_pipeline import synthetic_batch
+from memory import PeakMemoryMonitor, current_memory_mb
+from model_competitive import CompetitiveGenome
+
+# Objective name -> direction used by pareto_front / pareto_ranks
+DEFAULT_OBJECTIVES = {
+    'accuracy': 'max',
+    'latency_ms': 'min',
+    'peak_memory_mb': 'min',
+}
+
+@torch.inference_mode()
+def measure_inference_cost(model, seq_len=64, latency_batch_size=1, throughput_batch_size=32,
+                           repeats=20, warmup=3, threads=None, device='cpu'):
+    """Latency, throughput and peak memory of ``model`` scoring PIQA-shaped batches
+
+    Latency is the median time to score ``latency_batch_size`` examples;
+    throughput is examples/s at ``throughput_batch_size``. ``threads`` should
+    match the deployment setting, since both numbers depend on it.
+    """
+    previous_threads = torch.get_num_threads()
+    if threads is not None:
+        torch.set_num_threads(threads)
+    was_training = model.training
+    model.eval()
+    try:
+        baseline_mb = current_memory_mb(device)
+        with PeakMemoryMonitor(device) as monitor:
+            latency = _time_batches(model, latency_batch_size, seq_len, repeats, warmup, device)
+            large = _time_batches(model, throughput_batch_size, seq_len,
+                                  max(3, repeats // 4), 1, device)
+    finally:
+        model.train(was_training)
+        torch.set_num_threads(previous_threads)
+
+    return {
+        'latency_ms': statistics.median(latency),
+        'latency_p90_ms': sorted(latency)[int(0.9 * (len(latency) - 1))],
+        'throughput': throughput_batch_size / (statistics.median(large) / 1000.0),
+        'peak_memory_mb': monitor.peak_mb,
+        'peak_memory_growth_mb': monitor.peak_mb - baseline_mb,
+        'params': sum(p.numel() for p in model.parameters()),
+        'seq_len': seq_len,
+        'threads': threads or previous_threads,
+    }
+
+def _time_batches(model, batch_size, seq_len, repeats, warmup, device):
+    input_ids, attention_mask = synthetic_batch(batch_size, seq_len)
+    input_ids, attention_mask = input_ids.to(device), attention_mask.to(device)
+    times = []
+    for step in range(warmup + repeats):
+        if torch.device(device).type == 'cuda':
+            torch.cuda.synchronize(device)
+        start = time.perf_counter()
+        model.forward_multiple_choice(input_ids, attention_mask)
+        if torch.device(device).type == 'cuda':
+            torch.cuda.synchronize(device)
+        if step >= warmup:
+            times.append(1000.0 * (time.perf_counter() - start))
+    return times
+
+def fitness_record(result):
+    """Flatten a population result (with ``'cost'``) into one objectives dict"""
+    cost = result.get('cost') or {}
+    return {
+        'genome': result['genome'],
+        'status': result['status'],
+        'accuracy': result['best_val_acc'],
+        'latency_ms': cost.get('latency_ms'),
+        'throughput': cost.get('throughput'),
+        'peak_memory_mb': cost.get('peak_memory_mb'),
+        'params': cost.get('params'),
+    }
+
+def _dominates(a, b, objectives):
+    better = False
+    for name, direction in objectives.items():
+        x, y = (a[name], b[name]) if direction == 'max' else (-a[name], -b[name])
+        if x < y:
+            return False
+        if x > y:
+            better = True
+    return better
+
+def _usable(records, objectives):
+    return [i for i, r in enumerate(records)
+            if r.get('status', 'ok') != 'failed' and all(r.get(k) is not None for k in objectives)]
+
+def pareto_ranks(records, objectives=None):
+    """Non-dominated sorting rank per record (0 = Pareto front, None = unmeasured)"""
+    objectives = objectives or DEFAULT_OBJECTIVES
+    remaining = _usable(records, objectives)
+    ranks = [None] * len(records)
+    rank = 0
+    while remaining:
+        front = [i for i in remaining
+                 if not any(_dominates(records[j], records[i], objectives)
+                            for j in remaining if j != i)]
+        for i in front:
+            ranks[i] = rank
+        remaining = [i for i in remaining if ranks[i] is None]
+        rank += 1
+    return ranks
+
+def pareto_front(records, objectives=None):
+    """Indices of records no other record beats on every objective"""
+    return [i for i, rank in enumerate(pareto_ranks(records, objectives)) if rank == 0]
+
+def select_for_production(records, accuracy_tolerance=1.0, cost_key='latency_ms'):
+    """Index of the cheapest record within ``accuracy_tolerance`` points of the best
+
+    Accuracies are percentages, so the default keeps candidates no more than
+    one accuracy point below the most accurate one.
+    """
+    usable = _usable(records, {'accuracy': 'max', cost_key: 'min'})
+    if not usable:
+        return None
+    best = max(records[i]['accuracy'] for i in usable)
+    eligible = [i for i in usable if records[i]['accuracy'] >= best - accuracy_tolerance]
+    return min(eligible, key=lambda i: (records[i][cost_key], -records[i]['accuracy']))
+
+def format_pareto_report(records, objectives=None, accuracy_tolerance=1.0):
+    """Records sorted by Pareto rank, marking the production pick"""
+    ranks = pareto_ranks(records, objectives)
+    chosen = select_for_production(records, accuracy_tolerance)
+    lines = [f"{'':2}{'Rank':>4} {'Val Acc':>8} {'Latency ms':>11} {'Ex/s':>9} "
+             f"{'Peak MB':>8} {'Params (M)':>11}  Genome"]
+    order = sorted(range(len(records)),
+                   key=lambda i: (ranks[i] is None, ranks[i] or 0, -records[i]['accuracy']))
+    for i in order:
+        r = records[i]
+        if ranks[i] is None:
+            lines.append(f"{'':2}{'-':>4} {r['accuracy']:>7.2f}% {'n/a':>11} {'':>9} {'':>8} "
+                         f"{'':>11}  {CompetitiveGenome.from_dict(r['genome'])}")
+            continue
+        lines.append(
+            f"{'*' if i == chosen else '':2}{ranks[i]:>4} {r['accuracy']:>7.2f}% "
+            f"{r['latency_ms']:>11.2f} {r['throughput'] or 0:>9.1f} {r['peak_memory_mb']:>8.0f} "
+            f"{(r['params'] or 0) / 1e6:>11.1f}  {CompetitiveGenome.from_dict(r['genome'])}")
+    if chosen is not None:
+        lines.append(f"* fastest within {accuracy_tolerance:g} accuracy points of the best")
+    return '\n'.join(lines)
@@ -0,0 +1,123 @@
+"""
+Persistent fitness cache for CompetitiveGenome evaluations
+Keyed by a canonical hash of genome.to_dict() plus data and seed version,
+stored in SQLite so several evaluator processes can share it safely
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+def genome_key(genome, data_version, seed):
+    """Canonical hash of a genome's hyperparameters, dataset and seed"""
+    config = genome.to_dict() if hasattr(genome, 'to_dict') else dict(genome)
+    payload = json.dumps({'genome': config, 'data_version': data_version, 'seed': seed},
+                         sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class FitnessCache:
+    """Size-bounded LRU store of validation accuracy, epoch curve, checkpoint and cost
+
+    SQLite in WAL mode handles concurrent readers/writers across processes;
+    each call opens its own short transaction, so an instance can also be
+    shared between threads. Keys always include ``data_version``; left as
+    None, it is filled in by ``PopulationEvaluator`` from its dataset stores
+    and the cache cannot be used before that.
+    """
+    def __init__(self, path, max_entries=10000, data_version=None, seed=42):
+        self.path = path
+        self.max_entries = max_entries
+        self.data_version = data_version
+        self.seed = seed
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS fitness (
+                    key TEXT PRIMARY KEY,
+                    genome TEXT NOT NULL,
+                    val_acc REAL NOT NULL,
+                    history TEXT NOT NULL,
+                    checkpoint_path TEXT,
+                    created REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    cost TEXT
+                )''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_last_access ON fitness(last_access)')
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(fitness)')}
+            if 'cost' not in columns:
+                conn.execute('ALTER TABLE fitness ADD COLUMN cost TEXT')
+
+    @contextmanager
+    def _connect(self):
+        """One transaction on a fresh connection (connections are not process-safe)"""
+        conn = sqlite3.connect(self.path, timeout=30.0, isolation_level='IMMEDIATE')
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def key(self, genome):
+        if self.data_version is None:
+            raise ValueError("FitnessCache has no data_version; pass one or use it through "
+                             "PopulationEvaluator")
+        return genome_key(genome, self.data_version, self.seed)
+
+    def get(self, genome):
+        """Cached result dict for ``genome``, or None; refreshes its LRU position"""
+        key = self.key(genome)
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT genome, val_acc, history, checkpoint_path, cost FROM fitness WHERE key = ?',
+                (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute('UPDATE fitness SET last_access = ? WHERE key = ?', (time.time(), key))
+
+        history = json.loads(row[2])
+        result = {
+            'genome': json.loads(row[0]),
+            'status': 'cached',
+            'best_val_acc': row[1],
+            'history': history,
+            'epochs': len(history),
+            'checkpoint_path': row[3],
+            'wall_time': 0.0,
+            'train_examples_per_sec': 0.0,
+        }
+        if row[4] is not None:
+            result['cost'] = json.loads(row[4])
+        return result
+
+    def put(self, genome, result):
+        """Store a successful evaluation result and evict beyond ``max_entries``"""
+        if result.get('status') not in ('ok', None):
+            return
+        now = time.time()
+        config = genome.to_dict() if hasattr(genome, 'to_dict') else dict(genome)
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO fitness (key, genome, val_acc, history, checkpoint_path, '
+                'created, last_access, cost) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (self.key(genome), json.dumps(config, sort_keys=True),
+                 result['best_val_acc'], json.dumps(result.get('history', [])),
+                 result.get('checkpoint_path'), now, now,
+                 json.dumps(result['cost']) if result.get('cost') is not None else None))
+            conn.execute(
+                'DELETE FROM fitness WHERE key IN ('
+                '  SELECT key FROM fitness ORDER BY last_access DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,))
+
+    def __contains__(self, genome):
+        with self._connect() as conn:
+            return conn.execute('SELECT 1 FROM fitness WHERE key = ?',
+                                (self.key(genome),)).fetchone() is not None
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute('SELECT COUNT(*) FROM fitness').fetchone()[0]
@@ -0,0 +1,177 @@
+"""
+CPU inference engine for trained CompetitiveEvoTransformer checkpoints
+Strips training-only modules and applies dynamic int8 quantization to the
+RoBERTa linears, the evolved-layer FFNs and the classifier
+
+Usage:
+    python inference.py --checkpoint genome.pt --data valid.jsonl \\
+        --labels valid-labels.lst --compare
+"""
+
+import argparse
+import gc
+import io
+import json
+import time
+
+import torch
+import torch.nn as nn
+
+from memory import rss_mb
+from model_competitive import CompetitiveEvoTransformer, CompetitiveGenome
+
+def load_checkpoint(path, roberta_name='roberta-base', roberta=None):
+    """Rebuild a CompetitiveEvoTransformer from a ``GenomeTrainer`` checkpoint
+
+    RoBERTa is created from its config only; the checkpoint already holds
+    its weights, so the pretrained weights are not downloaded twice.
+    Distilled students record their truncated encoder depth in
+    ``roberta_layers``.
+    """
+    checkpoint = torch.load(path, map_location='cpu', weights_only=False)
+    genome = CompetitiveGenome.from_dict(checkpoint['genome'])
+    if roberta is None:
+        from transformers import RobertaConfig, RobertaModel
+        config = RobertaConfig.from_pretrained(roberta_name)
+        config.num_hidden_layers = checkpoint.get('roberta_layers', config.num_hidden_layers)
+        roberta = RobertaModel(config, add_pooling_layer=False)
+    model = CompetitiveEvoTransformer(genome, roberta)
+    # The unused RoBERTa pooler may or may not be in the checkpoint
+    missing, _ = model.load_state_dict(checkpoint['state_dict'], strict=False)
+    if missing:
+        raise KeyError(f"Checkpoint {path} is missing weights: {missing[:5]}")
+    return model
+
+def strip_for_inference(model):
+    """Eval mode, no dropout modules, no contrastive head, no gradients"""
+    model.eval()
+    if hasattr(model, 'contrastive_head'):
+        del model.contrastive_head
+    for module in list(model.modules()):
+        for child_name, child in list(module.named_children()):
+            if isinstance(child, nn.Dropout):
+                setattr(module, child_name, nn.Identity())
+    for param in model.parameters():
+        param.requires_grad = False
+    return model
+
+def quantize_model(model):
+    """Dynamic int8 quantization of every nn.Linear
+
+    ``nn.MultiheadAttention``'s output projection is not dynamically
+    quantizable and stays fp32; FFN and classifier linears are converted.
+    """
+    return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+def serialized_size_mb(model):
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / (1024 * 1024)
+
+class InferenceEngine:
+    """Batch PIQA scorer: ``predict(goals, sol1s, sol2s)``"""
+    def __init__(self, model, tokenizer, quantize=True, max_length=128, batch_size=64,
+                 threads=None):
+        if threads is not None:
+            torch.set_num_threads(threads)
+        model = strip_for_inference(model)
+        self.model = quantize_model(model) if quantize else model
+        self.tokenizer = tokenizer
+        self.quantized = quantize
+        self.max_length = max_length
+        self.batch_size = batch_size
+
+    @classmethod
+    def from_checkpoint(cls, path, tokenizer=None, roberta_name='roberta-base', **kwargs):
+        if tokenizer is None:
+            from transformers import AutoTokenizer
+            tokenizer = AutoTokenizer.from_pretrained(roberta_name)
+        return cls(load_checkpoint(path, roberta_name), tokenizer, **kwargs)
+
+    def encode(self, goals, sol1s, sol2s):
+        """Tokenize pairs into [batch, 2, seq] tensors padded to the batch maximum"""
+        enc = self.tokenizer(
+            [g for g in goals for _ in range(2)],
+            [s for pair in zip(sol1s, sol2s) for s in pair],
+            padding=True, truncation=True, max_length=self.max_length, return_tensors='pt')
+        shape = (len(goals), 2, enc['input_ids'].size(1))
+        return enc['input_ids'].view(shape), enc['attention_mask'].view(shape)
+
+    @torch.inference_mode()
+    def predict(self, goals, sol1s, sol2s):
+        """Return ``{'predictions': [...], 'probabilities': [[p1, p2], ...]}``"""
+        predictions, probabilities = [], []
+        for start in range(0, len(goals), self.batch_size):
+            end = start + self.batch_size
+            input_ids, attention_mask = self.encode(goals[start:end], sol1s[start:end],
+                                                    sol2s[start:end])
+            logits, preds = self.model.forward_multiple_choice(input_ids, attention_mask)
+            predictions.extend(preds.tolist())
+            probabilities.extend(logits.softmax(dim=-1).tolist())
+        return {'predictions': predictions, 'probabilities': probabilities}
+
+    def benchmark(self, examples, warmup_batches=1):
+        """Accuracy, per-example latency and memory on labelled PIQA examples"""
+        goals = [ex['goal'] for ex in examples]
+        sol1s = [ex['sol1'] for ex in examples]
+        sol2s = [ex['sol2'] for ex in examples]
+        n_warm = min(len(examples), warmup_batches * self.batch_size)
+        self.predict(goals[:n_warm], sol1s[:n_warm], sol2s[:n_warm])
+
+        start = time.perf_counter()
+        predictions = self.predict(goals, sol1s, sol2s)['predictions']
+        elapsed = time.perf_counter() - start
+        correct = sum(int(p == ex['label']) for p, ex in zip(predictions, examples))
+        return {
+            'quantized': self.quantized,
+            'accuracy': 100.0 * correct / max(len(examples), 1),
+            'latency_ms_per_example': 1000.0 * elapsed / max(len(examples), 1),
+            'examples_per_sec': len(examples) / elapsed,
+            'model_size_mb': serialized_size_mb(self.model),
+            'rss_mb': rss_mb(),
+        }
+
+def compare_precisions(checkpoint_path, examples, tokenizer=None, roberta_name='roberta-base',
+                       **engine_kwargs):
+    """fp32 vs int8 on the same examples: accuracy change, latency and RSS"""
+    reports = {}
+    for name, quantize in (('fp32', False), ('int8', True)):
+        rss_before = rss_mb()
+        engine = InferenceEngine.from_checkpoint(checkpoint_path, tokenizer, roberta_name,
+                                                 quantize=quantize, **engine_kwargs)
+        report = engine.benchmark(examples)
+        report['rss_growth_mb'] = report['rss_mb'] - rss_before
+        reports[name] = report
+        del engine
+        gc.collect()
+
+    reports['accuracy_delta'] = reports['int8']['accuracy'] - reports['fp32']['accuracy']
+    reports['speedup'] = (reports['fp32']['latency_ms_per_example']
+                          / reports['int8']['latency_ms_per_example'])
+    return reports
+
+def main():
+    parser = argparse.ArgumentParser(description='int8 CPU inference for CompetitiveEvoTransformer')
+    parser.add_argument('--checkpoint', required=True)
+    parser.add_argument('--data', required=True, help='PIQA jsonl file')
+    parser.add_argument('--labels', help='PIQA labels .lst file')
+    parser.add_argument('--roberta', default='roberta-base')
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--threads', type=int)
+    parser.add_argument('--compare', action='store_true', help='Report int8 vs fp32')
+    args = parser.parse_args()
+
+    from dataset_store import load_piqa
+    examples = load_piqa(args.data, args.labels)
+
+    if args.compare:
+        report = compare_precisions(args.checkpoint, examples, roberta_name=args.roberta,
+                                    batch_size=args.batch_size, threads=args.threads)
+    else:
+        engine = InferenceEngine.from_checkpoint(args.checkpoint, roberta_name=args.roberta,
+                                                 batch_size=args.batch_size, threads=args.threads)
+        report = engine.benchmark(examples)
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
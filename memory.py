@@ -0,0 +1,94 @@
+"""
+Process memory measurement helpers (Linux /proc with a resource fallback)
+and training-memory estimates
+"""
+
+import os
+import resource
+import threading
+
+import torch
+
+def rss_mb():
+    """Current resident set size in MB"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+def current_memory_mb(device='cpu'):
+    """Allocated CUDA memory on GPU devices, process RSS otherwise"""
+    device = torch.device(device)
+    if device.type == 'cuda':
+        return torch.cuda.memory_allocated(device) / (1024 * 1024)
+    return rss_mb()
+
+def trainable_state_mb(model, optimizer_slots=2):
+    """Gradients plus ``optimizer_slots`` states (2 for AdamW) of trainable parameters"""
+    total = sum(p.numel() * p.element_size() for p in model.parameters() if p.requires_grad)
+    return (1 + optimizer_slots) * total / (1024 * 1024)
+
+def saved_activation_mb(fn, *args, ignore=(), **kwargs):
+    """Run ``fn`` and measure the tensors autograd keeps alive for backward
+
+    Returns ``(output, megabytes)``. Storages are counted once, so views of
+    the same activation are not double counted; tensors sharing storage with
+    ``ignore`` (typically the model parameters saved by linear layers) are
+    skipped. With activation checkpointing only the checkpoint inputs are
+    saved and that is what gets measured.
+    """
+    ignored = {t.untyped_storage().data_ptr() for t in ignore}
+    storages = {}
+
+    def pack(tensor):
+        storage = tensor.untyped_storage()
+        if storage.data_ptr() not in ignored:
+            storages[storage.data_ptr()] = storage.nbytes()
+        return tensor
+
+    with torch.autograd.graph.saved_tensors_hooks(pack, lambda tensor: tensor):
+        output = fn(*args, **kwargs)
+    return output, sum(storages.values()) / (1024 * 1024)
+
+class PeakMemoryMonitor:
+    """Peak memory over a ``with`` block
+
+    On CUDA this is the allocator's peak; on CPU a background thread samples
+    RSS every ``interval`` seconds (``ru_maxrss`` cannot be reset per region).
+    """
+    def __init__(self, device='cpu', interval=0.01):
+        self.device = torch.device(device)
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, rss_mb())
+
+    def __enter__(self):
+        if self.device.type == 'cuda':
+            torch.cuda.reset_peak_memory_stats(self.device)
+        else:
+            self.peak_mb = rss_mb()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.device.type == 'cuda':
+            self.peak_mb = torch.cuda.max_memory_allocated(self.device) / (1024 * 1024)
+        else:
+            self._stop.set()
+            self._thread.join()
+            self.peak_mb = max(self.peak_mb, rss_mb())
+        return False
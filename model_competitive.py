@@ -3,14 +3,52 @@ Competitive EvoTransformer Architecture
 RoBERTa-base + evolved layers + unfreezing
 """
 
+import copy
+
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
+from torch.utils.checkpoint import checkpoint
+
+from profiling import DISABLED, mlp_flops, transformer_layer_flops
+
+def trim_padding(attention_mask, *tensors):
+    """Drop trailing sequence columns that are padding in every row
+
+    Returns the trimmed mask followed by each tensor trimmed along dim 1
+    (``None`` entries pass through unchanged).
+    """
+    nonpad_cols = attention_mask.any(dim=0).nonzero()
+    length = int(nonpad_cols[-1]) + 1 if len(nonpad_cols) else 1
+    if length == attention_mask.size(1):
+        return (attention_mask,) + tensors
+    return (attention_mask[:, :length],) + tuple(
+        t if t is None else t[:, :length] for t in tensors)
+
+def masked_mean_pool(x, pad_mask):
+    """Mean over the sequence dim of ``x``, skipping positions where ``pad_mask``"""
+    mask_expanded = (~pad_mask).unsqueeze(-1).float()
+    summed = (x * mask_expanded).sum(dim=1)
+    counts = mask_expanded.sum(dim=1)
+    return summed / counts.clamp(min=1e-9)
+
+def share_frozen_roberta(roberta, unfreeze_layers):
+    """Copy RoBERTa for a new genome, sharing the frozen prefix with ``roberta``
+
+    Embeddings and the bottom encoder layers are never trained, so the copy
+    reuses those parameter tensors and only clones the top ``unfreeze_layers``.
+    """
+    frozen_layers = roberta.encoder.layer[:len(roberta.encoder.layer) - unfreeze_layers]
+    memo = {id(p): p for p in roberta.embeddings.parameters()}
+    memo.update({id(p): p for p in frozen_layers.parameters()})
+    return copy.deepcopy(roberta, memo)
 
 class CompetitiveGenome:
     """Enhanced genome with unfreezing and contrastive learning"""
     def __init__(self, num_layers=2, num_heads=12, ffn_dim=2048,
                  memory_enabled=False, dropout=0.1, weight_decay=0.01,
-                 unfreeze_layers=4, use_contrastive=True):
+                 unfreeze_layers=4, use_contrastive=True, block_type='standard',
+                 norm_first=False):
         self.d_model = 768
         self.num_layers = num_layers
         self.num_heads = num_heads
@@ -20,6 +58,8 @@ class CompetitiveGenome:
         self.weight_decay = weight_decay
         self.unfreeze_layers = unfreeze_layers
         self.use_contrastive = use_contrastive
+        self.block_type = block_type
+        self.norm_first = norm_first
     
     def to_dict(self):
         return {
@@ -31,9 +71,22 @@ class CompetitiveGenome:
             'dropout': self.dropout,
             'weight_decay': self.weight_decay,
             'unfreeze_layers': self.unfreeze_layers,
-            'use_contrastive': self.use_contrastive
+            'use_contrastive': self.use_contrastive,
+            'block_type': self.block_type,
+            'norm_first': self.norm_first
         }
     
+    @classmethod
+    def from_dict(cls, config):
+        genome = cls(**{k: v for k, v in config.items() if k != 'd_model'})
+        genome.d_model = config.get('d_model', genome.d_model)
+        return genome
+    
+    def estimate_cost(self, **kwargs):
+        """Analytic parameters / FLOPs / activation memory, see ``cost_model.estimate_cost``"""
+        from cost_model import estimate_cost
+        return estimate_cost(self, **kwargs)
+
     def __repr__(self):
         return (f"CompGenome(L={self.num_layers}, h={self.num_heads}, "
                 f"ffn={self.ffn_dim}, unfreeze={self.unfreeze_layers})")
@@ -62,6 +115,75 @@ class TransformerBlock(nn.Module):
         x = self.norm2(x + ffn_out)
         return x
 
+class FusedSelfAttention(nn.Module):
+    """Self-attention with a fused QKV projection on scaled_dot_product_attention
+
+    Parameter names match ``nn.MultiheadAttention`` so state dicts are
+    interchangeable with ``TransformerBlock.attention``.
+    """
+    def __init__(self, d_model, num_heads, dropout=0.1):
+        super().__init__()
+        self.num_heads = num_heads
+        self.dropout = dropout
+        self.in_proj_weight = nn.Parameter(torch.empty(3 * d_model, d_model))
+        self.in_proj_bias = nn.Parameter(torch.zeros(3 * d_model))
+        self.out_proj = nn.Linear(d_model, d_model)
+        nn.init.xavier_uniform_(self.in_proj_weight)
+        nn.init.zeros_(self.out_proj.bias)
+
+    def forward(self, x, attn_mask=None):
+        batch_size, seq_len, d_model = x.shape
+        qkv = F.linear(x, self.in_proj_weight, self.in_proj_bias)
+        q, k, v = qkv.view(batch_size, seq_len, 3, self.num_heads, -1).permute(2, 0, 3, 1, 4)
+        out = F.scaled_dot_product_attention(
+            q, k, v, attn_mask=attn_mask,
+            dropout_p=self.dropout if self.training else 0.0)
+        return self.out_proj(out.transpose(1, 2).reshape(batch_size, seq_len, d_model))
+
+class FusedTransformerBlock(nn.Module):
+    """SDPA-backed TransformerBlock with optional pre-norm
+
+    With ``norm_first=False`` it computes the same function as
+    ``TransformerBlock`` and loads its checkpoints unchanged. ``mask`` may be
+    the boolean padding mask or a prepared [batch, 1, 1, seq] keep-mask.
+    """
+    def __init__(self, d_model, num_heads, ffn_dim, dropout=0.1, norm_first=False):
+        super().__init__()
+        self.norm_first = norm_first
+        self.attention = FusedSelfAttention(d_model, num_heads, dropout=dropout)
+        self.ffn = nn.Sequential(
+            nn.Linear(d_model, ffn_dim),
+            nn.GELU(),
+            nn.Dropout(dropout),
+            nn.Linear(ffn_dim, d_model),
+            nn.Dropout(dropout)
+        )
+        self.norm1 = nn.LayerNorm(d_model)
+        self.norm2 = nn.LayerNorm(d_model)
+    
+    def forward(self, x, mask=None):
+        if mask is not None and mask.dim() == 2:
+            mask = (~mask)[:, None, None, :]
+        if self.norm_first:
+            x = x + self.attention(self.norm1(x), mask)
+            x = x + self.ffn(self.norm2(x))
+        else:
+            x = self.norm1(x + self.attention(x, mask))
+            x = self.norm2(x + self.ffn(x))
+        return x
+
+def make_block(genome):
+    """Build one evolved layer of the type selected by ``genome.block_type``"""
+    if genome.block_type == 'fused':
+        return FusedTransformerBlock(genome.d_model, genome.num_heads, genome.ffn_dim,
+                                     dropout=genome.dropout, norm_first=genome.norm_first)
+    if genome.block_type != 'standard':
+        raise ValueError(f"Unknown block_type: {genome.block_type}")
+    if genome.norm_first:
+        raise ValueError("norm_first requires block_type='fused'")
+    return TransformerBlock(genome.d_model, genome.num_heads,
+                            genome.ffn_dim, dropout=genome.dropout)
+
 class CompetitiveEvoTransformer(nn.Module):
     """RoBERTa with strategic unfreezing + evolved task layers"""
     def __init__(self, genome, pretrained_roberta):
@@ -87,9 +209,7 @@ class CompetitiveEvoTransformer(nn.Module):
         
         # Evolved layers
         self.evolved_layers = nn.ModuleList([
-            TransformerBlock(genome.d_model, genome.num_heads,
-                           genome.ffn_dim, dropout=genome.dropout)
-            for _ in range(genome.num_layers)
+            make_block(genome) for _ in range(genome.num_layers)
         ])
         
         # Classification head
@@ -108,38 +228,176 @@ class CompetitiveEvoTransformer(nn.Module):
                 nn.GELU(),
                 nn.Linear(genome.d_model, genome.d_model // 2)
             )
+
+        self.gradient_checkpointing = False
+        # Optional profiling.StageProfiler; None keeps forward uninstrumented
+        self.profiler = None
+
+    def _stage(self, name, flops=None):
+        """Profiling scope for one forward stage; ``flops`` is only evaluated when profiling"""
+        if self.profiler is None:
+            return DISABLED
+        return self.profiler.stage(name, flops() if flops is not None else None)
+
+    def set_gradient_checkpointing(self, enabled=True):
+        """Recompute trainable-layer activations in backward instead of storing them
+
+        Applies to the unfrozen RoBERTa layers and every evolved block; frozen
+        layers keep no activations for backward in the first place.
+        """
+        self.gradient_checkpointing = enabled
+        return self
+
+    def _checkpointing_active(self):
+        return self.gradient_checkpointing and self.training and torch.is_grad_enabled()
+
+    def _run_layer(self, layer, *args, **kwargs):
+        if self._checkpointing_active():
+            return checkpoint(layer, *args, use_reentrant=False, **kwargs)
+        return layer(*args, **kwargs)
     
-    def forward(self, input_ids, attention_mask, return_embedding=False):
-        # RoBERTa embeddings
-        roberta_output = self.roberta(input_ids=input_ids, attention_mask=attention_mask)
-        x = roberta_output.last_hidden_state
+    @property
+    def num_frozen_layers(self):
+        """Number of bottom RoBERTa encoder layers that never receive gradients"""
+        return len(self.roberta.encoder.layer) - self.genome.unfreeze_layers
+
+    def _run_encoder_layers(self, hidden, attention_mask, start, end=None):
+        """Run RoBERTa encoder layers [start:end] on precomputed hidden states"""
+        extended_mask = (1.0 - attention_mask[:, None, None, :].to(hidden.dtype))
+        extended_mask = extended_mask * torch.finfo(hidden.dtype).min
+        layers = self.roberta.encoder.layer
+        for index in range(start, len(layers) if end is None else end):
+            if index >= self.num_frozen_layers:
+                out = self._run_layer(layers[index], hidden, attention_mask=extended_mask)
+            else:
+                out = layers[index](hidden, attention_mask=extended_mask)
+            hidden = out[0] if isinstance(out, tuple) else out
+        return hidden
+
+    def encode_frozen_prefix(self, input_ids, attention_mask):
+        """Hidden states after the frozen prefix (embeddings + bottom layers)"""
+        hidden = self.roberta.embeddings(input_ids=input_ids)
+        return self._run_encoder_layers(hidden, attention_mask, 0, self.num_frozen_layers)
+
+    def encode(self, input_ids, attention_mask, prefix_hidden=None):
+        """Masked-mean pooled representation after the evolved layers"""
+        # Pad-only columns cost attention/FFN work but never reach the pool
+        attention_mask, input_ids, prefix_hidden = trim_padding(
+            attention_mask, input_ids, prefix_hidden)
+
+        # RoBERTa embeddings (or resume from cached frozen-prefix activations)
+        num_sequences, seq_len = attention_mask.shape
+        encoder_layers = len(self.roberta.encoder.layer) - (
+            0 if prefix_hidden is None else self.num_frozen_layers)
+        with self._stage('encoder', lambda: encoder_layers * transformer_layer_flops(
+                num_sequences, seq_len, self.roberta.config.hidden_size,
+                self.roberta.config.intermediate_size)):
+            if prefix_hidden is None and self._checkpointing_active():
+                x = self.encode_frozen_prefix(input_ids, attention_mask)
+                x = self._run_encoder_layers(x, attention_mask, self.num_frozen_layers)
+            elif prefix_hidden is None:
+                roberta_output = self.roberta(input_ids=input_ids, attention_mask=attention_mask)
+                x = roberta_output.last_hidden_state
+            else:
+                x = self._run_encoder_layers(prefix_hidden.to(self.roberta.dtype),
+                                             attention_mask, self.num_frozen_layers)
         
         # Memory token
         if self.genome.memory_enabled:
-            batch_size = x.size(0)
-            memory = self.memory_token.expand(batch_size, -1, -1)
-            x = torch.cat([memory, x], dim=1)
-            memory_mask = torch.ones(batch_size, 1, device=attention_mask.device,
-                                    dtype=attention_mask.dtype)
-            attention_mask = torch.cat([memory_mask, attention_mask], dim=1)
+            with self._stage('memory_token'):
+                x, attention_mask = self.prepend_memory(x, attention_mask)
         
         mask = (attention_mask == 0)
         
+        # Build the layer mask once for all evolved layers (none if unpadded)
+        if not mask.any():
+            layer_mask = None
+        elif self.genome.block_type == 'fused':
+            layer_mask = (~mask)[:, None, None, :]
+        else:
+            layer_mask = mask
+        
         # Evolved layers
-        for layer in self.evolved_layers:
-            x = layer(x, mask)
+        with self._stage('evolved_layers', lambda: self.genome.num_layers * transformer_layer_flops(
+                x.size(0), x.size(1), self.genome.d_model, self.genome.ffn_dim)):
+            for layer in self.evolved_layers:
+                x = self._run_layer(layer, x, layer_mask)
         
         # Pool
-        mask_expanded = (~mask).unsqueeze(-1).float()
-        summed = (x * mask_expanded).sum(dim=1)
-        counts = mask_expanded.sum(dim=1)
-        pooled = summed / counts.clamp(min=1e-9)
+        with self._stage('pool', lambda: 2 * x.numel()):
+            return masked_mean_pool(x, mask)
+
+    def prepend_memory(self, x, attention_mask):
+        """Prepend the learned memory token to every sequence (always attended)"""
+        batch_size = x.size(0)
+        memory = self.memory_token.expand(batch_size, -1, -1)
+        x = torch.cat([memory, x], dim=1)
+        memory_mask = torch.ones(batch_size, 1, device=attention_mask.device,
+                                 dtype=attention_mask.dtype)
+        return x, torch.cat([memory_mask, attention_mask], dim=1)
+
+    def forward(self, input_ids, attention_mask, return_embedding=False,
+                prefix_hidden=None):
+        pooled = self.encode(input_ids, attention_mask, prefix_hidden=prefix_hidden)
         
         # Contrastive embedding
         if return_embedding and self.genome.use_contrastive:
-            embedding = self.contrastive_head(pooled)
+            with self._stage('contrastive_head', lambda: self._head_flops('contrastive', pooled)):
+                embedding = self.contrastive_head(pooled)
             return embedding
         
         # Classification
-        logits = self.classifier(pooled).squeeze(-1)
+        with self._stage('classifier', lambda: self._head_flops('classifier', pooled)):
+            logits = self.classifier(pooled).squeeze(-1)
         return logits
+
+    def _head_flops(self, head, pooled):
+        d = self.genome.d_model
+        dims = [d, d // 2, 1] if head == 'classifier' else [d, d, d // 2]
+        return mlp_flops(pooled.size(0), dims)
+
+    def forward_multiple_choice(self, input_ids, attention_mask, prefix_hidden=None,
+                                return_embedding=False, deduplicate=None):
+        """Score all choices of a [batch, num_choices, seq] input in one fused batch
+
+        Returns ``(logits, predictions)`` with logits shaped [batch, num_choices];
+        with ``return_embedding`` the contrastive embeddings of every choice are
+        appended as a third element. RoBERTa attends bidirectionally, so the goal
+        prefix cannot be shared between choices; instead identical rows (e.g.
+        repeated augmentations or equal solutions) are encoded once. Finding
+        them sorts every row, so ``deduplicate`` defaults to eval mode only;
+        it does not apply to ``prefix_hidden`` inputs.
+        """
+        batch_size, num_choices, seq_len = attention_mask.shape
+        flat_mask = attention_mask.reshape(batch_size * num_choices, seq_len)
+        flat_ids = None if input_ids is None else input_ids.reshape(batch_size * num_choices, seq_len)
+        if prefix_hidden is not None:
+            prefix_hidden = prefix_hidden.reshape(batch_size * num_choices, seq_len, -1)
+
+        flat_mask, flat_ids, prefix_hidden = trim_padding(flat_mask, flat_ids, prefix_hidden)
+        max_len = flat_mask.size(1)
+
+        if deduplicate is None:
+            deduplicate = not self.training
+        inverse = None
+        if deduplicate and flat_ids is not None and prefix_hidden is None:
+            rows = torch.cat([flat_ids, flat_mask.to(flat_ids.dtype)], dim=1)
+            unique_rows, inverse = torch.unique(rows, dim=0, return_inverse=True)
+            if unique_rows.size(0) < rows.size(0):
+                flat_ids = unique_rows[:, :max_len]
+                flat_mask = unique_rows[:, max_len:].to(attention_mask.dtype)
+            else:
+                inverse = None
+
+        pooled = self.encode(flat_ids, flat_mask, prefix_hidden=prefix_hidden)
+        if inverse is not None:
+            pooled = pooled[inverse]
+
+        with self._stage('classifier', lambda: self._head_flops('classifier', pooled)):
+            logits = self.classifier(pooled).view(batch_size, num_choices)
+        predictions = logits.argmax(dim=-1)
+        if return_embedding and self.genome.use_contrastive:
+            with self._stage('contrastive_head', lambda: self._head_flops('contrastive', pooled)):
+                embedding = self.contrastive_head(pooled).view(batch_size, num_choices, -1)
+            return logits, predictions, embedding
+        return logits, predictions
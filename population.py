@@ -0,0 +1,220 @@
+"""
+Parallel population evaluator for CompetitiveGenome
+Trains/evaluates a list of genomes concurrently on a CPU process pool that
+shares one read-only base RoBERTa and one memory-mapped dataset store
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import torch
+import torch.multiprocessing as mp
+
+from dataset_store import store_data_version
+from fitness_cache import genome_key
+from model_competitive import CompetitiveGenome, share_frozen_roberta
+
+# Per-worker state, populated once by _init_worker
+_WORKER = {}
+
+def _init_worker(base_roberta, config):
+    threads = config['threads_per_worker']
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+
+    from data_pipeline import make_dataloader
+    from dataset_store import open_store
+
+    train_store = open_store(config['train_path'])
+    val_store = open_store(config['val_path'])
+    _WORKER['base_roberta'] = base_roberta
+    _WORKER['config'] = config
+    _WORKER['train_loader'] = make_dataloader(train_store, config['batch_size'],
+                                              shuffle=True, seed=config['seed'])
+    _WORKER['val_loader'] = make_dataloader(val_store, config['batch_size'], shuffle=False)
+
+def _evaluate_genome(genome_dict, checkpoint_path, key):
+    from trainer import GenomeTrainer
+
+    config = _WORKER['config']
+    genome = CompetitiveGenome.from_dict(genome_dict)
+    roberta = share_frozen_roberta(_WORKER['base_roberta'], genome.unfreeze_layers)
+    trainer_kwargs = dict(config['trainer_kwargs'])
+    if config['metrics_log_dir'] is not None:
+        from profiling import JsonlSink
+        run_name = key[:16]
+        trainer_kwargs.update(run_name=run_name, metrics_sink=JsonlSink(
+            os.path.join(config['metrics_log_dir'], f'genome_{run_name}.jsonl')))
+    trainer = GenomeTrainer(genome, roberta, _WORKER['train_loader'], _WORKER['val_loader'],
+                            seed=config['seed'], **trainer_kwargs)
+    result = trainer.fit(epochs=config['epochs'], patience=config['patience'],
+                         checkpoint_path=checkpoint_path)
+    if config['cost_kwargs'] is not None:
+        from fitness import measure_inference_cost
+        result['cost'] = measure_inference_cost(trainer.model, **config['cost_kwargs'])
+    result['worker_pid'] = os.getpid()
+    return result
+
+class PopulationEvaluator:
+    """Score a population of genomes in parallel
+
+    Each worker process gets ``threads_per_worker`` intra-op threads. The base
+    RoBERTa is moved to shared memory once; workers share its frozen prefix and
+    clone only the layers a genome unfreezes. If a worker dies, the genomes it
+    took down with it are retried on a fresh pool up to ``max_retries`` times
+    and then reported with ``status='failed'``.
+
+    Genomes are keyed on their hyperparameters, the ``data_version`` of both
+    stores and the seed; checkpoints are written to
+    ``<checkpoint_dir>/genome_<key>.pt``. With a ``fitness_cache`` (see
+    ``fitness_cache.FitnessCache``), genomes already evaluated on the same
+    data/seed are looked up instead of trained, and duplicates within one
+    population are trained only once.
+
+    With ``cost_kwargs`` (arguments for ``fitness.measure_inference_cost``)
+    each worker also measures its trained genome's inference latency,
+    throughput and peak memory, stored under ``result['cost']``. Workers run
+    concurrently, so for final rankings measure with ``num_workers=1`` or
+    re-measure the Pareto front on an idle machine. Costs are cached with
+    the fitness; a cached result without one is evaluated again.
+
+    With ``metrics_log_dir`` every genome appends step and epoch records to
+    ``<metrics_log_dir>/genome_<key>.jsonl``, which the dashboard's
+    ``log_ingest.LogIngester`` can follow live.
+    """
+    def __init__(self, base_roberta, train_path, val_path, num_workers=None,
+                 threads_per_worker=None, epochs=10, patience=4, batch_size=32,
+                 seed=42, max_retries=1, checkpoint_dir=None, trainer_kwargs=None,
+                 fitness_cache=None, cost_kwargs=None, metrics_log_dir=None):
+        cpu_count = os.cpu_count() or 1
+        self.num_workers = num_workers or max(1, cpu_count // (threads_per_worker or 4))
+        self.threads_per_worker = threads_per_worker or max(1, cpu_count // self.num_workers)
+        self.base_roberta = base_roberta.share_memory()
+        self.checkpoint_dir = checkpoint_dir
+        self.max_retries = max_retries
+        self.fitness_cache = fitness_cache
+        self.data_version = f'{store_data_version(train_path)}+{store_data_version(val_path)}'
+        if fitness_cache is not None:
+            if fitness_cache.data_version is None:
+                fitness_cache.data_version = self.data_version
+            if (fitness_cache.data_version, fitness_cache.seed) != (self.data_version, seed):
+                raise ValueError(
+                    f"Fitness cache is keyed on data {fitness_cache.data_version!r}, seed "
+                    f"{fitness_cache.seed} but this population trains on data "
+                    f"{self.data_version!r}, seed {seed}")
+        self.config = {
+            'train_path': train_path,
+            'val_path': val_path,
+            'threads_per_worker': self.threads_per_worker,
+            'epochs': epochs,
+            'patience': patience,
+            'batch_size': batch_size,
+            'seed': seed,
+            'trainer_kwargs': trainer_kwargs or {},
+            'cost_kwargs': cost_kwargs,
+            'metrics_log_dir': metrics_log_dir,
+        }
+        if metrics_log_dir is not None:
+            os.makedirs(metrics_log_dir, exist_ok=True)
+
+    def _make_pool(self, num_genomes):
+        return ProcessPoolExecutor(
+            max_workers=min(self.num_workers, num_genomes),
+            mp_context=mp.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(self.base_roberta, self.config))
+
+    def _key(self, genome):
+        if self.fitness_cache is not None:
+            return self.fitness_cache.key(genome)
+        return genome_key(genome, self.data_version, self.config['seed'])
+
+    def _checkpoint_path(self, genome):
+        if self.checkpoint_dir is None:
+            return None
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        return os.path.join(self.checkpoint_dir, f'genome_{self._key(genome)[:16]}.pt')
+
+    @staticmethod
+    def _failed(genome, error, wall_time=0.0):
+        return {
+            'genome': genome.to_dict(),
+            'status': 'failed',
+            'error': error,
+            'best_val_acc': 0.0,
+            'history': [],
+            'wall_time': wall_time,
+            'train_examples_per_sec': 0.0,
+            'peak_memory_mb': 0.0,
+        }
+
+    def evaluate(self, genomes):
+        """Return one result dict per genome, in input order"""
+        if self.fitness_cache is None:
+            return self._evaluate_uncached(genomes)
+
+        results = [None] * len(genomes)
+        to_train = {}  # cache key -> indices of identical genomes
+        for i, genome in enumerate(genomes):
+            cached = self.fitness_cache.get(genome)
+            if cached is not None and (self.config['cost_kwargs'] is None or 'cost' in cached):
+                results[i] = cached
+            else:
+                to_train.setdefault(self.fitness_cache.key(genome), []).append(i)
+
+        unique = [indices[0] for indices in to_train.values()]
+        trained = self._evaluate_uncached([genomes[i] for i in unique])
+        for indices, result in zip(to_train.values(), trained):
+            self.fitness_cache.put(genomes[indices[0]], result)
+            for i in indices:
+                results[i] = result
+        return results
+
+    def _evaluate_uncached(self, genomes):
+        results = [None] * len(genomes)
+        attempts = [0] * len(genomes)
+        pending = list(range(len(genomes)))
+
+        while pending:
+            retry = []
+            start = time.perf_counter()
+            with self._make_pool(len(pending)) as pool:
+                futures = {
+                    pool.submit(_evaluate_genome, genomes[i].to_dict(),
+                                self._checkpoint_path(genomes[i]), self._key(genomes[i])): i
+                    for i in pending
+                }
+                for future in as_completed(futures):
+                    i = futures[future]
+                    try:
+                        results[i] = future.result()
+                    except BrokenProcessPool as exc:
+                        attempts[i] += 1
+                        if attempts[i] <= self.max_retries:
+                            retry.append(i)
+                        else:
+                            results[i] = self._failed(genomes[i], f'worker died: {exc}',
+                                                      time.perf_counter() - start)
+                    except Exception as exc:
+                        results[i] = self._failed(genomes[i], repr(exc),
+                                                  time.perf_counter() - start)
+            pending = retry
+
+        return results
+
+def format_report(genomes, results):
+    """Per-genome accuracy, wall time, throughput and peak memory as a text table"""
+    lines = [f"{'Genome':<45} {'Status':<7} {'Val Acc':>8} {'Wall (s)':>10} {'Ex/s':>8} "
+             f"{'Peak MB':>8}"]
+    for genome, result in zip(genomes, results):
+        lines.append(
+            f"{str(genome):<45} {result['status']:<7} {result['best_val_acc']:>7.2f}% "
+            f"{result['wall_time']:>10.1f} {result['train_examples_per_sec']:>8.1f} "
+            f"{result.get('peak_memory_mb', 0.0):>8.0f}")
+    return '\n'.join(lines)
@@ -0,0 +1,165 @@
+"""
+Opt-in per-stage profiling for CompetitiveEvoTransformer
+Wall time, analytic FLOP estimates and memory deltas per forward stage
+(encoder, memory token, evolved layers, pooling, heads), aggregated across
+steps, with Chrome trace export and a pluggable metrics sink
+
+Usage:
+    profiler = StageProfiler(trace=True)
+    model.profiler = profiler
+    ... train / evaluate ...
+    print(profiler.format_report())
+    profiler.export_chrome_trace('trace.json')   # open in chrome://tracing
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+import torch
+
+from memory import current_memory_mb
+
+DISABLED = contextlib.nullcontext()
+
+def transformer_layer_flops(num_sequences, seq_len, d_model, ffn_dim):
+    """Forward FLOPs (multiply-add = 2) of one post/pre-norm encoder layer"""
+    tokens = num_sequences * seq_len
+    projections = 2 * tokens * (4 * d_model * d_model + 2 * d_model * ffn_dim)
+    attention = 2 * 2 * num_sequences * seq_len * seq_len * d_model
+    return projections + attention
+
+def mlp_flops(num_rows, dims):
+    """Forward FLOPs of a stack of Linear layers with widths ``dims``"""
+    return sum(2 * num_rows * d_in * d_out for d_in, d_out in zip(dims, dims[1:]))
+
+class StageStats:
+    __slots__ = ('calls', 'total_ms', 'min_ms', 'max_ms', 'flops', 'memory_delta_mb')
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ms = 0.0
+        self.min_ms = float('inf')
+        self.max_ms = 0.0
+        self.flops = 0
+        self.memory_delta_mb = 0.0
+
+    def to_dict(self):
+        return {
+            'calls': self.calls,
+            'total_ms': self.total_ms,
+            'mean_ms': self.total_ms / max(self.calls, 1),
+            'min_ms': self.min_ms if self.calls else 0.0,
+            'max_ms': self.max_ms,
+            'gflops': self.flops / 1e9,
+            'gflops_per_sec': self.flops / 1e6 / max(self.total_ms, 1e-9),
+            'memory_delta_mb': self.memory_delta_mb,
+        }
+
+class StageProfiler:
+    """Aggregate per-stage timings; attach with ``model.profiler = StageProfiler()``
+
+    A model without a profiler only pays an attribute check per stage. On CUDA
+    each stage is synchronized so times are attributed to the right stage; on
+    CPU the memory delta is the change in process RSS across the stage.
+    """
+    def __init__(self, device='cpu', trace=False, track_memory=True, sink=None):
+        self.device = torch.device(device)
+        self.trace = trace
+        self.track_memory = track_memory
+        self.sink = sink
+        self.stats = {}
+        self.events = []
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _sync(self):
+        if self.device.type == 'cuda':
+            torch.cuda.synchronize(self.device)
+
+    @contextlib.contextmanager
+    def stage(self, name, flops=None):
+        self._sync()
+        memory_before = current_memory_mb(self.device) if self.track_memory else 0.0
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._sync()
+            end = time.perf_counter()
+            memory_delta = (current_memory_mb(self.device) - memory_before
+                            if self.track_memory else 0.0)
+            self._record(name, start, end, flops, memory_delta)
+
+    def _record(self, name, start, end, flops, memory_delta):
+        elapsed_ms = 1000.0 * (end - start)
+        with self._lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = StageStats()
+            stats.calls += 1
+            stats.total_ms += elapsed_ms
+            stats.min_ms = min(stats.min_ms, elapsed_ms)
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+            stats.flops += flops or 0
+            stats.memory_delta_mb += memory_delta
+            if self.trace:
+                self.events.append({
+                    'name': name, 'ph': 'X', 'cat': 'stage',
+                    'ts': 1e6 * (start - self._origin), 'dur': 1e6 * (end - start),
+                    'pid': os.getpid(), 'tid': threading.get_ident() % 2**31,
+                    'args': {'flops': flops or 0, 'memory_delta_mb': memory_delta},
+                })
+
+    def summary(self):
+        """``{stage: {calls, total_ms, mean_ms, gflops, ...}}`` plus each stage's share of time"""
+        with self._lock:
+            summary = {name: stats.to_dict() for name, stats in self.stats.items()}
+        total = sum(s['total_ms'] for s in summary.values())
+        for stats in summary.values():
+            stats['time_fraction'] = stats['total_ms'] / max(total, 1e-9)
+        return summary
+
+    def reset(self):
+        with self._lock:
+            self.stats = {}
+            self.events = []
+
+    def export_chrome_trace(self, path):
+        """Write recorded stages as Chrome trace events (requires ``trace=True``)"""
+        with self._lock:
+            events = list(self.events)
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+    def flush(self, tags=None):
+        """Send the aggregated summary to ``sink`` (a callable taking one dict)"""
+        if self.sink is not None:
+            self.sink({'timestamp': time.time(), 'tags': tags or {}, 'stages': self.summary()})
+
+    def format_report(self):
+        lines = [f"{'Stage':<18} {'Calls':>6} {'Total ms':>10} {'Mean ms':>9} {'Share':>6} {'GFLOP/s':>8}"]
+        for name, s in sorted(self.summary().items(), key=lambda kv: -kv[1]['total_ms']):
+            lines.append(f"{name:<18} {s['calls']:>6} {s['total_ms']:>10.1f} {s['mean_ms']:>9.2f} "
+                         f"{100 * s['time_fraction']:>5.1f}% {s['gflops_per_sec']:>8.1f}")
+        return '\n'.join(lines)
+
+class JsonlSink:
+    """Metrics sink appending one JSON object per flush to a file"""
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, record):
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
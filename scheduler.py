@@ -0,0 +1,208 @@
+"""
+Multi-fidelity scheduling for genome training
+Successive halving (and Hyperband brackets on top of it): every genome gets a
+small budget, only the top 1/eta by partial validation curve are promoted to
+the next rung, and the rest are stopped early
+"""
+
+import math
+import time
+
+from model_competitive import CompetitiveGenome
+
+class SuccessiveHalvingScheduler:
+    """Successive halving over a population of genomes
+
+    ``make_trainer(genome)`` must return a ``trainer.GenomeTrainer``. Budgets
+    are counted in units: one unit is a full epoch, or ``batches_per_unit``
+    training batches when set (data-fraction fidelity). Surviving trainers
+    continue where they left off, so promoted genomes never repeat work.
+
+    With a ``checkpoint`` (``checkpoint.SearchCheckpoint``) the search state is
+    saved after every rung, and ``run`` resumes from it instead of starting
+    over; a finished search returns its saved results.
+    """
+    def __init__(self, make_trainer, min_units=1, max_units=9, eta=3,
+                 batches_per_unit=None, patience=4, checkpoint=None):
+        if eta < 2:
+            raise ValueError("eta must be >= 2")
+        self.make_trainer = make_trainer
+        self.min_units = min_units
+        self.max_units = max_units
+        self.eta = eta
+        self.batches_per_unit = batches_per_unit
+        self.patience = patience
+        self.checkpoint = checkpoint
+
+    def saved_genomes(self):
+        """Population of the checkpointed search, or None if there is none"""
+        if self.checkpoint is None or not self.checkpoint.exists():
+            return None
+        return [CompetitiveGenome.from_dict(d) for d in self.checkpoint.load()['state']['genomes']]
+
+    def rung_budgets(self):
+        """Cumulative units each rung trains its survivors up to"""
+        budgets = []
+        budget = self.min_units
+        while budget < self.max_units:
+            budgets.append(budget)
+            budget *= self.eta
+        budgets.append(self.max_units)
+        return budgets
+
+    def _train_to(self, trainer, budget):
+        used = 0
+        while len(trainer.history) < budget:
+            # Plateaued genomes keep their rank but stop consuming compute
+            if len(trainer.history) - trainer.best_epoch >= self.patience:
+                break
+            trainer.run_epoch(max_batches=self.batches_per_unit)
+            used += 1
+        return used
+
+    def run(self, genomes):
+        """Return ``(results, report)``; results are in input order"""
+        start = time.perf_counter()
+        progress = {
+            'genomes': [g.to_dict() for g in genomes],
+            'next_rung': 0,
+            'alive': list(range(len(genomes))),
+            'units': [0] * len(genomes),
+            'seconds': [0.0] * len(genomes),
+            'results': [None] * len(genomes),
+            'rungs': [],
+            'elapsed': 0.0,
+        }
+        trainers = None
+        if self.checkpoint is not None and self.checkpoint.exists():
+            payload = self.checkpoint.load()
+            if payload['state']['genomes'] != progress['genomes']:
+                raise ValueError(f"Checkpoint {self.checkpoint.directory} holds a different population")
+            progress = payload['state']
+            if 'report' in progress:
+                self.checkpoint.restore_rng(payload)
+                return progress['results'], progress['report']
+            trainers = {i: self.checkpoint.restore_trainer(str(i), self.make_trainer(genomes[i]),
+                                                           payload)
+                        for i in progress['alive']}
+            self.checkpoint.restore_rng(payload)
+            start -= progress['elapsed']
+        if trainers is None:
+            trainers = {i: self.make_trainer(g) for i, g in enumerate(genomes)}
+
+        units, seconds, results = progress['units'], progress['seconds'], progress['results']
+        rungs, alive = progress['rungs'], progress['alive']
+        budgets = self.rung_budgets()
+        for rung in range(progress['next_rung'], len(budgets)):
+            budget = budgets[rung]
+            for i in alive:
+                t0 = time.perf_counter()
+                units[i] += self._train_to(trainers[i], budget)
+                seconds[i] += time.perf_counter() - t0
+
+            ranked = sorted(alive, key=lambda i: trainers[i].best_val_acc, reverse=True)
+            is_last = rung == len(budgets) - 1
+            keep = len(ranked) if is_last else max(1, len(ranked) // self.eta)
+            rungs.append({
+                'rung': rung,
+                'budget': budget,
+                'num_genomes': len(alive),
+                'promoted': 0 if is_last else keep,
+                'best_val_acc': trainers[ranked[0]].best_val_acc,
+            })
+
+            for position, i in enumerate(ranked):
+                if position >= keep or is_last:
+                    status = 'complete' if is_last else 'stopped'
+                    results[i] = dict(trainers[i].result(seconds[i]), status=status,
+                                      rung=rung, units=units[i])
+                    del trainers[i]  # release the model and optimizer state
+            alive = ranked[:keep]
+            if is_last:
+                break
+            if self.checkpoint is not None:
+                progress.update(next_rung=rung + 1, alive=alive,
+                                elapsed=time.perf_counter() - start)
+                self.checkpoint.save(progress, {str(i): trainers[i] for i in alive})
+
+        used = sum(units)
+        full = len(genomes) * self.max_units
+        seconds_per_unit = sum(seconds) / max(used, 1)
+        report = {
+            'num_genomes': len(genomes),
+            'units_used': used,
+            'units_full_budget': full,
+            'units_saved': full - used,
+            'saved_fraction': 1.0 - used / max(full, 1),
+            'estimated_seconds_saved': (full - used) * seconds_per_unit,
+            'wall_time': time.perf_counter() - start,
+            'rungs': rungs,
+        }
+        if self.checkpoint is not None:
+            progress.update(next_rung=len(budgets), alive=[], report=report)
+            self.checkpoint.save(progress)
+        return results, report
+
+def hyperband_brackets(max_units, eta=3):
+    """(num_genomes, min_units) for each Hyperband bracket, most aggressive first"""
+    s_max = int(math.log(max_units) / math.log(eta) + 1e-9)
+    brackets = []
+    for s in range(s_max, -1, -1):
+        num_genomes = int(math.ceil((s_max + 1) / (s + 1) * eta ** s))
+        min_units = max(1, int(round(max_units * eta ** -s)))
+        brackets.append((num_genomes, min_units))
+    return brackets
+
+class Hyperband:
+    """Run successive halving brackets that trade population size for budget
+
+    ``sample_genomes(n)`` proposes ``n`` new genomes for a bracket. With a
+    ``checkpoint`` each bracket is checkpointed in its own sub-directory;
+    brackets already started keep their population on resume.
+    """
+    def __init__(self, make_trainer, sample_genomes, max_units=9, eta=3,
+                 batches_per_unit=None, patience=4, checkpoint=None):
+        self.make_trainer = make_trainer
+        self.sample_genomes = sample_genomes
+        self.max_units = max_units
+        self.eta = eta
+        self.batches_per_unit = batches_per_unit
+        self.patience = patience
+        self.checkpoint = checkpoint
+
+    def run(self):
+        all_results, reports = [], []
+        brackets = hyperband_brackets(self.max_units, self.eta)
+        for bracket, (num_genomes, min_units) in enumerate(brackets):
+            scheduler = SuccessiveHalvingScheduler(
+                self.make_trainer, min_units=min_units, max_units=self.max_units,
+                eta=self.eta, batches_per_unit=self.batches_per_unit, patience=self.patience,
+                checkpoint=self.checkpoint and self.checkpoint.child(f'bracket_{bracket}'))
+            genomes = scheduler.saved_genomes() or self.sample_genomes(num_genomes)
+            results, report = scheduler.run(genomes)
+            all_results.extend(results)
+            reports.append(report)
+
+        used = sum(r['units_used'] for r in reports)
+        full = sum(r['units_full_budget'] for r in reports)
+        summary = {
+            'brackets': reports,
+            'units_used': used,
+            'units_full_budget': full,
+            'units_saved': full - used,
+            'saved_fraction': 1.0 - used / max(full, 1),
+            'estimated_seconds_saved': sum(r['estimated_seconds_saved'] for r in reports),
+        }
+        return all_results, summary
+
+def format_report(report):
+    """Human-readable compute-savings summary for a scheduler report"""
+    lines = []
+    for rung in report.get('rungs', []):
+        lines.append(f"Rung {rung['rung']}: {rung['num_genomes']} genomes to "
+                     f"{rung['budget']} units, best {rung['best_val_acc']:.2f}%, "
+                     f"promoted {rung['promoted']}")
+    lines.append(f"Compute: {report['units_used']}/{report['units_full_budget']} units "
+                 f"({100.0 * report['saved_fraction']:.1f}% saved, "
+                 f"~{report['estimated_seconds_saved'] / 3600:.2f} h)")
+    return '\n'.join(lines)
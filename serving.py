@@ -0,0 +1,255 @@
+"""
+Micro-batching inference server for CompetitiveEvoTransformer
+Queues PIQA-style requests, groups them into dynamic micro-batches bounded by
+max batch size and max wait time, and runs them on a worker pool
+
+Usage:
+    python serving.py --checkpoint genome.pt --port 8080 --max-batch-size 32
+    curl -X POST localhost:8080/predict -d '{"goal": "...", "sol1": "...", "sol2": "..."}'
+    curl localhost:8080/metrics
+"""
+
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, TimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+class ServerStopped(RuntimeError):
+    """Raised for requests the server stopped before scoring"""
+
+class MicroBatchServer:
+    """Dynamic batching front-end for an ``inference.InferenceEngine``
+
+    A worker takes the first queued request, then keeps collecting until it
+    has ``max_batch_size`` requests or ``max_wait_ms`` has passed since that
+    first request, and scores the batch with one ``engine.predict`` call.
+    ``stop`` fails requests still queued (and any submitted afterwards) with
+    ``ServerStopped``, so no caller waits forever.
+    """
+    def __init__(self, engine, max_batch_size=32, max_wait_ms=5.0, num_workers=1,
+                 latency_window=10000):
+        self.engine = engine
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.num_workers = num_workers
+        self.requests = queue.Queue()
+        self.workers = []
+        self.running = False
+
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=latency_window)
+        self._batch_sizes = Counter()
+        self._completed = 0
+        self._failed = 0
+
+    def start(self):
+        self.running = True
+        for i in range(self.num_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f'microbatch-{i}', daemon=True)
+            worker.start()
+            self.workers.append(worker)
+        return self
+
+    def stop(self):
+        with self._lock:
+            self.running = False
+        for _ in self.workers:
+            self.requests.put(None)
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
+
+        leftover = []
+        while True:
+            try:
+                item = self.requests.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                leftover.append(item[3])
+        with self._lock:
+            self._failed += len(leftover)
+        for future in leftover:
+            future.set_exception(ServerStopped('server stopped before scoring this request'))
+
+    def submit(self, goal, sol1, sol2):
+        """Queue one request; the Future resolves to its prediction dict"""
+        future = Future()
+        with self._lock:
+            if self.running:
+                self.requests.put((goal, sol1, sol2, future, time.perf_counter()))
+                return future
+        future.set_exception(ServerStopped('server is not running'))
+        return future
+
+    def predict(self, goal, sol1, sol2, timeout=None):
+        return self.submit(goal, sol1, sol2).result(timeout=timeout)
+
+    def _collect_batch(self):
+        first = self.requests.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self.requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Shutdown sentinel: finish this batch, then let the loop exit
+                self.requests.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _worker_loop(self):
+        while self.running:
+            batch = self._collect_batch()
+            if batch is None:
+                break
+            goals, sol1s, sol2s, futures, enqueued = zip(*batch)
+            try:
+                output = self.engine.predict(list(goals), list(sol1s), list(sol2s))
+            except Exception as exc:
+                with self._lock:
+                    self._failed += len(batch)
+                for future in futures:
+                    future.set_exception(exc)
+                continue
+
+            done = time.perf_counter()
+            latencies = [1000.0 * (done - t) for t in enqueued]
+            with self._lock:
+                self._latencies.extend(latencies)
+                self._batch_sizes[len(batch)] += 1
+                self._completed += len(batch)
+            for i, future in enumerate(futures):
+                future.set_result({
+                    'prediction': output['predictions'][i],
+                    'probabilities': output['probabilities'][i],
+                    'latency_ms': latencies[i],
+                    'batch_size': len(batch),
+                })
+
+    def metrics(self):
+        """Queue depth, batch-size distribution and p50/p99 latency"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            batch_sizes = dict(self._batch_sizes)
+            completed, failed = self._completed, self._failed
+        num_batches = sum(batch_sizes.values())
+        return {
+            'queue_depth': self.requests.qsize(),
+            'completed': completed,
+            'failed': failed,
+            'batches': num_batches,
+            'avg_batch_size': completed / num_batches if num_batches else 0.0,
+            'batch_size_histogram': batch_sizes,
+            'latency_p50_ms': _percentile(latencies, 50),
+            'latency_p99_ms': _percentile(latencies, 99),
+        }
+
+def make_handler(server, request_timeout=30.0):
+    """HTTP handler exposing POST /predict and GET /metrics for ``server``
+
+    Requests not scored within ``request_timeout`` seconds, or dropped by a
+    stopping server, get a 503.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def _send_json(self, payload, status=200):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/metrics':
+                self._send_json(server.metrics())
+            elif self.path == '/health':
+                self._send_json({'status': 'healthy'})
+            else:
+                self._send_json({'error': 'not found'}, 404)
+
+        def do_POST(self):
+            if self.path != '/predict':
+                self._send_json({'error': 'not found'}, 404)
+                return
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length))
+                items = payload['items'] if 'items' in payload else [payload]
+                futures = [server.submit(it['goal'], it['sol1'], it['sol2']) for it in items]
+            except (ValueError, KeyError, TypeError) as exc:
+                self._send_json({'error': f'bad request: {exc}'}, 400)
+                return
+            deadline = time.monotonic() + request_timeout
+            try:
+                results = [f.result(timeout=max(0.0, deadline - time.monotonic()))
+                           for f in futures]
+            except TimeoutError:
+                self._send_json({'error': 'timed out waiting for the model'}, 503)
+                return
+            except ServerStopped as exc:
+                self._send_json({'error': str(exc)}, 503)
+                return
+            except Exception as exc:
+                self._send_json({'error': str(exc)}, 500)
+                return
+            self._send_json({'results': results} if 'items' in payload else results[0])
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-batching CompetitiveEvoTransformer server')
+    parser.add_argument('--checkpoint', required=True)
+    parser.add_argument('--roberta', default='roberta-base')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--max-batch-size', type=int, default=32)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--request-timeout', type=float, default=30.0,
+                        help='Seconds before a queued request gets a 503')
+    parser.add_argument('--threads', type=int, help='Intra-op threads for torch')
+    parser.add_argument('--fp32', action='store_true', help='Disable int8 quantization')
+    args = parser.parse_args()
+
+    from inference import InferenceEngine
+    engine = InferenceEngine.from_checkpoint(args.checkpoint, roberta_name=args.roberta,
+                                             quantize=not args.fp32,
+                                             batch_size=args.max_batch_size,
+                                             threads=args.threads)
+    server = MicroBatchServer(engine, max_batch_size=args.max_batch_size,
+                              max_wait_ms=args.max_wait_ms, num_workers=args.workers).start()
+
+    httpd = ThreadingHTTPServer((args.host, args.port), make_handler(server, args.request_timeout))
+    print(f"Serving on http://{args.host}:{args.port} (POST /predict, GET /metrics)")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        server.stop()
+
+if __name__ == '__main__':
+    main()
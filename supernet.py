@@ -0,0 +1,222 @@
+"""
+Weight-sharing supernet for the evolved layers
+One over-parameterized stack covers the largest num_layers/num_heads/ffn_dim
+in the search space; candidate genomes are evaluated as sliced sub-networks
+that inherit the shared weights and only get a short fine-tune
+"""
+
+import random
+import time
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+from model_competitive import CompetitiveEvoTransformer, CompetitiveGenome, share_frozen_roberta
+from trainer import GenomeTrainer
+
+DEFAULT_SEARCH_SPACE = {
+    'num_layers': [1, 2, 3, 4],
+    'num_heads': [4, 8, 12],
+    'ffn_dim': [512, 1024, 2048, 3072],
+}
+
+# Genome fields that must match the supernet; the rest are sliced or training-only
+FIXED_FIELDS = ('d_model', 'unfreeze_layers', 'memory_enabled', 'use_contrastive', 'norm_first')
+
+class SuperTransformerBlock(nn.Module):
+    """TransformerBlock at maximum FFN width that can run any (heads, ffn) slice
+
+    Parameters use the ``TransformerBlock`` layout so a slice exports directly
+    into a regular block. The attention projections do not depend on the head
+    count (d_model is fixed), so only the FFN is sliced.
+    """
+    def __init__(self, d_model, max_ffn_dim, dropout=0.1, norm_first=False):
+        super().__init__()
+        self.d_model = d_model
+        self.dropout = dropout
+        self.norm_first = norm_first
+        self.in_proj_weight = nn.Parameter(torch.empty(3 * d_model, d_model))
+        self.in_proj_bias = nn.Parameter(torch.zeros(3 * d_model))
+        self.out_proj = nn.Linear(d_model, d_model)
+        self.ffn_in = nn.Linear(d_model, max_ffn_dim)
+        self.ffn_out = nn.Linear(max_ffn_dim, d_model)
+        self.norm1 = nn.LayerNorm(d_model)
+        self.norm2 = nn.LayerNorm(d_model)
+        nn.init.xavier_uniform_(self.in_proj_weight)
+        nn.init.zeros_(self.out_proj.bias)
+
+        # Active sub-network, set by SuperNet.set_active
+        self.enabled = True
+        self.num_heads = 12
+        self.ffn_dim = max_ffn_dim
+
+    def forward(self, x, mask=None):
+        if not self.enabled:
+            return x
+        if mask is not None and mask.dim() == 2:
+            mask = (~mask)[:, None, None, :]
+
+        if self.norm_first:
+            x = x + self._attention(self.norm1(x), mask)
+            return x + self._ffn(self.norm2(x))
+        x = self.norm1(x + self._attention(x, mask))
+        return self.norm2(x + self._ffn(x))
+
+    def _attention(self, x, attn_mask):
+        batch_size, seq_len, _ = x.shape
+        head_dim = self.d_model // self.num_heads
+        dropout = self.dropout if self.training else 0.0
+
+        qkv = F.linear(x, self.in_proj_weight, self.in_proj_bias)
+        q, k, v = qkv.view(batch_size, seq_len, 3, self.num_heads, head_dim).permute(2, 0, 3, 1, 4)
+        attn = F.scaled_dot_product_attention(q, k, v, attn_mask=attn_mask, dropout_p=dropout)
+        return self.out_proj(attn.transpose(1, 2).reshape(batch_size, seq_len, self.d_model))
+
+    def _ffn(self, x):
+        dropout = self.dropout if self.training else 0.0
+        h = F.linear(x, self.ffn_in.weight[:self.ffn_dim], self.ffn_in.bias[:self.ffn_dim])
+        h = F.dropout(F.gelu(h), dropout, self.training)
+        h = F.linear(h, self.ffn_out.weight[:, :self.ffn_dim], self.ffn_out.bias)
+        return F.dropout(h, dropout, self.training)
+
+    def export_state(self, ffn_dim):
+        """State dict of a ``TransformerBlock`` holding this block's slice"""
+        return {
+            'attention.in_proj_weight': self.in_proj_weight.detach().clone(),
+            'attention.in_proj_bias': self.in_proj_bias.detach().clone(),
+            'attention.out_proj.weight': self.out_proj.weight.detach().clone(),
+            'attention.out_proj.bias': self.out_proj.bias.detach().clone(),
+            'ffn.0.weight': self.ffn_in.weight[:ffn_dim].detach().clone(),
+            'ffn.0.bias': self.ffn_in.bias[:ffn_dim].detach().clone(),
+            'ffn.3.weight': self.ffn_out.weight[:, :ffn_dim].detach().clone(),
+            'ffn.3.bias': self.ffn_out.bias.detach().clone(),
+            'norm1.weight': self.norm1.weight.detach().clone(),
+            'norm1.bias': self.norm1.bias.detach().clone(),
+            'norm2.weight': self.norm2.weight.detach().clone(),
+            'norm2.bias': self.norm2.bias.detach().clone(),
+        }
+
+class SuperNet(CompetitiveEvoTransformer):
+    """CompetitiveEvoTransformer whose evolved stack spans a whole search space
+
+    ``base_genome`` fixes unfreezing, memory token and contrastive head;
+    ``search_space`` lists the allowed num_layers / num_heads / ffn_dim values.
+    """
+    def __init__(self, base_genome, pretrained_roberta, search_space=None):
+        self.search_space = search_space or DEFAULT_SEARCH_SPACE
+        max_genome = CompetitiveGenome.from_dict(dict(
+            base_genome.to_dict(),
+            num_layers=max(self.search_space['num_layers']),
+            num_heads=max(self.search_space['num_heads']),
+            ffn_dim=max(self.search_space['ffn_dim'])))
+        super().__init__(max_genome, pretrained_roberta)
+
+        self.evolved_layers = nn.ModuleList([
+            SuperTransformerBlock(max_genome.d_model, max_genome.ffn_dim, max_genome.dropout,
+                                  norm_first=max_genome.norm_first)
+            for _ in range(max_genome.num_layers)
+        ])
+        self.max_genome = max_genome
+
+    def _check_genome(self, genome):
+        for field in FIXED_FIELDS:
+            if getattr(genome, field) != getattr(self.max_genome, field):
+                raise ValueError(f"Supernet has {field}={getattr(self.max_genome, field)}, "
+                                 f"genome has {getattr(genome, field)}")
+        for field, choices in self.search_space.items():
+            if getattr(genome, field) > max(choices):
+                raise ValueError(f"{field}={getattr(genome, field)} exceeds supernet maximum")
+
+    def set_active(self, genome):
+        """Route forward passes through ``genome``'s slice of the shared weights"""
+        self._check_genome(genome)
+        for i, block in enumerate(self.evolved_layers):
+            block.enabled = i < genome.num_layers
+            block.num_heads = genome.num_heads
+            block.ffn_dim = genome.ffn_dim
+
+    def sample_genome(self, rng=random):
+        config = self.max_genome.to_dict()
+        for field, choices in self.search_space.items():
+            config[field] = rng.choice(choices)
+        return CompetitiveGenome.from_dict(config)
+
+    def smallest_genome(self):
+        config = self.max_genome.to_dict()
+        for field, choices in self.search_space.items():
+            config[field] = min(choices)
+        return CompetitiveGenome.from_dict(config)
+
+    def extract(self, genome):
+        """Standalone CompetitiveEvoTransformer inheriting the supernet weights"""
+        self._check_genome(genome)
+        roberta = share_frozen_roberta(self.roberta, genome.unfreeze_layers)
+        subnet = CompetitiveEvoTransformer(genome, roberta)
+        for i, layer in enumerate(subnet.evolved_layers):
+            layer.load_state_dict(self.evolved_layers[i].export_state(genome.ffn_dim))
+        subnet.classifier.load_state_dict(self.classifier.state_dict())
+        if genome.use_contrastive:
+            subnet.contrastive_head.load_state_dict(self.contrastive_head.state_dict())
+        if genome.memory_enabled:
+            subnet.memory_token.data.copy_(self.memory_token.data)
+        return subnet.to(next(self.classifier.parameters()).device)
+
+class SupernetTrainer(GenomeTrainer):
+    """Sandwich-rule supernet training
+
+    Every step accumulates gradients from the largest sub-network, the smallest
+    one and ``num_random`` sampled ones, so all slices of the shared weights
+    stay usable.
+    """
+    def __init__(self, supernet, train_loader, val_loader, num_random=2, seed=42, **kwargs):
+        super().__init__(supernet.max_genome, None, train_loader, val_loader,
+                         seed=seed, model=supernet, **kwargs)
+        self.num_random = num_random
+        self.rng = random.Random(seed)
+
+    def train_step(self, batch):
+        """One sandwich step, backpropagating each sub-network's loss in turn
+
+        Gradients accumulate across sub-networks, so only one sub-network's
+        graph is alive at a time. Micro-batches are planned for the largest
+        one.
+        """
+        supernet = self.model
+        genomes = [supernet.max_genome, supernet.smallest_genome()]
+        genomes += [supernet.sample_genome(self.rng) for _ in range(self.num_random)]
+        if self.accumulation_steps is None and self.memory_budget_mb is not None:
+            supernet.set_active(supernet.max_genome)
+            self.accumulation_steps = self.plan_accumulation(batch)
+
+        self.optimizer.zero_grad(set_to_none=True)
+        total_loss = 0.0
+        # Largest sub-network last: its logits feed the accuracy statistics
+        for genome in reversed(genomes):
+            supernet.set_active(genome)
+            loss, logits = self.accumulate_gradients(batch, self.accumulation_steps or 1,
+                                                     scale=1.0 / len(genomes))
+            total_loss += loss / len(genomes)
+        torch.nn.utils.clip_grad_norm_(supernet.parameters(), 1.0)
+        self.optimizer.step()
+        return total_loss, logits
+
+def evaluate_candidate(supernet, genome, train_loader, val_loader, finetune_batches=200,
+                       **trainer_kwargs):
+    """Fine-tune an inherited sub-network briefly and report validation accuracy"""
+    start = time.perf_counter()
+    subnet = supernet.extract(genome)
+    trainer = GenomeTrainer(genome, None, train_loader, val_loader, model=subnet, **trainer_kwargs)
+    if finetune_batches:
+        trainer.train_epoch(max_batches=finetune_batches)
+    val_acc = trainer.evaluate()
+    return {
+        'genome': genome.to_dict(),
+        'status': 'ok',
+        'best_val_acc': val_acc,
+        'history': [{'epoch': 1, 'val_acc': val_acc, 'batches': finetune_batches}],
+        'epochs': 1,
+        'finetune_batches': finetune_batches,
+        'wall_time': time.perf_counter() - start,
+        'train_examples_per_sec': trainer.train_examples / max(trainer.train_seconds, 1e-9),
+    }
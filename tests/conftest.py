@@ -0,0 +1,35 @@
+"""
+Shared test fixtures
+A tiny randomly initialized RoBERTa keeps the model tests offline and fast on CPU
+"""
+
+import os
+import sys
+
+import pytest
+import torch
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'dashboard'))
+
+from model_competitive import CompetitiveEvoTransformer, CompetitiveGenome
+
+TINY_GENOME = {'num_layers': 1, 'd_model': 64, 'num_heads': 4, 'ffn_dim': 64,
+               'unfreeze_layers': 2, 'use_contrastive': False}
+
+def tiny_roberta(seed=0):
+    from transformers import RobertaConfig, RobertaModel
+    torch.manual_seed(seed)
+    config = RobertaConfig(hidden_size=64, num_hidden_layers=4, num_attention_heads=4,
+                           intermediate_size=128, vocab_size=1000, max_position_embeddings=140)
+    return RobertaModel(config, add_pooling_layer=False)
+
+@pytest.fixture
+def make_model():
+    """Factory for tiny CompetitiveEvoTransformers; keyword arguments override the genome"""
+    def make(seed=0, **genome):
+        genome = CompetitiveGenome.from_dict(dict(TINY_GENOME, **genome))
+        roberta = tiny_roberta(seed)
+        return CompetitiveEvoTransformer(genome, roberta)
+    return make
@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+import torch
+
+from activation_cache import FrozenPrefixCache
+from data_pipeline import synthetic_batch
+
+@torch.no_grad()
+def test_cached_prefix_matches_full_forward(make_model, tmp_path):
+    model = make_model().eval()
+    input_ids, attention_mask = synthetic_batch(6, 24)
+    cache = FrozenPrefixCache.build(model, input_ids, attention_mask, str(tmp_path), fp16=False)
+    cache.check_compatible(model)
+
+    prefix_hidden, cached_mask = cache.get_batch(np.arange(6))
+    from_cache, _ = model.forward_multiple_choice(None, cached_mask, prefix_hidden=prefix_hidden)
+    full, _ = model.forward_multiple_choice(input_ids, attention_mask)
+    assert torch.allclose(from_cache, full, atol=1e-5)
+
+def test_cache_rejects_different_frozen_weights(make_model, tmp_path):
+    model = make_model()
+    input_ids, attention_mask = synthetic_batch(2, 16)
+    cache = FrozenPrefixCache.build(model, input_ids, attention_mask, str(tmp_path))
+    with pytest.raises(ValueError, match='frozen-prefix weights'):
+        cache.check_compatible(make_model(seed=1))
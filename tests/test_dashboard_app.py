@@ -0,0 +1,68 @@
+import gzip
+import json
+
+import pytest
+
+pytest.importorskip('flask_socketio')
+
+import app as dashboard
+
+@pytest.fixture
+def client():
+    return dashboard.app.test_client()
+
+@pytest.fixture
+def training_log(tmp_path, monkeypatch):
+    path = tmp_path / 'run.jsonl'
+    path.touch()
+    monkeypatch.setattr(dashboard.ingester, 'patterns', [str(path)])
+    return path
+
+def ingest_epoch(path, run, epoch, val_acc):
+    with open(path, 'a') as f:
+        record = {'type': 'epoch', 'run': run, 'epoch': epoch, 'val_acc': val_acc}
+        f.write(json.dumps(record) + '\n')
+    dashboard.ingester.poll()
+    dashboard.ingester.flush(force=True)
+
+@pytest.mark.parametrize('url', ['/api/live-runs', '/api/all-metrics'])
+def test_live_update_invalidates_etag(client, training_log, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    old_etag = response.headers['ETag']
+    assert client.get(url, headers={'If-None-Match': old_etag}).status_code == 304
+
+    ingest_epoch(training_log, f'etag-{url}', 1, 61.5)
+
+    response = client.get(url, headers={'If-None-Match': old_etag})
+    assert response.status_code == 200
+    new_etag = response.headers['ETag']
+    assert new_etag != old_etag
+    live_runs = response.get_json() if url == '/api/live-runs' else response.get_json()['live_runs']
+    assert live_runs[f'etag-{url}']['best_accuracy'] == 61.5
+    assert client.get(url, headers={'If-None-Match': new_etag}).status_code == 304
+
+def test_live_update_leaves_curated_sections_alone(client, training_log):
+    overview = client.get('/api/overview')
+    ingest_epoch(training_log, 'weak-run', 1, 20.0)
+    response = client.get('/api/overview', headers={'If-None-Match': overview.headers['ETag']})
+    assert response.status_code == 304
+
+def test_gzip_body_matches_identity_body(client):
+    plain = client.get('/api/all-metrics')
+    compressed = client.get('/api/all-metrics', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert compressed.headers['ETag'] != plain.headers['ETag']
+    assert gzip.decompress(compressed.data) == plain.data
+
+def test_live_update_is_pushed_as_a_delta(training_log):
+    socket = dashboard.socketio.test_client(dashboard.app)
+    socket.get_received()
+    ingest_epoch(training_log, 'pushed-run', 1, 55.0)
+    deltas = [message['args'][0] for message in socket.get_received()
+              if message['name'] == 'metrics_delta']
+    (change,) = [change for delta in deltas for change in delta['changes']]
+    assert change['section'] == 'live_runs'
+    assert change['op'] == 'merge'
+    assert list(change['set']) == ['pushed-run']
+    socket.disconnect()
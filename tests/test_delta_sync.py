@@ -0,0 +1,60 @@
+from delta_sync import MetricsSync, diff
+
+def apply(value, change):
+    """Client-side application of one change (mirrors dashboard.js applyChange)"""
+    if change['op'] == 'merge':
+        value = dict(value, **change['set'])
+        for key in change['unset']:
+            value.pop(key)
+        return value
+    if change['op'] == 'list':
+        value = list(value)
+        for index, item in change['update']:
+            value[index] = item
+        return value[:change['start']] + change['append']
+    return change['value']
+
+def test_diff_ops():
+    assert diff({'a': 1}, {'a': 1}) is None
+    assert diff({'a': 1, 'b': 2}, {'a': 3, 'c': 4}) == {
+        'op': 'merge', 'set': {'a': 3, 'c': 4}, 'unset': ['b']}
+    assert diff([1, 2], [1, 5, 6]) == {'op': 'list', 'start': 2, 'append': [6],
+                                       'update': [[1, 5]]}
+    assert diff([1, 2], [1])['op'] == 'replace'
+
+def test_publish_only_records_real_changes():
+    sync = MetricsSync({'overview': {'acc': 60.0}})
+    assert sync.publish('overview', {'acc': 60.0}) is None
+    change = sync.publish('overview', {'acc': 61.0})
+    assert change['seq'] == 2 and change['set'] == {'acc': 61.0}
+
+def test_client_resumes_from_its_last_sequence():
+    progress = [{'epoch': 1}]
+    sync = MetricsSync({'progress': progress, 'overview': {'acc': 60.0}}, history=8)
+    client = {'progress': list(progress)}
+    seqs = sync.versions()
+
+    for epoch in range(2, 5):
+        progress = progress + [{'epoch': epoch}]
+        sync.publish('progress', progress)
+
+    changes = sync.changes_since(seqs, sync.session)
+    assert [change['seq'] for change in changes] == [2, 3, 4]
+    assert all(change['op'] == 'list' for change in changes)
+    for change in changes:
+        client['progress'] = apply(client['progress'], change)
+    assert client['progress'] == progress
+    assert sync.changes_since(sync.versions(), sync.session) == []
+
+def test_stale_or_foreign_clients_get_full_values():
+    sync = MetricsSync({'progress': [0]}, history=2)
+    seqs = sync.versions()
+    for n in range(1, 6):
+        sync.publish('progress', list(range(n + 1)))
+
+    # History no longer reaches back to the client's sequence
+    (change,) = sync.changes_since(seqs, sync.session)
+    assert change == {'section': 'progress', 'seq': 6, 'op': 'replace', 'value': list(range(6))}
+    # Sequences from another server session mean nothing here
+    (change,) = sync.changes_since(sync.versions(), 'previous-session')
+    assert change['op'] == 'replace'
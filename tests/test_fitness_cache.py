@@ -0,0 +1,54 @@
+import itertools
+
+import pytest
+
+import fitness_cache
+from fitness_cache import FitnessCache
+from model_competitive import CompetitiveGenome
+
+def result(val_acc, status='ok', **extra):
+    return dict({'status': status, 'best_val_acc': val_acc,
+                 'history': [{'epoch': 1, 'val_acc': val_acc}]}, **extra)
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Strictly increasing time.time() so LRU order does not depend on timer resolution"""
+    ticks = itertools.count(1000)
+    monkeypatch.setattr(fitness_cache.time, 'time', lambda: float(next(ticks)))
+
+def test_round_trip_with_cost(tmp_path, clock):
+    cache = FitnessCache(str(tmp_path / 'fitness.db'), data_version='v1')
+    genome = CompetitiveGenome(num_layers=1)
+    cache.put(genome, result(61.5, cost={'latency_ms': 3.0}))
+    cached = cache.get(genome)
+    assert cached['status'] == 'cached'
+    assert cached['best_val_acc'] == 61.5
+    assert cached['epochs'] == 1
+    assert cached['cost'] == {'latency_ms': 3.0}
+
+def test_least_recently_used_entry_is_evicted(tmp_path, clock):
+    cache = FitnessCache(str(tmp_path / 'fitness.db'), max_entries=2, data_version='v1')
+    first, second, third = (CompetitiveGenome(num_layers=n) for n in (1, 2, 3))
+    cache.put(first, result(60.0))
+    cache.put(second, result(61.0))
+    assert cache.get(first) is not None  # first is now more recent than second
+    cache.put(third, result(62.0))
+
+    assert len(cache) == 2
+    assert first in cache and third in cache
+    assert second not in cache
+
+def test_failed_results_are_not_cached(tmp_path, clock):
+    cache = FitnessCache(str(tmp_path / 'fitness.db'), data_version='v1')
+    genome = CompetitiveGenome(num_layers=1)
+    cache.put(genome, result(0.0, status='failed'))
+    assert genome not in cache
+    assert cache.get(genome) is None
+
+def test_keys_depend_on_data_version(tmp_path, clock):
+    path = str(tmp_path / 'fitness.db')
+    genome = CompetitiveGenome(num_layers=1)
+    FitnessCache(path, data_version='v1').put(genome, result(60.0))
+    assert FitnessCache(path, data_version='v2').get(genome) is None
+    with pytest.raises(ValueError):
+        FitnessCache(path).get(genome)
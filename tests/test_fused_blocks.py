@@ -0,0 +1,42 @@
+import pytest
+import torch
+
+from data_pipeline import synthetic_batch
+from model_competitive import FusedTransformerBlock, TransformerBlock
+
+def block_pair(seed=0):
+    torch.manual_seed(seed)
+    standard = TransformerBlock(64, 4, 128, dropout=0.1).eval()
+    fused = FusedTransformerBlock(64, 4, 128, dropout=0.1).eval()
+    fused.load_state_dict(standard.state_dict())
+    return standard, fused
+
+def test_state_dicts_are_interchangeable():
+    standard, fused = block_pair()
+    assert standard.state_dict().keys() == fused.state_dict().keys()
+    TransformerBlock(64, 4, 128).load_state_dict(fused.state_dict())
+
+@pytest.mark.parametrize('padded', [False, True])
+@torch.no_grad()
+def test_fused_block_matches_standard(padded):
+    standard, fused = block_pair()
+    x = torch.randn(3, 10, 64)
+    mask = torch.zeros(3, 10, dtype=torch.bool)
+    if padded:
+        mask[1, 6:] = True
+        mask[2, 3:] = True
+    keep = ~mask
+    out_standard = standard(x, mask if padded else None)
+    out_fused = fused(x, mask if padded else None)
+    assert torch.allclose(out_standard[keep], out_fused[keep], atol=1e-5)
+
+@torch.no_grad()
+def test_fused_model_loads_standard_checkpoint(make_model):
+    standard = make_model().eval()
+    fused = make_model(block_type='fused').eval()
+    fused.load_state_dict(standard.state_dict())
+
+    input_ids, attention_mask = synthetic_batch(4, 16, pad_fraction=0.4)
+    expected, _ = standard.forward_multiple_choice(input_ids, attention_mask)
+    actual, _ = fused.forward_multiple_choice(input_ids, attention_mask)
+    assert torch.allclose(expected, actual, atol=1e-5)
@@ -0,0 +1,95 @@
+import json
+import os
+
+from log_ingest import LogIngester, LogTailer, parse_line
+
+class FakeSocketIO:
+    def __init__(self):
+        self.emitted = []
+
+    def emit(self, event, payload):
+        self.emitted.append((event, payload))
+
+def append(path, text):
+    with open(path, 'a') as f:
+        f.write(text)
+
+def epoch(run, n, val_acc):
+    return json.dumps({'type': 'epoch', 'run': run, 'epoch': n, 'val_acc': val_acc}) + '\n'
+
+def test_partial_line_is_held_back_until_completed(tmp_path):
+    path = str(tmp_path / 'run.jsonl')
+    tailer = LogTailer(path)
+    assert tailer.read_lines() == []  # missing file
+
+    append(path, 'first\nsec')
+    assert tailer.read_lines() == ['first']
+    assert tailer.read_lines() == []
+    append(path, 'ond\nthird\n')
+    assert tailer.read_lines() == ['second', 'third']
+
+def test_truncated_or_replaced_file_is_read_from_the_start(tmp_path):
+    path = str(tmp_path / 'run.jsonl')
+    tailer = LogTailer(path)
+    append(path, 'one\ntwo\n')
+    assert tailer.read_lines() == ['one', 'two']
+
+    with open(path, 'w') as f:
+        f.write('new\n')
+    assert tailer.read_lines() == ['new']
+
+    replacement = str(tmp_path / 'other.jsonl')
+    append(replacement, 'replaced\n')
+    os.replace(replacement, path)
+    assert tailer.read_lines() == ['replaced']
+
+def test_parse_line_reads_only_metrics_records():
+    assert parse_line(epoch('a', 1, 60.0), 'default')['run'] == 'a'
+    assert parse_line('{"step": 3, "loss": 0.5}', 'default') == {
+        'step': 3, 'loss': 0.5, 'type': 'step', 'run': 'default'}
+    assert parse_line('  CompGenome(L=2) epoch 3: train 64.74% val 68.39%', 'default') is None
+    assert parse_line('{"type": "other"}', 'default') is None
+    assert parse_line('{not json', 'default') is None
+
+def test_updates_are_coalesced_and_resumable(tmp_path):
+    path = str(tmp_path / 'run.jsonl')
+    socketio = FakeSocketIO()
+    ingester = LogIngester(socketio, str(tmp_path / '*.jsonl'), min_emit_interval=60.0)
+    for step in range(1, 4):
+        append(path, json.dumps({'type': 'step', 'step': step, 'loss': 1.0 / step}) + '\n')
+    append(path, epoch('run', 1, 61.0))
+    assert ingester.poll() == 4
+
+    first = ingester.flush()
+    assert first['runs']['run']['steps'] == 3
+    assert first['runs']['run']['step']['step'] == 3
+    assert len(first['runs']['run']['epochs']) == 1
+
+    append(path, epoch('run', 2, 63.0))
+    ingester.poll()
+    assert ingester.flush() is None  # rate limited
+    second = ingester.flush(force=True)
+    assert [event for event, _ in socketio.emitted] == ['training_update'] * 2
+
+    assert ingester.resume(first['seq'])['updates'] == [second]
+    assert ingester.resume(second['seq'])['updates'] == []
+    assert ingester.resume(None)['runs']['run']['best_val_acc'] == 63.0
+
+def test_on_epoch_runs_once_per_run_per_flush_and_not_for_backfill(tmp_path):
+    path = str(tmp_path / 'run.jsonl')
+    append(path, epoch('old', 1, 50.0) + epoch('old', 2, 52.0))
+    calls = []
+    socketio = FakeSocketIO()
+    ingester = LogIngester(socketio, path, on_epoch=calls.append)
+    assert ingester.backfill() == 2
+    assert calls == [] and socketio.emitted == []
+    assert 'runs' in ingester.resume(0)  # clients get the backfill as a snapshot
+
+    append(path, epoch('old', 3, 54.0) + epoch('old', 4, 53.0) + epoch('new', 1, 40.0))
+    ingester.poll()
+    assert calls == []  # nothing before the coalesced flush
+    ingester.flush(force=True)
+    assert sorted(run['run'] for run in calls) == ['new', 'old']
+    old = next(run for run in calls if run['run'] == 'old')
+    assert [record['epoch'] for record in old['epochs']] == [1, 2, 3, 4]
+    assert old['best_val_acc'] == 54.0
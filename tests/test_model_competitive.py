@@ -0,0 +1,55 @@
+import torch
+
+from data_pipeline import synthetic_batch
+
+def repeated_rows_batch():
+    """Batch whose first two examples are identical and whose choices repeat"""
+    input_ids, attention_mask = synthetic_batch(4, 20)
+    input_ids[1], attention_mask[1] = input_ids[0], attention_mask[0]
+    input_ids[2, 1], attention_mask[2, 1] = input_ids[2, 0], attention_mask[2, 0]
+    return input_ids, attention_mask
+
+@torch.no_grad()
+def test_deduplicated_rows_match_full_batch(make_model):
+    model = make_model(use_contrastive=True).eval()
+    input_ids, attention_mask = repeated_rows_batch()
+    dedup = model.forward_multiple_choice(input_ids, attention_mask, return_embedding=True,
+                                          deduplicate=True)
+    full = model.forward_multiple_choice(input_ids, attention_mask, return_embedding=True,
+                                         deduplicate=False)
+    assert torch.allclose(dedup[0], full[0], atol=1e-6)
+    assert torch.equal(dedup[1], full[1])
+    assert torch.allclose(dedup[2], full[2], atol=1e-6)
+
+def test_deduplication_defaults_to_eval_mode_only(make_model, monkeypatch):
+    model = make_model()
+    calls = []
+    unique = torch.unique
+
+    def counting_unique(*args, **kwargs):
+        calls.append(args)
+        return unique(*args, **kwargs)
+    monkeypatch.setattr(torch, 'unique', counting_unique)
+    input_ids, attention_mask = repeated_rows_batch()
+
+    model.train()
+    model.forward_multiple_choice(input_ids, attention_mask)
+    assert not calls
+    model.eval()
+    with torch.no_grad():
+        model.forward_multiple_choice(input_ids, attention_mask)
+    assert calls
+
+@torch.no_grad()
+def test_prefix_hidden_skips_deduplication(make_model):
+    model = make_model().eval()
+    input_ids, attention_mask = repeated_rows_batch()
+    batch_size, num_choices, seq_len = input_ids.shape
+    prefix_hidden = model.encode_frozen_prefix(input_ids.view(-1, seq_len),
+                                               attention_mask.view(-1, seq_len))
+    from_prefix, _ = model.forward_multiple_choice(
+        input_ids, attention_mask, prefix_hidden=prefix_hidden.view(batch_size, num_choices,
+                                                                    seq_len, -1),
+        deduplicate=True)
+    full, _ = model.forward_multiple_choice(input_ids, attention_mask, deduplicate=False)
+    assert torch.allclose(from_prefix, full, atol=1e-5)
@@ -0,0 +1,347 @@
+"""
+Genome training loop for CompetitiveEvoTransformer
+Classification + contrastive loss, discriminative learning rates,
+LR reduction on plateau and early stopping (patience=4), with an optional
+memory budget (activation checkpointing + automatic gradient accumulation)
+"""
+
+import logging
+import math
+import time
+
+import torch
+import torch.nn.functional as F
+
+from memory import (PeakMemoryMonitor, current_memory_mb, saved_activation_mb,
+                    trainable_state_mb)
+from model_competitive import CompetitiveEvoTransformer
+from profiling import StageProfiler
+
+logger = logging.getLogger(__name__)
+
+def split_batch(batch, num_chunks):
+    """Cut a collated batch dict into ``num_chunks`` micro-batches along dim 0"""
+    batch_size = batch['labels'].size(0)
+    chunk_size = math.ceil(batch_size / num_chunks)
+    return [
+        {k: v[start:start + chunk_size] if torch.is_tensor(v) else v for k, v in batch.items()}
+        for start in range(0, batch_size, chunk_size)
+    ]
+
+def contrastive_loss(embeddings, labels, temperature=0.1):
+    """Supervised contrastive loss over a [batch, num_choices, dim] batch
+
+    Each correct-solution embedding treats the other correct embeddings in the
+    batch as positives and all wrong-solution embeddings as negatives.
+    """
+    batch_size, num_choices, _ = embeddings.shape
+    if batch_size < 2:
+        return embeddings.new_zeros(())
+
+    z = F.normalize(embeddings, dim=-1)
+    flat = z.reshape(batch_size * num_choices, -1)
+    anchor_rows = torch.arange(batch_size, device=labels.device) * num_choices + labels
+    anchors = flat[anchor_rows]
+
+    sim = anchors @ flat.t() / temperature
+    is_self = torch.zeros_like(sim, dtype=torch.bool)
+    is_self[torch.arange(batch_size), anchor_rows] = True
+    is_correct = torch.zeros(batch_size * num_choices, dtype=torch.bool, device=sim.device)
+    is_correct[anchor_rows] = True
+    positives = is_correct.unsqueeze(0) & ~is_self
+
+    log_prob = sim.masked_fill(is_self, float('-inf')).log_softmax(dim=-1)
+    return -(log_prob.masked_fill(~positives, 0).sum(dim=-1) / positives.sum(dim=-1)).mean()
+
+@torch.no_grad()
+def evaluate_accuracy(model, loader, device='cpu', max_batches=None):
+    """Multiple-choice accuracy in percent of ``model`` (left in eval mode) on ``loader``"""
+    model.eval()
+    correct, seen = 0, 0
+    for step, batch in enumerate(loader):
+        if max_batches is not None and step >= max_batches:
+            break
+        batch = {k: v.to(device) if torch.is_tensor(v) else v for k, v in batch.items()}
+        _, predictions = model.forward_multiple_choice(
+            batch['input_ids'], batch['attention_mask'],
+            prefix_hidden=batch.get('prefix_hidden'))
+        correct += (predictions == batch['labels']).sum().item()
+        seen += predictions.size(0)
+    return 100.0 * correct / max(seen, 1)
+
+class GenomeTrainer:
+    """Train and evaluate a single CompetitiveGenome
+
+    Batches are dicts from ``data_pipeline.make_dataloader``; frozen-prefix
+    cache batches (``prefix_hidden``) are used transparently. Pass ``model`` to
+    continue training an existing network (e.g. a sub-network inherited from
+    a supernet) instead of building a fresh one from ``roberta``.
+
+    With ``memory_budget_mb`` the loader batch size is the effective batch
+    size: activation checkpointing is switched on and each batch is split into
+    the fewest micro-batches whose estimated peak memory fits the budget, with
+    gradients accumulated across them. The contrastive term then only sees
+    in-batch negatives from its own micro-batch.
+
+    ``profile=True`` attaches a ``profiling.StageProfiler`` to the model; the
+    per-stage time/FLOP breakdown is then reported in ``result()['profile']``.
+
+    ``metrics_sink`` (a callable taking one dict, e.g. ``profiling.JsonlSink``)
+    receives a ``type='step'`` record after every optimizer step and a
+    ``type='epoch'`` record after every validation, tagged with ``run_name``.
+    """
+    MEMORY_HEADROOM = 0.05
+
+    def __init__(self, genome, roberta, train_loader, val_loader,
+                 lr_roberta=2e-5, lr_evolved=2e-4, contrastive_weight=0.1,
+                 device='cpu', seed=42, model=None, memory_budget_mb=None,
+                 gradient_checkpointing=None, accumulation_steps=None, profile=False,
+                 metrics_sink=None, run_name=None):
+        torch.manual_seed(seed)
+        self.genome = genome
+        self.device = torch.device(device)
+        if model is None:
+            model = CompetitiveEvoTransformer(genome, roberta)
+        self.model = model.to(self.device)
+        self.train_loader = train_loader
+        self.val_loader = val_loader
+        self.contrastive_weight = contrastive_weight
+        self.memory_budget_mb = memory_budget_mb
+        self.accumulation_steps = accumulation_steps
+        if gradient_checkpointing is None:
+            gradient_checkpointing = memory_budget_mb is not None
+        self.model.set_gradient_checkpointing(gradient_checkpointing)
+        if profile:
+            self.model.profiler = StageProfiler(self.device)
+
+        roberta_params = [p for p in self.model.roberta.parameters() if p.requires_grad]
+        roberta_ids = {id(p) for p in self.model.roberta.parameters()}
+        evolved_params = [p for p in self.model.parameters()
+                          if p.requires_grad and id(p) not in roberta_ids]
+        param_groups = [{'params': evolved_params, 'lr': lr_evolved}]
+        if roberta_params:
+            param_groups.append({'params': roberta_params, 'lr': lr_roberta})
+        self.optimizer = torch.optim.AdamW(param_groups, weight_decay=genome.weight_decay)
+        self.scheduler = torch.optim.lr_scheduler.ReduceLROnPlateau(
+            self.optimizer, mode='max', factor=0.5, patience=2)
+
+        self.history = []
+        self.best_val_acc = 0.0
+        self.best_epoch = 0
+        self.train_examples = 0
+        self.train_seconds = 0.0
+        self.peak_memory_mb = 0.0
+        self.memory_plan = None
+        self.metrics_sink = metrics_sink
+        self.run_name = run_name or repr(genome)
+
+    def _log(self, record):
+        self.metrics_sink(dict(record, run=self.run_name, time=time.time()))
+
+    def _to_device(self, batch):
+        return {k: v.to(self.device) if torch.is_tensor(v) else v for k, v in batch.items()}
+
+    def compute_loss(self, batch):
+        """Return ``(loss, logits)`` for one multiple-choice batch"""
+        use_contrastive = self.genome.use_contrastive and self.contrastive_weight > 0
+        outputs = self.model.forward_multiple_choice(
+            batch['input_ids'], batch['attention_mask'],
+            prefix_hidden=batch.get('prefix_hidden'),
+            return_embedding=use_contrastive)
+        logits = outputs[0]
+        loss = F.cross_entropy(logits, batch['labels'])
+        if use_contrastive:
+            loss = loss + self.contrastive_weight * contrastive_loss(outputs[2], batch['labels'])
+        return loss, logits
+
+    def plan_accumulation(self, batch, probe_size=4):
+        """Pick accumulation steps so one micro-batch fits ``memory_budget_mb``
+
+        Measures the activations autograd keeps for a ``probe_size`` slice of
+        ``batch``, scales them linearly with micro-batch size and adds the
+        current footprint plus gradients and AdamW state not yet allocated.
+        ``MEMORY_HEADROOM`` of the budget is held back for transient buffers
+        (recomputed layer activations, attention scores) the probe cannot see.
+        """
+        batch_size = batch['labels'].size(0)
+        probe = split_batch(batch, math.ceil(batch_size / min(probe_size, batch_size)))[0]
+        probe_size = probe['labels'].size(0)
+        self.model.train()
+        _, activation_mb = saved_activation_mb(self.compute_loss, probe,
+                                               ignore=list(self.model.parameters()))
+
+        # Gradients are freed between steps; AdamW state persists once created
+        optimizer_slots = 0 if any(self.optimizer.state.values()) else 2
+        fixed_mb = (current_memory_mb(self.device)
+                    + trainable_state_mb(self.model, optimizer_slots))
+        per_example_mb = activation_mb / probe_size
+        usable_mb = self.memory_budget_mb * (1.0 - self.MEMORY_HEADROOM)
+        micro_batch = int((usable_mb - fixed_mb) // max(per_example_mb, 1e-9))
+        if micro_batch < 1:
+            raise MemoryError(
+                f"{self.genome} does not fit {self.memory_budget_mb:.0f} MB: "
+                f"{fixed_mb:.0f} MB fixed + {per_example_mb:.1f} MB per example")
+
+        steps = math.ceil(batch_size / min(micro_batch, batch_size))
+        self.memory_plan = {
+            'memory_budget_mb': self.memory_budget_mb,
+            'fixed_mb': fixed_mb,
+            'activation_mb_per_example': per_example_mb,
+            'micro_batch_size': math.ceil(batch_size / steps),
+            'accumulation_steps': steps,
+            'estimated_peak_mb': fixed_mb + per_example_mb * math.ceil(batch_size / steps),
+        }
+        return steps
+
+    def train_step(self, batch):
+        """One optimizer step over ``batch``, accumulated over micro-batches"""
+        if self.accumulation_steps is None and self.memory_budget_mb is not None:
+            self.accumulation_steps = self.plan_accumulation(batch)
+
+        self.optimizer.zero_grad(set_to_none=True)
+        total_loss, logits = self.accumulate_gradients(batch, self.accumulation_steps or 1)
+        torch.nn.utils.clip_grad_norm_(self.model.parameters(), 1.0)
+        self.optimizer.step()
+        return total_loss, logits
+
+    def accumulate_gradients(self, batch, steps, scale=1.0):
+        """Backpropagate ``scale`` times the mean loss of ``batch`` in ``steps`` micro-batches
+
+        Each micro-batch loss is weighted by its share of the batch, so the
+        accumulated gradient matches the full-batch mean loss. Returns the
+        (unscaled) mean loss and the detached logits.
+        """
+        batch_size = batch['labels'].size(0)
+        total_loss, all_logits = 0.0, []
+        for micro in split_batch(batch, steps) if steps > 1 else [batch]:
+            loss, logits = self.compute_loss(micro)
+            weight = logits.size(0) / batch_size
+            (loss * (weight * scale)).backward()
+            total_loss += loss.item() * weight
+            all_logits.append(logits.detach())
+        return total_loss, torch.cat(all_logits)
+
+    def train_epoch(self, max_batches=None):
+        """One pass over the training loader (or its first ``max_batches``)"""
+        self.model.train()
+        sampler = getattr(self.train_loader, 'batch_sampler', None)
+        if hasattr(sampler, 'set_epoch'):
+            sampler.set_epoch(len(self.history))
+
+        total_loss, correct, seen = 0.0, 0, 0
+        start = time.perf_counter()
+        with PeakMemoryMonitor(self.device) as monitor:
+            for step, batch in enumerate(self.train_loader):
+                if max_batches is not None and step >= max_batches:
+                    break
+                batch = self._to_device(batch)
+                loss, logits = self.train_step(batch)
+
+                batch_correct = (logits.argmax(dim=-1) == batch['labels']).sum().item()
+                total_loss += loss * logits.size(0)
+                correct += batch_correct
+                seen += logits.size(0)
+                if self.metrics_sink is not None:
+                    self._log({
+                        'type': 'step',
+                        'epoch': len(self.history) + 1,
+                        'step': step + 1,
+                        'examples': self.train_examples + seen,
+                        'loss': loss,
+                        'accuracy': 100.0 * batch_correct / logits.size(0),
+                        'lr': self.optimizer.param_groups[0]['lr'],
+                        'examples_per_sec': seen / (time.perf_counter() - start),
+                    })
+
+        elapsed = time.perf_counter() - start
+        self.train_examples += seen
+        self.train_seconds += elapsed
+        self.peak_memory_mb = max(self.peak_memory_mb, monitor.peak_mb)
+        return {
+            'train_loss': total_loss / max(seen, 1),
+            'train_acc': 100.0 * correct / max(seen, 1),
+            'examples': seen,
+            'seconds': elapsed,
+            'peak_memory_mb': monitor.peak_mb,
+        }
+
+    def evaluate(self, loader=None, max_batches=None):
+        """Validation accuracy in percent"""
+        return evaluate_accuracy(self.model, loader or self.val_loader, self.device, max_batches)
+
+    def run_epoch(self, max_batches=None):
+        """Train one epoch, validate, step the LR schedule and record history"""
+        train_stats = self.train_epoch(max_batches=max_batches)
+        val_acc = self.evaluate()
+        self.scheduler.step(val_acc)
+
+        is_best = val_acc > self.best_val_acc
+        if is_best:
+            self.best_val_acc = val_acc
+            self.best_epoch = len(self.history) + 1
+        record = dict(train_stats, epoch=len(self.history) + 1, val_acc=val_acc, is_best=is_best)
+        self.history.append(record)
+        if self.metrics_sink is not None:
+            self._log(dict(record, type='epoch', lr=self.optimizer.param_groups[0]['lr']))
+        return record
+
+    def fit(self, epochs=10, patience=4, checkpoint_path=None):
+        """Train until ``epochs`` or ``patience`` epochs without improvement"""
+        start = time.perf_counter()
+        for _ in range(epochs):
+            record = self.run_epoch()
+            logger.info("%s epoch %d: train %.2f%% val %.2f%%", self.genome, record['epoch'],
+                        record['train_acc'], record['val_acc'])
+            if record['is_best'] and checkpoint_path is not None:
+                self.save_checkpoint(checkpoint_path)
+            if len(self.history) - self.best_epoch >= patience:
+                break
+        return self.result(time.perf_counter() - start, checkpoint_path)
+
+    def result(self, wall_time, checkpoint_path=None):
+        return {
+            'genome': self.genome.to_dict(),
+            'status': 'ok',
+            'best_val_acc': self.best_val_acc,
+            'best_epoch': self.best_epoch,
+            'epochs': len(self.history),
+            'history': self.history,
+            'wall_time': wall_time,
+            'train_examples_per_sec': self.train_examples / max(self.train_seconds, 1e-9),
+            'checkpoint_path': checkpoint_path,
+            'peak_memory_mb': self.peak_memory_mb,
+            'accumulation_steps': self.accumulation_steps or 1,
+            'memory_plan': self.memory_plan,
+            'profile': self.model.profiler.summary() if self.model.profiler else None,
+        }
+
+    def save_checkpoint(self, path):
+        torch.save({
+            'genome': self.genome.to_dict(),
+            'state_dict': self.model.state_dict(),
+            'roberta_layers': len(self.model.roberta.encoder.layer),
+            'val_acc': self.best_val_acc,
+            'epoch': self.best_epoch,
+        }, path)
+
+    def state_dict(self):
+        """Optimizer, LR schedule and progress counters (model weights excluded)"""
+        return {
+            'optimizer': self.optimizer.state_dict(),
+            'scheduler': self.scheduler.state_dict(),
+            'history': self.history,
+            'best_val_acc': self.best_val_acc,
+            'best_epoch': self.best_epoch,
+            'train_examples': self.train_examples,
+            'train_seconds': self.train_seconds,
+            'peak_memory_mb': self.peak_memory_mb,
+            'accumulation_steps': self.accumulation_steps,
+            'memory_plan': self.memory_plan,
+        }
+
+    def load_state_dict(self, state):
+        self.optimizer.load_state_dict(state['optimizer'])
+        self.scheduler.load_state_dict(state['scheduler'])
+        for key in ('history', 'best_val_acc', 'best_epoch', 'train_examples', 'train_seconds',
+                    'peak_memory_mb', 'accumulation_steps', 'memory_plan'):
+            setattr(self, key, state[key])